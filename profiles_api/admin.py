@@ -1,7 +1,234 @@
+"""Admin for UserProfile and ProfileFeedItem that stays fast on big tables
+
+The stock changelist runs an exact COUNT(*) (twice), pages with OFFSET and
+builds the date hierarchy from a full scan. Here counts over a large
+unfiltered table are estimated from the primary key span and filtered
+counts stop at ADMIN_COUNT_LIMIT, feed items page by a (created_on, id)
+cursor like /api/feed/, and the date hierarchy probes the created_on index
+once per bucket. Search goes through the profile search backend instead of
+LIKE '%term%' scans.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import F, Max, Min, QuerySet
+from django.utils import timezone
+from django.utils.functional import cached_property
 
 from profiles_api import models
+from profiles_api import pagination
+from profiles_api import search
+
+CURSOR_VAR = 'cursor'
+
+
+def estimated_count(model):
+    """Estimate the rows in `model`'s table from its primary key span: two index probes, no scan"""
+    table = model._meta.db_table
+    pk = model._meta.pk.column
+    with connection.cursor() as cursor:
+        # Separate subqueries: SQLite only answers a lone MIN() or MAX() from the index
+        cursor.execute(f'SELECT (SELECT MIN({pk}) FROM {table}), (SELECT MAX({pk}) FROM {table})')
+        low, high = cursor.fetchone()
+    return 0 if low is None else high - low + 1
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that never counts more than ADMIN_COUNT_LIMIT rows
+
+    `estimated` is set when `count` is not exact: an unfiltered table past
+    the limit reports its estimated size, a filtered queryset the limit.
+    """
+    estimated = False
+
+    @cached_property
+    def count(self):
+        limit = getattr(settings, 'ADMIN_COUNT_LIMIT', 10000)
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset.model)
+            if estimate > limit:
+                self.estimated = True
+                return estimate
+        count = queryset[:limit + 1].count()
+        if count > limit:
+            self.estimated = True
+            return limit
+        return count
+
+
+class DateHierarchyQuerySet(QuerySet):
+    """QuerySet whose date hierarchy queries use the index on the date field
+
+    The admin's date_hierarchy asks for MIN() and MAX() in one query, which
+    SQLite answers with a full scan, and lists the years, months or days
+    with rows via SELECT DISTINCT over a truncation of every row. Here
+    MIN()/MAX() run one per query and datetimes() hops from bucket to
+    bucket with one MIN() probe each, so both cost index lookups instead
+    of a pass over the table.
+    """
+
+    def aggregate(self, *args, **kwargs):
+        if not args and len(kwargs) > 1 and all(
+            isinstance(expression, (Min, Max)) and isinstance(expression.source_expressions[0], F)
+            for expression in kwargs.values()
+        ):
+            return {
+                name: super(DateHierarchyQuerySet, self).aggregate(**{name: expression})[name]
+                for name, expression in kwargs.items()
+            }
+        return super().aggregate(*args, **kwargs)
+
+    def datetimes(self, field_name, kind, order='ASC', tzinfo=None, is_dst=None):
+        if kind not in ('year', 'month', 'day') or not settings.USE_TZ:
+            return super().datetimes(field_name, kind, order, tzinfo, is_dst)
+
+        tz = tzinfo or timezone.get_current_timezone()
+        buckets = []
+        first = self.aggregate(first=Min(field_name))['first']
+        while first is not None:
+            start = truncate(timezone.localtime(first, tz), kind)
+            buckets.append(start)
+            # SQLite starts the index range at the first lower bound in the WHERE clause, so put
+            # the probe's ahead of the filters already on the queryset (e.g. the selected year)
+            probe = type(self)(self.model, using=self._db).filter(
+                **{f'{field_name}__gte': following(start, kind, tz)}
+            ) & self
+            first = probe.aggregate(first=Min(field_name))['first']
+        if order == 'DESC':
+            buckets.reverse()
+        return buckets
+
+
+def truncate(value, kind):
+    value = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if kind in ('year', 'month'):
+        value = value.replace(day=1)
+    if kind == 'year':
+        value = value.replace(month=1)
+    return value
+
+
+def following(start, kind, tz):
+    """Return the start of the bucket after `start`"""
+    if kind == 'day':
+        day = start.date() + timedelta(days=1)
+    elif kind == 'month':
+        day = start.date().replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    else:
+        day = start.date().replace(year=start.year + 1)
+    return timezone.make_aware(datetime.combine(day, time.min), tz)
+
+
+class KeysetChangeList(ChangeList):
+    """ChangeList paging by a (created_on, id) cursor instead of ?p= and OFFSET
+
+    Used while the list is in its default newest-first order; sorting by a
+    column falls back to numbered pages.
+    """
+
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = request.GET.get(CURSOR_VAR)
+        self.keyset = False
+        self.next_url = self.previous_url = None
+        super().__init__(request, *args, **kwargs)
+
+    def get_queryset(self, request):
+        # Not a field lookup, and links for new filters or orderings start from the first page
+        self.params.pop(CURSOR_VAR, None)
+        return super().get_queryset(request)
+
+    def get_results(self, request):
+        if ORDER_VAR in self.params or self.show_all:
+            return super().get_results(request)
+
+        reverse, position = False, None
+        if self.cursor is not None:
+            try:
+                reverse, *position = pagination.decode_position(self.cursor)
+            except ValueError:
+                raise IncorrectLookupParameters
+        per_page = self.list_per_page
+        rows = list(pagination.keyset_slice(self.queryset, position, reverse, per_page + 1))
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        if reverse:
+            rows.reverse()
+            has_previous, has_next = has_more, True
+        else:
+            has_previous, has_next = position is not None, has_more
+
+        self.paginator = self.model_admin.get_paginator(request, self.queryset, per_page)
+        self.result_count = self.paginator.count
+        self.show_full_result_count = False
+        self.full_result_count = None
+        self.show_admin_actions = True
+        self.result_list = rows
+        self.can_show_all = False
+        self.multi_page = has_previous or has_next
+        self.keyset = True
+        if rows and has_next:
+            self.next_url = self.get_query_string(
+                {CURSOR_VAR: pagination.encode_position(rows[-1].created_on, rows[-1].id)}
+            )
+        if rows and has_previous:
+            self.previous_url = self.get_query_string(
+                {CURSOR_VAR: pagination.encode_position(rows[0].created_on, rows[0].id, reverse=True)}
+            )
+
+
+class SearchBackendMixin:
+    """Admin search through the configured profile search backend
+
+    Every match is listed: the changelist orders and pages the rows itself,
+    so the API's ranking and PROFILE_SEARCH_MAX_RESULTS cap do not apply.
+    """
+
+    def search_profiles(self, queryset, search_term):
+        return search.get_search_backend().search_all(queryset, search_term.split())
+
+
+@admin.register(models.UserProfile)
+class UserProfileAdmin(SearchBackendMixin, admin.ModelAdmin):
+    list_display = ('email', 'name', 'is_active', 'is_staff', 'follower_count')
+    search_fields = ('name', 'email')
+    search_help_text = 'Name or email, prefix matches'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return self.search_profiles(queryset, search_term), False
+
+
+@admin.register(models.ProfileFeedItem)
+class ProfileFeedItemAdmin(SearchBackendMixin, admin.ModelAdmin):
+    list_display = ('id', 'user_profile', 'status_text', 'created_on')  # no per-row __str__
+    list_select_related = ('user_profile',)
+    raw_id_fields = ('user_profile',)
+    date_hierarchy = 'created_on'  # see DateHierarchyQuerySet
+    ordering = ('-created_on', '-id')  # feed_created_on_id_idx
+    search_fields = ('user_profile__name', 'user_profile__email')
+    search_help_text = "Author's name or email"
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # ModelAdmin.get_queryset, on the QuerySet class with the index-backed date hierarchy
+        return DateHierarchyQuerySet(self.model).order_by(*self.get_ordering(request))
 
-admin.site.register(models.UserProfile)
-admin.site.register(models.ProfileFeedItem)
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
 
+    def get_search_results(self, request, queryset, search_term):
+        """Statuses by the profiles matching `search_term`, through the (user_profile, created_on) index"""
+        if not search_term:
+            return queryset, False
+        authors = self.search_profiles(models.UserProfile.objects.all(), search_term)
+        return queryset.filter(user_profile__in=authors.values('pk')), False
@@ -1,6 +1,30 @@
+import sqlite3
+
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+# UPDATE ... RETURNING in feed_stats, and primary keys set by bulk_create for the batch endpoint's fan-out
+MIN_SQLITE_VERSION = (3, 35)
+
+
+def check_sqlite_version():
+    """Refuse to start on an SQLite library too old for the queries profiles_api runs"""
+    uses_sqlite = any(
+        database['ENGINE'] == 'django.db.backends.sqlite3' for database in settings.DATABASES.values()
+    )
+    if uses_sqlite and sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+        raise ImproperlyConfigured(
+            f'profiles_api needs SQLite {".".join(map(str, MIN_SQLITE_VERSION))} or later '
+            f'(found {sqlite3.sqlite_version}).'
+        )
 
 
 class ProfilesApiConfig(AppConfig):
 
     name = 'profiles_api'
+
+    def ready(self):
+        """Check the SQLite version and connect the model signal handlers"""
+        check_sqlite_version()
+        from profiles_api import signals  # noqa: F401
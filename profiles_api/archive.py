@@ -0,0 +1,162 @@
+"""Retention for ProfileFeedItem: move old statuses into monthly archive tables
+
+archive_chunk moves the oldest items before a cutoff into
+profiles_api_profilefeeditem_archive_YYYYMM, one small transaction per
+chunk, so the live table and its indexes only hold recent rows and
+writers never wait long behind the purge. Archived items leave the home
+timelines with them. iter_archived reads them back for exports whose
+since/until range reaches into an archived month. Deleting a profile
+purges its archived items too (see signals).
+"""
+import heapq
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+
+from profiles_api import caching
+from profiles_api import models
+
+ARCHIVE_PREFIX = models.ProfileFeedItem._meta.db_table + '_archive_'
+
+
+def archive_table(month):
+    """Return the archive table name for a 'YYYYMM' month"""
+    return f'{ARCHIVE_PREFIX}{month}'
+
+
+def create_archive_table(cursor, month):
+    table = archive_table(month)
+    cursor.execute(
+        f'CREATE TABLE IF NOT EXISTS {table} ('
+        f'id integer NOT NULL PRIMARY KEY, user_profile_id integer NOT NULL, '
+        f'status_text varchar(255) NOT NULL, created_on datetime NOT NULL)'
+    )
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS {table}_created_on ON {table} (created_on)')
+    return table
+
+
+def archive_months():
+    """Return the archived months, oldest first"""
+    with connection.cursor() as cursor:
+        # GLOB rather than LIKE: '_' in the prefix is literal there
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB %s ORDER BY name",
+            [ARCHIVE_PREFIX + '[0-9]' * 6]
+        )
+        return [name[len(ARCHIVE_PREFIX):] for name, in cursor.fetchall()]
+
+
+def archive_chunk(cutoff, chunk_size):
+    """Move up to `chunk_size` of the oldest items created before `cutoff`; return how many moved"""
+    items = models.ProfileFeedItem._meta.db_table
+    entries = models.HomeTimelineEntry._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Oldest first along the (created_on, id) index
+        cursor.execute(
+            f"SELECT id, strftime('%%Y%%m', created_on) FROM {items} "
+            f'WHERE created_on < %s ORDER BY created_on, id LIMIT %s',
+            [connection.ops.adapt_datetimefield_value(cutoff), chunk_size]
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            return 0
+
+        by_month = {}
+        for pk, month in rows:
+            by_month.setdefault(month, []).append(pk)
+        for month, ids in by_month.items():
+            table = create_archive_table(cursor, month)
+            cursor.execute(
+                f'INSERT INTO {table} (id, user_profile_id, status_text, created_on) '
+                f'SELECT id, user_profile_id, status_text, created_on FROM {items} '
+                f'WHERE id IN ({", ".join(["%s"] * len(ids))})',
+                ids
+            )
+
+        ids = [pk for pk, _ in rows]
+        placeholders = ', '.join(['%s'] * len(ids))
+        # Raw DELETE skips Django's cascade, so drop the timeline rows first
+        cursor.execute(f'DELETE FROM {entries} WHERE feed_item_id IN ({placeholders})', ids)
+        cursor.execute(f'DELETE FROM {items} WHERE id IN ({placeholders})', ids)
+    # The detail versions too, or /api/feed/<id>/ would keep answering 304 for a row no longer there
+    caching.bump_versions('feed', ids)
+    return len(rows)
+
+
+def purge_author(user_profile_id):
+    """Delete a removed profile's archived items; the archive tables have no cascade"""
+    with connection.cursor() as cursor:
+        for month in archive_months():
+            cursor.execute(f'DELETE FROM {archive_table(month)} WHERE user_profile_id = %s', [user_profile_id])
+
+
+def months_between(since, until, months):
+    """Narrow `months` to those overlapping since <= created_on < until"""
+    first = since.astimezone(dt_timezone.utc).strftime('%Y%m') if since is not None else None
+    last = until.astimezone(dt_timezone.utc).strftime('%Y%m') if until is not None else None
+    return [
+        month for month in months
+        if (first is None or month >= first) and (last is None or month <= last)
+    ]
+
+
+def iter_archived(since=None, until=None, user_profile_id=None, chunk_size=2000):
+    """Yield archived (id, user_profile_id, status_text, created_on) rows in the range, by id"""
+    months = months_between(since, until, archive_months())
+    if not months:
+        return iter(())
+    return heapq.merge(
+        *(iter_month(month, since, until, user_profile_id, chunk_size) for month in months),
+        key=lambda row: row[0]
+    )
+
+
+def iter_month(month, since, until, user_profile_id, chunk_size):
+    conditions, params = [], []
+    adapt = connection.ops.adapt_datetimefield_value
+    if since is not None:
+        conditions.append('created_on >= %s')
+        params.append(adapt(since))
+    if until is not None:
+        conditions.append('created_on < %s')
+        params.append(adapt(until))
+    if user_profile_id is not None:
+        conditions.append('user_profile_id = %s')
+        params.append(user_profile_id)
+    where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT id, user_profile_id, status_text, created_on FROM {archive_table(month)} {where} ORDER BY id',
+            params
+        )
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            for pk, author, status_text, created_on in rows:
+                yield pk, author, status_text, to_datetime(created_on)
+
+
+def to_datetime(value):
+    """Archive tables are read with a raw cursor, which gives naive UTC datetimes"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if settings.USE_TZ and value.tzinfo is None:
+        value = value.replace(tzinfo=dt_timezone.utc)
+    return value
+
+
+def index_sizes(table):
+    """Return bytes used by `table` and each of its indexes, or {} without the dbstat table"""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name, SUM(pgsize) FROM dbstat WHERE name IN "
+                "(SELECT name FROM sqlite_master WHERE tbl_name = %s) GROUP BY name ORDER BY name",
+                [table]
+            )
+            return dict(cursor.fetchall())
+    except OperationalError:
+        return {}
@@ -0,0 +1,253 @@
+"""Async views for serving under profiles_project/asgi.py
+
+Login and signup run password hashing and verification on the bounded pool
+in profiles_api.hashing rather than on the request thread, and a saturated
+pool answers with 503 and Retry-After straight away.
+
+The read views mirror list/retrieve of UserProfileViewSet and
+UserProfileFeedViewSet. Token auth is answered from the token cache on the
+event loop, permission checks run there too, and the database work of a
+request is a single hop to the ORM thread.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse, JsonResponse
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.views import exception_handler
+
+from profiles_api import authentication
+from profiles_api import budgets
+from profiles_api import database
+from profiles_api import hashing
+from profiles_api import models
+from profiles_api import serializers
+from profiles_api import throttling
+from profiles_api import views
+
+
+def parse_body(request):
+    """Return the request payload from a JSON or form-encoded body"""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+
+    return request.POST.dict()
+
+
+def saturated_response(exc):
+    response = JsonResponse(
+        {'detail': 'Server is busy, please retry shortly.'},
+        status=503
+    )
+    response['Retry-After'] = str(exc.retry_after)
+    return response
+
+
+def throttle_wait(request, scope, username=None):
+    """Take tokens from the same buckets as the sync views' throttles; return the longest wait"""
+    waits = [throttling.check(scope, 'ip', throttling.IPThrottle().get_ident(request))]
+    if username is not None:
+        waits.append(throttling.check(scope, 'user', throttling.login_key(username)))
+    return max(waits)
+
+
+def throttled_response(wait):
+    exc = exceptions.Throttled(wait)
+    response = JsonResponse({'detail': str(exc.detail)}, status=exc.status_code)
+    response['Retry-After'] = str(exc.wait)
+    return response
+
+
+def method_not_allowed(request, allow='POST'):
+    response = JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    response['Allow'] = allow
+    return response
+
+
+def get_user_by_email(email):
+    return models.UserProfile.objects.filter(
+        email=models.UserProfile.objects.normalize_email(email)
+    ).first()
+
+
+def create_user_with_hash(email, name, password_hash):
+    """Same as UserProfileManager.create_user, with the hash already computed"""
+    user = models.UserProfile(
+        email=models.UserProfile.objects.normalize_email(email),
+        name=name,
+        password=password_hash,
+    )
+    user.save()
+    return user
+
+
+async def login(request):
+    """Handle creating user authentication tokens without blocking on PBKDF2"""
+    if request.method != 'POST':
+        return method_not_allowed(request)
+
+    data = parse_body(request)
+    if data is None:
+        return JsonResponse({'detail': 'Malformed request.'}, status=400)
+    username, password = data.get('username'), data.get('password')
+    wait = await sync_to_async(throttle_wait)(request, 'login', username)
+    if wait:
+        return throttled_response(wait)
+    if not username or not password:
+        return JsonResponse({'non_field_errors': ['Must include "username" and "password".']}, status=400)
+
+    pool = hashing.get_hashing_pool()
+    try:
+        user = await sync_to_async(get_user_by_email)(username)
+        if user is None:
+            # Hash anyway so unknown emails take as long as wrong passwords
+            await pool.make_password(password)
+            valid = False
+        else:
+            valid = await pool.check_password(password, user.password) and user.is_active
+    except hashing.PoolSaturated as exc:
+        return saturated_response(exc)
+
+    if not valid:
+        return JsonResponse({'non_field_errors': ['Unable to log in with provided credentials.']}, status=400)
+
+    token, created = await sync_to_async(Token.objects.get_or_create)(user=user)
+    return JsonResponse({'token': token.key})
+
+
+login.csrf_exempt = True
+
+
+async def signup(request):
+    """Create a new user profile, hashing the password on the worker pool"""
+    if request.method != 'POST':
+        return method_not_allowed(request)
+
+    wait = await sync_to_async(throttle_wait)(request, 'signup')
+    if wait:
+        return throttled_response(wait)
+    data = parse_body(request)
+    if data is None:
+        return JsonResponse({'detail': 'Malformed request.'}, status=400)
+
+    serializer = serializers.UserProfileSerializer(data=data)
+    if not await sync_to_async(serializer.is_valid)():
+        return JsonResponse(serializer.errors, status=400)
+
+    try:
+        password_hash = await hashing.get_hashing_pool().make_password(serializer.validated_data['password'])
+    except hashing.PoolSaturated as exc:
+        return saturated_response(exc)
+
+    user = await sync_to_async(create_user_with_hash)(
+        serializer.validated_data['email'],
+        serializer.validated_data['name'],
+        password_hash
+    )
+    return JsonResponse(serializers.UserProfileSerializer(user).data, status=201)
+
+
+signup.csrf_exempt = True
+
+
+async def authenticate(request):
+    """Resolve the Token header like CachedTokenAuthentication, going to the database only on a cache miss"""
+    auth = request.headers.get('Authorization', '').split()
+    if not auth or auth[0].lower() != 'token':
+        return AnonymousUser()
+    if len(auth) != 2:
+        raise exceptions.AuthenticationFailed('Invalid token header.')
+
+    backend = authentication.CachedTokenAuthentication()
+    credentials = backend.cached_credentials(auth[1])
+    if credentials is None:
+        credentials = await sync_to_async(backend.load_credentials)(auth[1])
+    return credentials[0]
+
+
+def render(data, status=200):
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+
+
+async def read_view(request, viewset_class, action, load, **kwargs):
+    """Run the auth and permission checks of `viewset_class`, then `load(view)` on the ORM thread"""
+    if request.method != 'GET':
+        return method_not_allowed(request, allow='GET')
+
+    drf_request = Request(request)
+    view = viewset_class(request=drf_request, args=(), kwargs=kwargs, action=action, format_kwarg=None)
+    try:
+        drf_request.user = await authenticate(request)
+        try:
+            view.check_permissions(drf_request)
+        except exceptions.PermissionDenied:
+            if not drf_request.user.is_authenticated:
+                raise exceptions.NotAuthenticated()
+            raise
+        data = await sync_to_async(load_within_budget)(view, load)
+    except exceptions.APIException as exc:
+        response = exception_handler(exc, {'view': view, 'request': drf_request})
+        rendered = render(response.data, status=response.status_code)
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            rendered['WWW-Authenticate'] = 'Token'
+        return rendered
+
+    return render(data)
+
+
+def load_within_budget(view, load):
+    """Call `load(view)` on the read replica, under the sync viewset's query budget for the same action"""
+    with database.read_replica(), budgets.query_budget(
+        f'async {type(view).__name__}.{view.action}', view.get_query_budget(view.action)
+    ):
+        return load(view)
+
+
+def load_list(view):
+    queryset = view.filter_queryset(view.get_queryset())
+    row_serializer = view.get_row_serializer()
+    if row_serializer is not None:
+        queryset = row_serializer.values(queryset, extra=getattr(view.paginator, 'cursor_fields', ()))
+        serialize = row_serializer.serialize
+    else:
+        def serialize(rows):
+            return view.get_serializer(rows, many=True).data
+
+    page = view.paginate_queryset(queryset)
+    if page is not None:
+        return view.get_paginated_response(serialize(page)).data
+    return serialize(queryset)
+
+
+def load_detail(view):
+    return view.get_serializer(view.get_object()).data
+
+
+async def profiles(request):
+    """GET lists profiles (with ?search=), POST signs up a new profile"""
+    if request.method == 'POST':
+        return await signup(request)
+    return await read_view(request, views.UserProfileViewSet, 'list', load_list)
+
+
+profiles.csrf_exempt = True
+
+
+async def profile_detail(request, pk):
+    return await read_view(request, views.UserProfileViewSet, 'retrieve', load_detail, pk=pk)
+
+
+async def feed(request):
+    return await read_view(request, views.UserProfileFeedViewSet, 'list', load_list)
+
+
+async def feed_detail(request, pk):
+    return await read_view(request, views.UserProfileFeedViewSet, 'retrieve', load_detail, pk=pk)
@@ -0,0 +1,149 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache as django_cache
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from profiles_api import profiling
+
+
+class TokenCache:
+    """Bounded LRU of token key -> user with a time-to-live on every entry
+
+    When `use_django_cache` is set, misses fall through to Django's cache
+    framework before the database so that several processes can share the
+    work of resolving a token.
+    """
+
+    def __init__(self, max_size=1024, ttl=300, use_django_cache=False):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.use_django_cache = use_django_cache
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def django_cache_key(key):
+        return f'profiles_api:auth-token:{key}'
+
+    def get(self, key):
+        """Return the cached user for `key`, or None on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                user, expires = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.copy(user)
+                self._discard(key)
+
+        if self.use_django_cache:
+            user = django_cache.get(self.django_cache_key(key))
+            if user is not None:
+                self._store(key, user, now)
+                with self._lock:
+                    self.hits += 1
+                return copy.copy(user)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, user):
+        """Cache the user a token key resolved to"""
+        self._store(key, user, time.monotonic())
+        if self.use_django_cache:
+            django_cache.set(self.django_cache_key(key), user, self.ttl)
+
+    def _store(self, key, user, now):
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (user, now + self.ttl)
+            self._keys_by_user.setdefault(user.pk, set()).add(key)
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+
+    def _discard(self, key):
+        """Remove `key` from the LRU; the caller holds the lock"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        user_keys = self._keys_by_user.get(entry[0].pk)
+        if user_keys is not None:
+            user_keys.discard(key)
+            if not user_keys:
+                del self._keys_by_user[entry[0].pk]
+
+    def invalidate(self, key):
+        """Forget a single token key"""
+        with self._lock:
+            self._discard(key)
+        if self.use_django_cache:
+            django_cache.delete(self.django_cache_key(key))
+
+    def invalidate_user(self, user_id, keys=()):
+        """Forget every token key cached for a user, plus any `keys` given"""
+        with self._lock:
+            keys = set(keys) | self._keys_by_user.get(user_id, set())
+            for key in keys:
+                self._discard(key)
+        if self.use_django_cache and keys:
+            django_cache.delete_many([self.django_cache_key(key) for key in keys])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return the hit/miss counters and current size"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+
+token_cache = TokenCache(
+    max_size=getattr(settings, 'TOKEN_CACHE_MAX_SIZE', 1024),
+    ttl=getattr(settings, 'TOKEN_CACHE_TTL', 300),
+    use_django_cache=getattr(settings, 'TOKEN_CACHE_USE_DJANGO_CACHE', False),
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that remembers token -> user to skip the per-request join"""
+
+    def authenticate(self, request):
+        with profiling.timing('auth'):
+            return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        return self.cached_credentials(key) or self.load_credentials(key)
+
+    def cached_credentials(self, key):
+        """Return (user, token) from memory without touching the database, or None"""
+        user = token_cache.get(key)
+        if user is None:
+            return None
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+
+        # Build the token without a query; only the key and user are ever read from it
+        return user, Token(key=key, user=user)
+
+    def load_credentials(self, key):
+        """Resolve the token in the database and remember the result"""
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, user)
+        return user, token
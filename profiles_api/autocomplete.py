@@ -0,0 +1,137 @@
+"""In-memory prefix index for type-ahead lookups of profile names and emails
+
+PrefixIndex keeps one sorted list of (key, id) pairs, where the keys of a
+profile are its lowercased name, the name from each later word on ("smith"
+for "John Smith") and its email. A lookup is a bisect to the first key at
+or after the prefix and a walk while keys still match, so it costs the
+same for 100 or 100,000 profiles. Keys are cut to
+AUTOCOMPLETE_MAX_KEY_LENGTH characters, which bounds the footprint to a
+few small tuples per profile.
+
+The index is loaded lazily on the first lookup and kept current by the
+UserProfile signals once the transaction commits. Changes made by other
+processes are picked up when the index is reloaded after
+AUTOCOMPLETE_MAX_AGE seconds.
+"""
+import bisect
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from profiles_api import models
+
+
+class PrefixIndex:
+    """Sorted (key, id) pairs over lowercased names, name suffixes and emails"""
+
+    def __init__(self, max_key_length=32):
+        self.max_key_length = max_key_length
+        self.loaded_at = None
+        self._keys = []
+        self._entries = {}  # id -> (name, email); keys are recomputed on removal
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def keys_for(self, name, email):
+        words = name.lower().split()
+        keys = {' '.join(words[start:]) for start in range(len(words))}
+        keys.add(email.lower())
+        return {key[:self.max_key_length] for key in keys if key}
+
+    def load(self, rows):
+        """Replace the contents with (id, name, email) rows"""
+        keys, entries = [], {}
+        for pk, name, email in rows:
+            keys.extend((key, pk) for key in self.keys_for(name, email))
+            entries[pk] = (name, email)
+        keys.sort()
+        with self._lock:
+            self._keys, self._entries = keys, entries
+            self.loaded_at = time.monotonic()
+
+    def add(self, pk, name, email):
+        """Index a new profile, or re-index a changed one"""
+        with self._lock:
+            self._discard(pk)
+            for key in self.keys_for(name, email):
+                bisect.insort(self._keys, (key, pk))
+            self._entries[pk] = (name, email)
+
+    def remove(self, pk):
+        with self._lock:
+            self._discard(pk)
+
+    def _discard(self, pk):
+        entry = self._entries.pop(pk, None)
+        if entry is None:
+            return
+        for key in self.keys_for(*entry):
+            position = bisect.bisect_left(self._keys, (key, pk))
+            if position < len(self._keys) and self._keys[position] == (key, pk):
+                del self._keys[position]
+
+    def lookup(self, prefix, limit=10):
+        """Return up to `limit` (id, name) pairs with a key starting with `prefix`, in key order"""
+        prefix = prefix.lower()[:self.max_key_length]
+        results, seen = [], set()
+        with self._lock:
+            keys = self._keys
+            # (prefix,) sorts before every (prefix, id) pair
+            position = bisect.bisect_left(keys, (prefix,))
+            while position < len(keys) and len(results) < limit:
+                key, pk = keys[position]
+                if not key.startswith(prefix):
+                    break
+                if pk not in seen:
+                    seen.add(pk)
+                    results.append((pk, self._entries[pk][0]))
+                position += 1
+        return results
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Return this process's index, loading it when missing or older than AUTOCOMPLETE_MAX_AGE"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = PrefixIndex(getattr(settings, 'AUTOCOMPLETE_MAX_KEY_LENGTH', 32))
+    if is_stale(_index):
+        with _index_lock:
+            if is_stale(_index):
+                _index.load(models.UserProfile.objects.values_list('id', 'name', 'email').iterator(chunk_size=2000))
+    return _index
+
+
+def is_stale(index):
+    max_age = getattr(settings, 'AUTOCOMPLETE_MAX_AGE', 300)
+    if index.loaded_at is None:
+        return True
+    return max_age is not None and time.monotonic() - index.loaded_at > max_age
+
+
+def index_profiles(profiles):
+    """Add saved profiles to a loaded index once the transaction commits"""
+    if _index is None or _index.loaded_at is None:
+        return  # the first lookup loads them from the table
+    rows = [(profile.pk, profile.name, profile.email) for profile in profiles]
+
+    def add():
+        for row in rows:
+            _index.add(*row)
+
+    transaction.on_commit(add)
+
+
+def remove_profile(profile_id):
+    if _index is None or _index.loaded_at is None:
+        return
+    transaction.on_commit(lambda: _index.remove(profile_id))
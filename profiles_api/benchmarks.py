@@ -0,0 +1,208 @@
+"""Repeatable in-process benchmarks for every endpoint in profiles_api/urls.py
+
+Each Scenario is one request, replayed through Django's test client against
+the configured database (seed it with `manage.py seed_benchmark_data`).
+run_scenario reports latency percentiles from the timed runs, then makes one
+more request under tracemalloc and CaptureQueriesContext to record the query
+count, on the primary and the read replica, and peak Python memory, so the
+instrumentation does not skew the timings. Scenarios replay one request many times as one user, so the rate
+limits are lifted for the run; the throttle checks still happen and are
+timed.
+"""
+import asyncio
+import json
+import time
+import tracemalloc
+from contextlib import ExitStack, contextmanager
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import AsyncClient, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from profiles_api import database
+from profiles_api import models
+from profiles_api import throttling
+from profiles_api.pagination import encode_position
+from profiles_api.profiling import percentile
+
+
+class Scenario:
+    """One benchmarked request"""
+
+    def __init__(self, name, method, path, data=None, auth=True, client='wsgi', expect=200, max_iterations=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.data = data
+        self.auth = auth
+        self.client = client
+        self.expect = expect
+        self.max_iterations = max_iterations  # caps slow scenarios such as PBKDF2 logins
+
+
+def build_scenarios(user, password):
+    """Return the scenarios for one benchmark user, with ids taken from the seeded data"""
+    busiest = models.UserProfile.objects.order_by('-follower_count').values_list('id', flat=True).first()
+    item = models.ProfileFeedItem.objects.order_by('-id').values_list('id', flat=True).first()
+    total = models.ProfileFeedItem.objects.count()
+    deep = models.ProfileFeedItem.objects.order_by('-created_on', '-id').values_list(
+        'created_on', 'id'
+    )[max(total // 2, 0):max(total // 2, 0) + 1].first()
+    since = urlencode({'since': (timezone.now() - timedelta(days=1)).isoformat()})
+    search_term = user.name.split()[0][:3]
+    login = {'username': user.email, 'password': password}
+
+    scenarios = [
+        Scenario('hello_view', 'get', '/api/hello-view/', auth=False),
+        Scenario('hello_viewset', 'get', '/api/hello-viewset/', auth=False),
+        Scenario('login', 'post', '/api/login/', data=login, auth=False, max_iterations=10),
+        Scenario('async_login', 'post', '/api/async/login/', data=login, auth=False, client='asgi',
+                 max_iterations=10),
+        Scenario('profile_list', 'get', '/api/profile/', auth=False),
+        Scenario('profile_search', 'get', f'/api/profile/?{urlencode({"search": search_term})}', auth=False),
+        Scenario('profile_autocomplete', 'get', f'/api/profile/autocomplete/?{urlencode({"q": search_term})}',
+                 auth=False),
+        Scenario('profile_detail', 'get', f'/api/profile/{user.id}/', auth=False),
+        Scenario('async_profile_list', 'get', '/api/async/profile/', auth=False, client='asgi'),
+        Scenario('feed_list', 'get', '/api/feed/'),
+        Scenario('feed_home', 'get', '/api/feed/home/'),
+        Scenario('feed_create', 'post', '/api/feed/', data={'status_text': 'benchmark status'}, expect=201),
+        Scenario('feed_batch', 'post', '/api/feed/batch/',
+                 data=[{'status_text': f'benchmark {i}'} for i in range(20)], expect=201),
+        Scenario('feed_export_since', 'get', f'/api/feed/export/?{since}'),
+        Scenario('async_feed_list', 'get', '/api/async/feed/', client='asgi'),
+        Scenario('cache_metrics', 'get', '/api/metrics/cache/', expect=403),
+    ]
+    if busiest is not None:
+        scenarios.append(Scenario('feed_user_timeline', 'get', f'/api/feed/?user_profile={busiest}'))
+    if deep is not None:
+        cursor = encode_position(*deep)
+        scenarios.append(Scenario('feed_list_deep_page', 'get', f'/api/feed/?cursor={cursor}'))
+    if item is not None:
+        scenarios.append(Scenario('feed_detail', 'get', f'/api/feed/{item}/'))
+    return scenarios
+
+
+@contextmanager
+def lifted_rate_limits():
+    """Raise every THROTTLE_RATES count out of reach and start from empty buckets
+
+    Each limit keeps its period: a bucket that a shared store, which cannot
+    be cleared, still holds from real traffic is then at most one period
+    behind, which the raised count catches up on in period / 1e9 seconds.
+    """
+    rates = {
+        key: None if rate is None else f'1000000000/{rate.split("/")[1]}'
+        for key, rate in getattr(settings, 'THROTTLE_RATES', {}).items()
+    }
+    with override_settings(THROTTLE_RATES=rates):
+        throttling.get_store().clear()
+        yield
+    throttling.get_store().clear()
+
+
+class Runner:
+    """Replays scenarios through the WSGI or ASGI test clients"""
+
+    def __init__(self, token, cold=False):
+        self.token = token
+        self.cold = cold
+        self.wsgi = Client(HTTP_ACCEPT='application/json')
+        self.asgi = AsyncClient()
+
+    def request(self, scenario):
+        if self.cold:
+            caches['default'].clear()
+        if scenario.client == 'asgi':
+            return self.request_asgi(scenario)
+
+        extra = {'HTTP_AUTHORIZATION': f'Token {self.token}'} if scenario.auth else {}
+        if scenario.method == 'get':
+            return self.wsgi.get(scenario.path, **extra)
+        return self.wsgi.post(scenario.path, scenario.data, content_type='application/json', **extra)
+
+    def request_asgi(self, scenario):
+        # AsyncClient turns extra keyword arguments into request headers
+        extra = {'AUTHORIZATION': f'Token {self.token}'} if scenario.auth else {}
+        if scenario.method == 'get':
+            return asyncio.run(self.asgi.get(scenario.path, **extra))
+        return asyncio.run(self.asgi.post(
+            scenario.path, json.dumps(scenario.data), content_type='application/json', **extra
+        ))
+
+    def consume(self, response):
+        """Drain streaming bodies so their cost is part of the timing"""
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+
+    def run_scenario(self, scenario, iterations, warmup):
+        with lifted_rate_limits():
+            return self.measure(scenario, iterations, warmup)
+
+    def measure(self, scenario, iterations, warmup):
+        if scenario.max_iterations:
+            iterations = min(iterations, scenario.max_iterations)
+            warmup = min(warmup, 1)
+        for _ in range(warmup):
+            self.consume(self.request(scenario))
+
+        latencies = []
+        status = None
+        for _ in range(iterations):
+            started = time.perf_counter()
+            response = self.request(scenario)
+            self.consume(response)
+            latencies.append(time.perf_counter() - started)
+            status = response.status_code
+
+        tracemalloc.start()
+        try:
+            # Reads may be routed to the replica, so count the queries of both
+            aliases = {DEFAULT_DB_ALIAS, database.replica_alias()} - {None}
+            with ExitStack() as stack:
+                captured = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in aliases]
+                self.consume(self.request(scenario))
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'method': scenario.method.upper(),
+            'path': scenario.path,
+            'client': scenario.client,
+            'status': status,
+            'ok': status == scenario.expect,
+            'iterations': iterations,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'mean_ms': sum(latencies) / len(latencies) * 1000,
+            # ASGI scenarios run their queries on a worker thread's connection, which is not captured
+            'queries': sum(len(ctx.captured_queries) for ctx in captured) if scenario.client == 'wsgi' else None,
+            'peak_memory_kb': peak / 1024,
+        }
+
+
+def get_token(user):
+    token, _ = Token.objects.get_or_create(user=user)
+    return token.key
+
+
+def compare(baseline, results):
+    """Yield (name, metric, old, new, change) for every shared latency metric"""
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'queries', 'peak_memory_kb'):
+            if old.get(metric) is None or result.get(metric) is None:
+                continue
+            change = (result[metric] - old[metric]) / old[metric] if old[metric] else 0.0
+            yield name, metric, old[metric], result[metric], change
@@ -0,0 +1,74 @@
+"""Per-view query budgets, so N+1 regressions fail loudly instead of slowing down quietly
+
+Views declare `query_budget` as the most queries one request may run, or as
+a dict of action (or HTTP method for plain APIViews) -> budget. The check is
+controlled by QUERY_BUDGET_MODE: 'raise' turns a breach into
+QueryBudgetExceeded, 'log' writes a warning, and None (production default)
+skips the bookkeeping. Either way the report lists the SQL statements that
+ran more than once, which is usually where the N+1 is.
+"""
+import logging
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    """A view ran more queries than its budget allows"""
+
+    def __init__(self, name, budget, statements):
+        self.name = name
+        self.budget = budget
+        self.statements = statements
+        self.repeated = [
+            (count, sql) for sql, count in Counter(statements).most_common() if count > 1
+        ]
+        lines = [f'{name} ran {len(statements)} queries, budget is {budget}']
+        lines.extend(f'  {count}x {sql}' for count, sql in self.repeated)
+        super().__init__('\n'.join(lines))
+
+
+@contextmanager
+def query_budget(name, budget):
+    """Check that the block runs at most `budget` queries on any connection"""
+    mode = getattr(settings, 'QUERY_BUDGET_MODE', None)
+    if budget is None or not mode:
+        yield
+        return
+
+    statements = []
+
+    def record(execute, sql, params, many, context):
+        statements.append(sql)
+        return execute(sql, params, many, context)
+
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(record))
+        yield
+
+    if len(statements) > budget:
+        error = QueryBudgetExceeded(name, budget, statements)
+        if mode == 'raise':
+            raise error
+        logger.warning('%s', error)
+
+
+class QueryBudgetMixin:
+    """Enforce `query_budget` around each request to an APIView or ViewSet"""
+    query_budget = None
+
+    def get_query_budget(self, action):
+        if isinstance(self.query_budget, dict):
+            return self.query_budget.get(action)
+        return self.query_budget
+
+    def dispatch(self, request, *args, **kwargs):
+        method = request.method.lower()
+        action = (getattr(self, 'action_map', None) or {}).get(method, method)
+        with query_budget(f'{type(self).__name__}.{action}', self.get_query_budget(action)):
+            return super().dispatch(request, *args, **kwargs)
@@ -0,0 +1,163 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from profiles_api import compression
+
+
+def get_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def version_key(resource, pk=None):
+    return f'profiles_api:version:{resource}:{"list" if pk is None else pk}'
+
+
+def get_version(resource, pk=None):
+    """Return the version of a resource: the time.time_ns() of its last change
+
+    A resource with no recorded version starts at "now", which costs one
+    extra 200 after a cache flush but is never stale.
+    """
+    cache = get_cache()
+    key = version_key(resource, pk)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(resource, pk=None):
+    """Mark a resource (and the list it belongs to) as changed once the transaction commits
+
+    Bumping earlier would let a concurrent read cache the old rows under
+    the new version, where they would stay until the next write.
+    """
+    bump_versions(resource, () if pk is None else (pk,))
+
+
+def bump_versions(resource, pks):
+    """bump_version() for several items of a resource at once"""
+    def bump():
+        now = time.time_ns()
+        keys = {version_key(resource): now}
+        keys.update((version_key(resource, pk), now) for pk in pks)
+        get_cache().set_many(keys, None)
+
+    transaction.on_commit(bump)
+
+
+class ResponseCacheStats:
+    """Process-local hit/miss counters for the conditional response cache"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.hits = 0
+        self.not_modified = 0
+        self.misses = 0
+
+    def record(self, outcome):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def as_dict(self):
+        with self._lock:
+            total = self.hits + self.not_modified + self.misses
+            return {
+                'hits': self.hits,
+                'not_modified': self.not_modified,
+                'misses': self.misses,
+                'hit_ratio': (self.hits + self.not_modified) / total if total else 0.0,
+            }
+
+
+stats = ResponseCacheStats()
+
+
+class ConditionalResponseMixin:
+    """Answer list/retrieve with ETag/Last-Modified, 304s and cached bodies
+
+    Each viewset names its `cache_resource`. Model signals bump the version
+    of that resource on every save or delete; the version feeds the ETag,
+    the Last-Modified date and the response cache key, so a change makes
+    every earlier ETag and cached body stale at once. Compressed copies of
+    a body live in the same cache entry (see profiles_api.compression), and
+    each encoding gets its own ETag.
+    """
+    cache_resource = None
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, None, super().list, args, kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        return self.conditional_response(request, pk, super().retrieve, args, kwargs)
+
+    def get_cache_version(self, pk):
+        """Return the version the response for `pk` (None for the list) depends on"""
+        return get_version(self.cache_resource, pk)
+
+    def conditional_response(self, request, pk, handler, args, kwargs):
+        version = self.get_cache_version(pk)
+        variant = f'{version}:{request.get_full_path()}:{request.accepted_media_type}'
+        digest = hashlib.sha1(variant.encode('utf-8')).hexdigest()
+        encoding = compression.accepted_encoding(request)
+        etag = f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+        last_modified = version // 1_000_000_000
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            stats.record('not_modified')
+        else:
+            response = self.cached_response(request, digest, encoding, handler, args, kwargs)
+
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+    def cached_response(self, request, digest, encoding, handler, args, kwargs):
+        """Serve the stored body for this variant, or render it and store it
+
+        Entries are (content, content_type, {encoding: compressed content}).
+        """
+        cache = get_cache()
+        cache_key = f'profiles_api:response:{self.cache_resource}:{digest}'
+        ttl = getattr(settings, 'RESPONSE_CACHE_TTL', 60)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            stats.record('hits')
+            content, content_type, encoded = cached
+            response = HttpResponse(content, content_type=content_type)
+            if encoding is not None and compression.should_compress(content):
+                if encoding not in encoded:
+                    encoded[encoding] = compression.compress(content, encoding)
+                    cache.set(cache_key, (content, content_type, encoded), ttl)
+                compression.set_body(response, encoded[encoding], encoding)
+            return response
+
+        stats.record('misses')
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200 and request.accepted_renderer.format == 'json':
+            def store(rendered):
+                encoded = {}
+                if encoding is not None and compression.should_compress(rendered.content):
+                    encoded[encoding] = compression.compress(rendered.content, encoding)
+                cache.set(cache_key, (rendered.content, rendered['Content-Type'], encoded), ttl)
+                if encoded:
+                    compression.set_body(rendered, encoded[encoding], encoding)
+
+            response.add_post_render_callback(store)
+        return response
@@ -0,0 +1,63 @@
+"""gzip/deflate for the bodies kept in the response cache
+
+ConditionalResponseMixin compresses a cacheable body once, in the encoding
+the first client asking for it accepts, and keeps the result in the same
+cache entry as the plain bytes. Later hits for that encoding send the
+stored bytes instead of compressing again, which is what GZipMiddleware
+would do on every request. Bodies under RESPONSE_COMPRESSION_MIN_SIZE go
+out as they are; the header and CPU would cost more than they save.
+"""
+import gzip
+import zlib
+
+from django.conf import settings
+
+ENCODERS = {
+    # mtime=0 keeps the output, and so the cached bytes, identical for identical input
+    'gzip': lambda content, level: gzip.compress(content, compresslevel=level, mtime=0),
+    # HTTP's "deflate" is the zlib format, not a raw deflate stream
+    'deflate': lambda content, level: zlib.compress(content, level),
+}
+
+
+def accepted_encoding(request, encodings=None):
+    """Return the entry of `encodings` (RESPONSE_COMPRESSION_ENCODINGS by default) the request prefers, or None"""
+    accepted = {}
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = part.partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name.strip():
+            accepted[name.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    if encodings is None:
+        encodings = getattr(settings, 'RESPONSE_COMPRESSION_ENCODINGS', ('gzip', 'deflate'))
+    for encoding in encodings:
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def should_compress(content):
+    return len(content) >= getattr(settings, 'RESPONSE_COMPRESSION_MIN_SIZE', 1024)
+
+
+def compress(content, encoding, level=None):
+    if level is None:
+        level = getattr(settings, 'RESPONSE_COMPRESSION_LEVEL', 6)
+    return ENCODERS[encoding](content, level)
+
+
+def set_body(response, body, encoding):
+    """Replace a response's body with its `encoding`-compressed form"""
+    response.content = body
+    response['Content-Encoding'] = encoding
+    response['Content-Length'] = str(len(body))
@@ -0,0 +1,83 @@
+"""SQLite connection tuning and read-replica routing
+
+tune_connection runs on connection_created and applies SQLITE_PRAGMAS.
+WAL is the important one: readers work from the last committed snapshot
+instead of waiting on the writer's lock. The 'replica' alias is a second,
+read-only (mode=ro) connection to the same file. ReadReplicaRouter only
+sends reads there inside read_replica(), which the profile and feed
+viewsets enter for safe methods; everything else stays on 'default', so a
+request never reads its own writes through another connection.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+_use_replica = ContextVar('profiles_api_use_replica', default=False)
+
+
+def is_read_only(connection):
+    return 'mode=ro' in str(connection.settings_dict['NAME'])
+
+
+def tune_connection(connection):
+    """Apply SQLITE_PRAGMAS to a freshly opened SQLite connection"""
+    if connection.vendor != 'sqlite':
+        return
+    read_only = is_read_only(connection)
+    for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+        if read_only and name == 'journal_mode':
+            continue  # stored in the file by the primary; a read-only connection cannot change it
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+def replica_alias():
+    """Return the read replica alias, or None when it is missing or just the primary again"""
+    alias = getattr(settings, 'DATABASE_READ_REPLICA', None)
+    if alias is None or alias not in settings.DATABASES:
+        return None
+    # Test mirrors reuse the primary's settings; reading through a second connection
+    # there would not see the test's uncommitted rows
+    if connections[alias].settings_dict['NAME'] == connections[DEFAULT_DB_ALIAS].settings_dict['NAME']:
+        return None
+    return alias
+
+
+@contextmanager
+def read_replica():
+    """Route ORM reads in the block to the read replica"""
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReadReplicaRouter:
+    """Reads go to the replica inside read_replica(), everything else to the primary"""
+
+    def db_for_read(self, model, **hints):
+        if _use_replica.get():
+            return replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # both aliases are the same database
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReadReplicaMixin:
+    """Serve GET/HEAD/OPTIONS requests of a view from the read replica"""
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return super().dispatch(request, *args, **kwargs)
+        with read_replica():
+            return super().dispatch(request, *args, **kwargs)
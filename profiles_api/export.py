@@ -0,0 +1,73 @@
+import heapq
+import json
+import zlib
+from operator import itemgetter
+
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+EXPORT_FIELDS = ('id', 'user_profile_id', 'status_text', 'created_on')
+
+_datetime_field = serializers.DateTimeField()
+
+
+def parse_bound(name, value):
+    """Parse a since/until bound the same way the API parses datetimes"""
+    if not value:
+        return None
+    try:
+        return _datetime_field.to_internal_value(value)
+    except ValidationError as exc:
+        raise ValidationError({name: exc.detail})
+
+
+def filter_created_on(queryset, since=None, until=None):
+    """Restrict an export to since <= created_on < until"""
+    if since is not None:
+        queryset = queryset.filter(created_on__gte=since)
+    if until is not None:
+        queryset = queryset.filter(created_on__lt=until)
+    return queryset
+
+
+def iter_ndjson(queryset, chunk_size=2000, block_size=64 * 1024, archived=None):
+    """Yield feed items as newline-delimited JSON in blocks of about `block_size` bytes
+
+    Rows come straight from values_list() through a server-side iterator, so
+    memory stays flat however many rows are exported. Lines match
+    ProfileFeedItemSerializer output. `archived` rows in the same shape and
+    id order (see archive.iter_archived) are merged in by id.
+    """
+    rows = queryset.order_by('id').values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+    if archived is not None:
+        rows = heapq.merge(rows, archived, key=itemgetter(0))
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    to_representation = _datetime_field.to_representation
+    block = []
+    size = 0
+    for pk, user_profile_id, status_text, created_on in rows:
+        line = encode({
+            'id': pk,
+            'user_profile': user_profile_id,
+            'status_text': status_text,
+            'created_on': to_representation(created_on),
+        }).encode('utf-8') + b'\n'
+        block.append(line)
+        size += len(line)
+        if size >= block_size:
+            yield b''.join(block)
+            block = []
+            size = 0
+    if block:
+        yield b''.join(block)
+
+
+def gzip_stream(chunks, level=6):
+    """Compress an iterable of byte strings on the fly into a gzip stream"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        # Sync-flush each block so the client sees steady progress
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,107 @@
+"""Read-only fast path for serializing list responses
+
+DRF serializes a list by building a model instance per row and walking the
+serializer's field tree for each one. For flat ModelSerializers the output
+only depends on a handful of columns, so RowSerializer compiles the
+serializer's readable fields once into (name, column, converter) triples and
+turns values_list() rows straight into output dicts, using the same
+to_representation calls so the JSON comes out byte-identical.
+"""
+from rest_framework import relations
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from profiles_api import profiling
+
+_compiled = {}
+
+
+class RowSerializer:
+    """Serialize values_list() rows the way `serializer_class` serializes instances"""
+
+    def __init__(self, serializer_class, fields):
+        self.serializer_class = serializer_class
+        self.names = [name for name, _, _ in fields]
+        self.columns = [column for _, column, _ in fields]
+        self.converters = [converter for _, _, converter in fields]
+
+    def values(self, queryset, extra=()):
+        """Narrow `queryset` to the needed columns, yielding named rows
+
+        `extra` columns are fetched after the serialized ones, for the
+        paginator's cursor; serialize() leaves them out of the output.
+        """
+        extra = [column for column in extra if column not in self.columns]
+        return queryset.values_list(*self.columns, *extra, named=True)
+
+    def serialize(self, rows):
+        """Return the list of output dicts for `rows`"""
+        names = self.names
+        converters = self.converters
+        with profiling.timing('serialize'):
+            return [
+                dict(zip(names, [
+                    value if converter is None or value is None else converter(value)
+                    for converter, value in zip(converters, row)
+                ]))
+                for row in rows
+            ]
+
+
+def compile_field(field):
+    """Return (column, converter) for a field, or None if it needs a model instance"""
+    if field.source == '*' or '.' in field.source:
+        return None
+    if isinstance(field, (serializers.BaseSerializer, serializers.SerializerMethodField,
+                          relations.ManyRelatedField)):
+        return None
+    if isinstance(field, relations.RelatedField):
+        if not isinstance(field, relations.PrimaryKeyRelatedField) or field.pk_field is not None:
+            return None
+        # PrimaryKeyRelatedField renders the bare pk, which is what values_list() returns
+        return field.source, None
+
+    return field.source, field.to_representation
+
+
+def get_row_serializer(serializer_class, only=None):
+    """Return the compiled RowSerializer for `serializer_class`, or None if it is not flat
+
+    `only` narrows it to a tuple of field names (see fieldsets), so only
+    their columns are read.
+    """
+    key = (serializer_class, only)
+    if key not in _compiled:
+        serializer = serializer_class() if only is None else serializer_class(fields=only)
+        fields = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            compiled = compile_field(field)
+            if compiled is None:
+                fields = None
+                break
+            fields.append((name, *compiled))
+        _compiled[key] = RowSerializer(serializer_class, fields) if fields else None
+
+    return _compiled[key]
+
+
+class FastListMixin:
+    """Serve `list` from values_list() rows when the serializer is flat"""
+
+    def get_row_serializer(self):
+        return get_row_serializer(self.get_serializer_class())
+
+    def list(self, request, *args, **kwargs):
+        row_serializer = self.get_row_serializer()
+        if row_serializer is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = row_serializer.values(
+            self.filter_queryset(self.get_queryset()), extra=getattr(self.paginator, 'cursor_fields', ())
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(row_serializer.serialize(page))
+        return Response(row_serializer.serialize(queryset))
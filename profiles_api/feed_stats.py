@@ -0,0 +1,154 @@
+"""Per-user status count and last post time, maintained as statuses come and go
+
+UserFeedStats is bumped in the same transaction as the insert or delete
+that changes it (see UserProfileFeedViewSet and the write-behind writer),
+so "how many statuses, and when was the last one" is a primary key lookup
+instead of a COUNT/MAX over ProfileFeedItem. Archived statuses still
+count. Writes that bypass those paths (the admin, raw SQL) leave drift
+behind, which `manage.py reconcile_feed_stats` measures and repairs.
+"""
+from collections import defaultdict
+
+from django.db import connection, transaction
+
+from profiles_api import archive
+from profiles_api import caching
+from profiles_api import models
+
+STATS_TABLE = models.UserFeedStats._meta.db_table
+
+
+def record_created(feed_items):
+    """Count new feed items towards their authors' stats"""
+    by_author = defaultdict(list)
+    for feed_item in feed_items:
+        by_author[feed_item.user_profile_id].append(feed_item.created_on)
+    if not by_author:
+        return
+
+    adapt = connection.ops.adapt_datetimefield_value
+    with connection.cursor() as cursor:
+        # Upsert so concurrent first posts cannot both insert; MAX() keeps the newest time
+        cursor.executemany(
+            f'INSERT INTO {STATS_TABLE} (user_profile_id, status_count, last_posted_on) VALUES (%s, %s, %s) '
+            f'ON CONFLICT (user_profile_id) DO UPDATE SET '
+            f'status_count = status_count + excluded.status_count, '
+            f'last_posted_on = MAX(COALESCE(last_posted_on, excluded.last_posted_on), excluded.last_posted_on)',
+            [(author, len(times), adapt(max(times))) for author, times in by_author.items()]
+        )
+    for author in by_author:
+        caching.bump_version('feed_stats', author)
+
+
+def record_deleted(feed_item):
+    """Take a deleted feed item out of its author's stats; call after the DELETE
+
+    archive_chunk moves the oldest statuses first, so archived statuses are
+    all older than live ones and only need reading once an author with
+    statuses left has no live one.
+    """
+    items = models.ProfileFeedItem._meta.db_table
+    author = feed_item.user_profile_id
+    adapt = connection.ops.adapt_datetimefield_value
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {STATS_TABLE} SET status_count = MAX(status_count - 1, 0), '
+            f'last_posted_on = CASE WHEN last_posted_on <= %s '
+            f'THEN (SELECT MAX(created_on) FROM {items} WHERE user_profile_id = %s) '
+            f'ELSE last_posted_on END '
+            f'WHERE user_profile_id = %s RETURNING status_count, last_posted_on',
+            [adapt(feed_item.created_on), author, author]
+        )
+        row = cursor.fetchone()
+        if row is not None and row[0] and row[1] is None:
+            cursor.execute(
+                f'UPDATE {STATS_TABLE} SET last_posted_on = %s WHERE user_profile_id = %s',
+                [adapt(last_archived(cursor, author)), author]
+            )
+    caching.bump_version('feed_stats', author)
+
+
+def last_archived(cursor, user_id):
+    """Return the created_on of `user_id`'s newest archived status, or None"""
+    for month in reversed(archive.archive_months()):
+        cursor.execute(
+            f'SELECT MAX(created_on) FROM {archive.archive_table(month)} WHERE user_profile_id = %s', [user_id]
+        )
+        last = cursor.fetchone()[0]
+        if last is not None:
+            return archive.to_datetime(last)
+    return None
+
+
+def aggregate(cursor, table, user_ids=None):
+    """Return {user_id: (count, last created_on)} from one feed or archive table"""
+    where, params = '', []
+    if user_ids is not None:
+        where = f'WHERE user_profile_id IN ({", ".join(["%s"] * len(user_ids))})'
+        params = list(user_ids)
+    cursor.execute(
+        f'SELECT user_profile_id, COUNT(*), MAX(created_on) FROM {table} {where} GROUP BY user_profile_id',
+        params
+    )
+    return {user_id: (count, archive.to_datetime(last)) for user_id, count, last in cursor.fetchall()}
+
+
+def combine(totals, other):
+    for user_id, (count, last) in other.items():
+        old_count, old_last = totals.get(user_id, (0, None))
+        totals[user_id] = (old_count + count, last if old_last is None or last > old_last else old_last)
+
+
+def reconcile(batch_size=1000, fix=True):
+    """Compare every user's stats with the statuses on disk, batch by batch
+
+    Yields (user_id, stored, actual) for each user whose stats drifted, where
+    stored and actual are (count, last_posted_on). With `fix`, each batch's
+    drifted rows are overwritten in the same transaction that measured them.
+    """
+    with connection.cursor() as cursor:
+        # Archives only change when archive_feed runs, so read them once
+        archived = {}
+        for month in archive.archive_months():
+            combine(archived, aggregate(cursor, archive.archive_table(month)))
+
+    last_id = 0
+    while True:
+        user_ids = list(models.UserProfile.objects.filter(pk__gt=last_id).order_by('pk').values_list(
+            'pk', flat=True
+        )[:batch_size])
+        if not user_ids:
+            return
+        last_id = user_ids[-1]
+        with transaction.atomic():
+            drifted = reconcile_batch(user_ids, archived, fix)
+        yield from drifted
+
+
+def reconcile_batch(user_ids, archived, fix):
+    items = models.ProfileFeedItem._meta.db_table
+    with connection.cursor() as cursor:
+        actual = {user_id: archived[user_id] for user_id in user_ids if user_id in archived}
+        combine(actual, aggregate(cursor, items, user_ids))
+        stored = {
+            row.user_profile_id: (row.status_count, row.last_posted_on)
+            for row in models.UserFeedStats.objects.filter(user_profile_id__in=user_ids)
+        }
+
+        drifted = []
+        for user_id in user_ids:
+            expected = actual.get(user_id, (0, None))
+            current = stored.get(user_id, (0, None))
+            if current != expected:
+                drifted.append((user_id, current, expected))
+        if fix and drifted:
+            adapt = connection.ops.adapt_datetimefield_value
+            cursor.executemany(
+                f'INSERT INTO {STATS_TABLE} (user_profile_id, status_count, last_posted_on) VALUES (%s, %s, %s) '
+                f'ON CONFLICT (user_profile_id) DO UPDATE SET '
+                f'status_count = excluded.status_count, last_posted_on = excluded.last_posted_on',
+                [(user_id, count, adapt(last)) for user_id, _, (count, last) in drifted]
+            )
+            for user_id, _, _ in drifted:
+                caching.bump_version('feed_stats', user_id)
+    return drifted
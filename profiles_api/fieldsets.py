@@ -0,0 +1,77 @@
+"""Sparse fieldsets: ?fields=id,name on list and retrieve
+
+SparseFieldsSerializerMixin takes a `fields=` tuple and drops every other
+field. SparseFieldsMixin reads ?fields= for list and retrieve, hands it to
+the serializer and narrows the queryset to the columns behind those
+fields: the fast list path compiles a RowSerializer whose values_list()
+only names them, and the ORM paths load the rest deferred with .only().
+Writes ignore ?fields=; their serializers need every field for the input.
+"""
+from rest_framework.exceptions import ValidationError
+
+from profiles_api import fast_serializers
+
+_readable = {}
+
+
+def readable_fields(serializer_class):
+    """Return the names `serializer_class` outputs, in order"""
+    if serializer_class not in _readable:
+        _readable[serializer_class] = tuple(
+            name for name, field in serializer_class().fields.items() if not field.write_only
+        )
+    return _readable[serializer_class]
+
+
+def parse_fields(value, serializer_class):
+    """Turn a ?fields= value into a tuple of field names in serializer order, or None for all of them"""
+    if not value:
+        return None
+    requested = {name.strip() for name in value.split(',')} - {''}
+    if not requested:
+        return None
+    readable = readable_fields(serializer_class)
+    unknown = requested.difference(readable)
+    if unknown:
+        raise ValidationError({'fields': [f'Unknown field(s): {", ".join(sorted(unknown))}.']})
+    return tuple(name for name in readable if name in requested)
+
+
+class SparseFieldsSerializerMixin:
+    """Accept `fields=` (a tuple of field names) and drop every other field"""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields).difference(fields):
+                self.fields.pop(name)
+
+
+class SparseFieldsMixin:
+    """Serve ?fields= for list and retrieve, reading only the columns the chosen fields need"""
+    sparse_actions = ('list', 'retrieve')
+
+    def get_sparse_fields(self):
+        if self.action not in self.sparse_actions:
+            return None
+        return parse_fields(self.request.query_params.get('fields'), self.get_serializer_class())
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            kwargs['fields'] = fields
+        return super().get_serializer(*args, **kwargs)
+
+    def get_row_serializer(self):
+        return fast_serializers.get_row_serializer(self.get_serializer_class(), self.get_sparse_fields())
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.get_sparse_fields()
+        if fields is None:
+            return queryset
+        # Annotations and computed fields have no column; the pk and cursor columns are always needed
+        concrete = {field.name for field in queryset.model._meta.concrete_fields}
+        sources = {field.source for field in self.get_serializer_class()(fields=fields).fields.values()}
+        columns = {queryset.model._meta.pk.name, *getattr(self.paginator, 'cursor_fields', ())}
+        return queryset.only(*columns.union(sources.intersection(concrete)))
@@ -0,0 +1,73 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PoolSaturated(Exception):
+    """Raised when the hashing pool has no free worker or queue slot"""
+
+    def __init__(self, retry_after):
+        super().__init__('Password hashing pool is saturated')
+        self.retry_after = retry_after
+
+
+class HashingPool:
+    """Size-limited thread pool for password hashing and verification
+
+    hashlib's PBKDF2 releases the GIL, so threads give real parallelism
+    while keeping the CPU-heavy work off the event loop. At most
+    `workers + max_queue` jobs may be in flight; beyond that `submit` fails
+    immediately with PoolSaturated instead of letting requests pile up.
+    """
+
+    def __init__(self, workers, max_queue, retry_after=1):
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+
+    def submit(self, fn, *args):
+        """Schedule `fn(*args)` and return its concurrent future"""
+        if not self._slots.acquire(blocking=False):
+            raise PoolSaturated(self.retry_after)
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    async def run(self, fn, *args):
+        """Await `fn(*args)` on the pool from async code"""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    async def make_password(self, password):
+        return await self.run(hashers.make_password, password)
+
+    async def check_password(self, password, encoded):
+        return await self.run(hashers.check_password, password, encoded)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_hashing_pool():
+    """Return the process-wide hashing pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = HashingPool(
+                    workers=getattr(settings, 'PASSWORD_HASHING_WORKERS', None) or os.cpu_count() or 2,
+                    max_queue=getattr(settings, 'PASSWORD_HASHING_MAX_QUEUE', 32),
+                    retry_after=getattr(settings, 'PASSWORD_HASHING_RETRY_AFTER', 1),
+                )
+    return _pool
@@ -0,0 +1,66 @@
+import time
+
+from django.contrib import admin
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from profiles_api import models
+from profiles_api import pagination
+from profiles_api.admin import estimated_count
+
+
+class StockFeedItemAdmin(admin.ModelAdmin):
+    """What a plain ModelAdmin with the same date hierarchy and search gives"""
+    date_hierarchy = 'created_on'
+    search_fields = ('user_profile__name', 'user_profile__email')
+
+
+class Command(BaseCommand):
+    """Time the ProfileFeedItem changelist with a stock ModelAdmin and with ProfileFeedItemAdmin"""
+    help = (
+        'Render the feed item admin changelist (first page, a page halfway down, one year, an author search) '
+        'with both admins and report render time and query count. Seed with seed_benchmark_data first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        queryset = models.ProfileFeedItem.objects.order_by('-created_on', '-id')
+        middle = queryset.values_list('created_on', 'id')[estimated_count(models.ProfileFeedItem) // 2:].first()
+        if middle is None:
+            self.stdout.write('No feed items; run seed_benchmark_data first')
+            return
+        author = models.UserProfile.objects.order_by('-follower_count').first()
+        stock = StockFeedItemAdmin(models.ProfileFeedItem, admin.site)
+        tuned = admin.site._registry[models.ProfileFeedItem]
+        deep_page = queryset.filter(created_on__gte=middle[0]).count() // stock.list_per_page + 1
+
+        cases = (
+            ('first page', {}, {}),
+            ('middle page', {'p': deep_page}, {'cursor': pagination.encode_position(*middle)}),
+            ('one year', {'created_on__year': middle[0].year}, {'created_on__year': middle[0].year}),
+            ('author search', {'q': author.email}, {'q': author.email}),
+        )
+        self.stdout.write(f'~{estimated_count(models.ProfileFeedItem)} feed items')
+        for name, stock_params, tuned_params in cases:
+            for label, model_admin, params in (('stock', stock, stock_params), ('tuned', tuned, tuned_params)):
+                elapsed, queries = self.time_changelist(model_admin, params, options['repeat'])
+                self.stdout.write(f'{name:>14} {label}: {elapsed * 1000:9.1f}ms {queries:3d} queries')
+
+    def time_changelist(self, model_admin, params, repeat):
+        user = models.UserProfile(email='bench-admin@example.com', is_staff=True, is_superuser=True)
+        best = float('inf')
+        for _ in range(repeat):
+            request = RequestFactory().get('/admin/profiles_api/profilefeeditem/', params)
+            request.user = user
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = model_admin.changelist_view(request)
+                response.render()
+                best = min(best, time.perf_counter() - started)
+            if response.status_code != 200:
+                raise RuntimeError(f'{type(model_admin).__name__} answered {response.status_code} for {params}')
+        return best, len(queries)
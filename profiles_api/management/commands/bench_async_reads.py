@@ -0,0 +1,82 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client
+from django.test.utils import setup_test_environment
+
+from profiles_api.profiling import percentile
+
+
+class Command(BaseCommand):
+    """Compare concurrent read throughput of the WSGI viewsets and the async views"""
+    help = (
+        'Fire the same GETs at the DRF viewsets through the WSGI handler (one thread per '
+        'concurrent client) and at /api/async/ through the ASGI handler (one task per client), '
+        'in process against the configured database, and report requests/s and latency.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--token', help='Auth token; without it only the public profile endpoints are run')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=16)
+
+    def handle(self, *args, **options):
+        setup_test_environment()  # lets the test clients through ALLOWED_HOSTS
+        auth = f'Token {options["token"]}' if options['token'] else None
+        endpoints = ['/api/profile/']
+        if options['token']:
+            endpoints.append('/api/feed/')
+
+        for endpoint in endpoints:
+            async_endpoint = '/api/async/' + endpoint[len('/api/'):]
+            for mode, runner, url in (
+                ('wsgi', self.run_wsgi, endpoint),
+                ('asgi', self.run_asgi, async_endpoint),
+            ):
+                elapsed, latencies = runner(url, auth, options['requests'], options['concurrency'])
+                self.stdout.write(
+                    f'{mode} {url}: {len(latencies) / elapsed:.1f} req/s '
+                    f'p50={statistics.median(latencies) * 1000:.2f}ms '
+                    f'p95={percentile(latencies, 0.95) * 1000:.2f}ms'
+                )
+
+    def run_wsgi(self, url, auth, total, concurrency):
+        headers = {'HTTP_AUTHORIZATION': auth} if auth else {}
+
+        def worker(count):
+            client = Client(HTTP_ACCEPT='application/json', **headers)
+            latencies = []
+            for _ in range(count):
+                started = time.perf_counter()
+                client.get(url)
+                latencies.append(time.perf_counter() - started)
+            return latencies
+
+        shares = [total // concurrency + (i < total % concurrency) for i in range(concurrency)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(worker, shares))
+        return time.perf_counter() - started, [latency for result in results for latency in result]
+
+    def run_asgi(self, url, auth, total, concurrency):
+        # AsyncClient turns extra keyword arguments into lower-cased request headers
+        headers = {'AUTHORIZATION': auth} if auth else {}
+
+        async def worker(count, latencies):
+            client = AsyncClient()
+            for _ in range(count):
+                started = time.perf_counter()
+                await client.get(url, **headers)
+                latencies.append(time.perf_counter() - started)
+
+        async def main():
+            latencies = []
+            shares = [total // concurrency + (i < total % concurrency) for i in range(concurrency)]
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(count, latencies) for count in shares))
+            return time.perf_counter() - started, latencies
+
+        return asyncio.run(main())
@@ -0,0 +1,71 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.test.utils import setup_test_environment
+from rest_framework.test import APIClient
+
+from profiles_api import caching
+from profiles_api import compression
+from profiles_api import models
+
+
+class Command(BaseCommand):
+    """Compare bytes saved with CPU spent for each encoding and level, and a cached hit with recompressing"""
+    help = (
+        'Compress a first page of /api/feed/ and of /api/profile/ at each level, reporting the size ratio and '
+        'the time per compression, then time repeat GETs served from the response cache. '
+        'Seed with seed_benchmark_data first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--levels', default='1,6,9')
+
+    def handle(self, *args, **options):
+        setup_test_environment()  # lets the test clients through ALLOWED_HOSTS
+        user = models.UserProfile.objects.order_by('-follower_count').first()
+        if user is None:
+            self.stdout.write('No profiles; run seed_benchmark_data first')
+            return
+        client = APIClient()
+        client.force_authenticate(user)
+        repeat = options['repeat']
+        levels = [int(level) for level in options['levels'].split(',')]
+
+        for path in ('/api/feed/', '/api/profile/'):
+            response = client.get(path)
+            if response.status_code != 200:
+                raise RuntimeError(f'{path} answered {response.status_code}')
+            content = response.content
+            self.stdout.write(f'{path} ({len(content)} bytes)')
+            for encoding in compression.ENCODERS:
+                for level in levels:
+                    started = time.perf_counter()
+                    for _ in range(repeat):
+                        body = compression.compress(content, encoding, level)
+                    elapsed = (time.perf_counter() - started) / repeat
+                    self.stdout.write(
+                        f'  {encoding:>7} level {level}: {len(body):7d} bytes, '
+                        f'{1 - len(body) / len(content):6.1%} saved, {elapsed * 1e6:8.1f}us'
+                    )
+
+        # The same request with compression off, served from the cache and recompressed per request
+        # the way GZipMiddleware would, and served from the cache with the stored compressed bytes
+        path = '/api/feed/'
+        cases = (
+            ('cached, plain', (), {}),
+            ('cached, recompressed each time', (), {'HTTP_ACCEPT_ENCODING': 'gzip'}),
+            ('cached, stored gzip', ('gzip', 'deflate'), {'HTTP_ACCEPT_ENCODING': 'gzip'}),
+        )
+        for label, encodings, headers in cases:
+            with override_settings(RESPONSE_COMPRESSION_ENCODINGS=encodings):
+                caching.get_cache().clear()
+                client.get(path, **headers)
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    body = client.get(path, **headers).content
+                    if headers and not encodings:
+                        body = compression.compress(body, 'gzip')
+                elapsed = (time.perf_counter() - started) / repeat
+            self.stdout.write(f'{label:>32}: {elapsed * 1e6:8.1f}us per GET, {len(body)} bytes sent')
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from profiles_api import fast_serializers
+from profiles_api import models
+from profiles_api import serializers
+
+
+class Command(BaseCommand):
+    """Time the fast row serializers against the DRF serializers"""
+    help = 'Serialize the first N profiles and feed items both ways and report time per 1000 rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        cases = (
+            (serializers.UserProfileSerializer, models.UserProfile.objects.order_by('id')),
+            (serializers.ProfileFeedItemSerializer, models.ProfileFeedItem.objects.order_by('id')),
+        )
+        render = JSONRenderer().render
+        for serializer_class, queryset in cases:
+            queryset = queryset[:options['rows']]
+            row_serializer = fast_serializers.get_row_serializer(serializer_class)
+
+            def drf():
+                return render(serializer_class(queryset.all(), many=True).data)
+
+            def fast():
+                return render(row_serializer.serialize(row_serializer.values(queryset.all())))
+
+            count = queryset.count()
+            if not count:
+                self.stdout.write(f'{serializer_class.__name__}: no rows, skipped')
+                continue
+            drf_time = self.best_of(drf, options['repeat'])
+            fast_time = self.best_of(fast, options['repeat'])
+            self.stdout.write(
+                f'{serializer_class.__name__} ({count} rows): '
+                f'drf={drf_time / count * 1e6:.1f}ms/1k rows fast={fast_time / count * 1e6:.1f}ms/1k rows '
+                f'speedup={drf_time / fast_time:.1f}x identical={drf() == fast()}'
+            )
+
+    @staticmethod
+    def best_of(fn, repeat):
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - started)
+        return best
@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+
+from profiles_api import throttling
+from profiles_api import views
+
+
+class Command(BaseCommand):
+    """Time a throttle check on its own and as part of a login request"""
+    help = 'Report the cost of one token-bucket check, from the store up to a throttled view'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checks', type=int, default=200000)
+        parser.add_argument('--keys', type=int, default=10000, help='Distinct clients spread over the checks')
+        parser.add_argument('--requests', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        checks, keys = options['checks'], options['keys']
+        idents = [f'10.0.{i // 256}.{i % 256}' for i in range(keys)]
+
+        store = throttling.LocalBucketStore()
+        started = time.perf_counter()
+        for i in range(checks):
+            store.consume(idents[i % keys], 1000000, 60)
+        self.report('LocalBucketStore.consume', time.perf_counter() - started, checks)
+
+        store = throttling.CacheBucketStore('default')
+        started = time.perf_counter()
+        for i in range(checks):
+            store.consume(idents[i % keys], 1000000, 60)
+        self.report('CacheBucketStore.consume (default cache)', time.perf_counter() - started, checks)
+
+        # A malformed login never reaches the database or the password hasher, so the
+        # difference between these two is the throttles and nothing else
+        factory = APIRequestFactory()
+        view = views.UserLoginApiView.as_view()
+        unlimited = {'login_ip': None, 'login_user': None}
+        limited = {'login_ip': '1000000/min', 'login_user': '1000000/min'}
+        for label, rates in (('login, no limits', unlimited), ('login, IP + user limits', limited)):
+            with override_settings(THROTTLE_RATES=rates):
+                throttling.get_store().clear()
+                started = time.perf_counter()
+                for i in range(options['requests']):
+                    request = factory.post('/api/login/', {'username': f'user{i % keys}@example.com'},
+                                           REMOTE_ADDR=idents[i % keys])
+                    view(request).render()
+                self.report(label, time.perf_counter() - started, options['requests'])
+
+    def report(self, label, elapsed, count):
+        self.stdout.write(f'{label:>42}: {elapsed / count * 1e6:8.2f}us per call')
@@ -0,0 +1,45 @@
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from profiles_api import archive
+from profiles_api import export
+from profiles_api import models
+
+
+class Command(BaseCommand):
+    """Export feed items as newline-delimited JSON"""
+    help = 'Stream ProfileFeedItem rows, archived ones included, as NDJSON to a file or stdout, optionally gzip-compressed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', default='-', help='Output file, or - for stdout')
+        parser.add_argument('--since', help='Only items created at or after this datetime')
+        parser.add_argument('--until', help='Only items created before this datetime')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output with gzip')
+        parser.add_argument('--chunk-size', type=int, default=getattr(settings, 'FEED_EXPORT_CHUNK_SIZE', 2000))
+
+    def handle(self, *args, **options):
+        try:
+            since = export.parse_bound('since', options['since'])
+            until = export.parse_bound('until', options['until'])
+        except ValidationError as exc:
+            raise CommandError(exc.detail)
+
+        queryset = export.filter_created_on(models.ProfileFeedItem.objects.all(), since=since, until=until)
+        archived = archive.iter_archived(since, until, chunk_size=options['chunk_size'])
+        chunks = export.iter_ndjson(queryset, chunk_size=options['chunk_size'], archived=archived)
+        if options['gzip']:
+            chunks = export.gzip_stream(chunks)
+
+        if options['output'] == '-':
+            out = sys.stdout.buffer
+        else:
+            out = open(options['output'], 'wb')
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+        finally:
+            if out is not sys.stdout.buffer:
+                out.close()
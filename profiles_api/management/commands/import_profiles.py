@@ -0,0 +1,131 @@
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.contrib.auth import hashers
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from profiles_api import autocomplete
+from profiles_api import caching
+from profiles_api import models
+from profiles_api import search
+
+
+def init_worker(settings_module):
+    """Make sure worker processes have Django configured before hashing"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def hash_password(password):
+    return hashers.make_password(password or None)
+
+
+def read_rows(stream, fmt):
+    """Yield one dict per input record without reading the whole file"""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+class Command(BaseCommand):
+    """Bulk import user profiles from CSV or JSON lines"""
+    help = (
+        'Stream user profiles (email, name, password) from a CSV or JSONL file, hash the passwords '
+        'in a process pool and insert them in batches. Use --offset to resume an interrupted import.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Input file, or - for stdin')
+        parser.add_argument('--format', choices=('csv', 'jsonl'), help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+        parser.add_argument('--offset', type=int, default=0, help='Number of input records to skip')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+
+        self.verbosity = options['verbosity']
+        offset = options['offset']
+        self.imported = self.skipped = 0
+        started = time.monotonic()
+        settings_module = os.environ.get('DJANGO_SETTINGS_MODULE', 'profiles_project.settings')
+        try:
+            with ProcessPoolExecutor(
+                max_workers=options['workers'], initializer=init_worker, initargs=(settings_module,)
+            ) as pool:
+                rows = islice(read_rows(stream, fmt), offset, None)
+                while True:
+                    batch = list(islice(rows, options['batch_size']))
+                    if not batch:
+                        break
+                    self.import_batch(batch, pool, options['workers'])
+                    offset += len(batch)
+                    self.report(offset, started, verbosity=2)
+        except (KeyboardInterrupt, Exception) as exc:
+            self.stderr.write(f'Stopped at offset {offset}; rerun with --offset {offset} to resume')
+            if isinstance(exc, KeyboardInterrupt):
+                sys.exit(1)
+            raise CommandError(str(exc)) from exc
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.report(offset, started, verbosity=1)
+
+    def import_batch(self, batch, pool, workers):
+        """Normalize, dedupe, hash and insert one batch of input records"""
+        normalize = models.UserProfile.objects.normalize_email
+        candidates = {}
+        for row in batch:
+            email = normalize((row.get('email') or '').strip())
+            name = (row.get('name') or '').strip()
+            if not email or not name or email in candidates:
+                self.skipped += 1
+                continue
+            candidates[email] = (name, row.get('password'))
+
+        # Earlier batches are already committed, so the table catches repeats across batches
+        existing = set(models.UserProfile.objects.filter(
+            email__in=list(candidates)
+        ).values_list('email', flat=True))
+        self.skipped += len(existing)
+        emails = [email for email in candidates if email not in existing]
+
+        passwords = [candidates[email][1] for email in emails]
+        hashes = pool.map(hash_password, passwords, chunksize=max(1, len(passwords) // (workers * 4)))
+        profiles = [
+            models.UserProfile(email=email, name=candidates[email][0], password=password_hash)
+            for email, password_hash in zip(emails, hashes)
+        ]
+        with transaction.atomic():
+            profiles = models.UserProfile.objects.bulk_create(profiles)
+            # bulk_create skips post_save, so index the new rows here
+            search.get_search_backend().index_profiles(profiles)
+            autocomplete.index_profiles(profiles)
+        if profiles:
+            caching.bump_version('profile')
+
+        self.imported += len(profiles)
+
+    def report(self, offset, started, verbosity):
+        if self.verbosity < verbosity:
+            return
+        elapsed = max(time.monotonic() - started, 1e-9)
+        self.stdout.write(
+            f'offset={offset} imported={self.imported} skipped={self.skipped} '
+            f'rate={self.imported / elapsed:.1f} rows/s'
+        )
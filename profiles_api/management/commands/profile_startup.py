@@ -0,0 +1,108 @@
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+MARK = 'profile_startup:'
+
+# Run in a fresh interpreter under -X importtime; MARK lines split the import log into phases
+SCRIPT = f'''
+import os, sys, time
+from io import BytesIO
+from wsgiref.util import setup_testing_defaults
+
+def mark(phase, started):
+    sys.stderr.write(f'{MARK} {{phase}} {{(time.perf_counter() - started) * 1000:.3f}}\\n')
+    sys.stderr.flush()
+
+started = time.perf_counter()
+import django
+django.setup()
+mark('django.setup()', started)
+
+started = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+mark('WSGI handler', started)
+
+if int(os.environ['PROFILE_STARTUP_WARM']):
+    started = time.perf_counter()
+    from profiles_api import warmup
+    warmup.warm_up(application)
+    mark('warm_up()', started)
+
+for number, path in enumerate(sys.argv[1:], 1):
+    environ = {{'PATH_INFO': path.partition('?')[0], 'QUERY_STRING': path.partition('?')[2],
+               'wsgi.input': BytesIO(), 'wsgi.errors': sys.stderr}}
+    setup_testing_defaults(environ)
+    statuses = []
+    started = time.perf_counter()
+    body = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    b''.join(body)
+    body.close()
+    mark(f'request {{number}} {{path}} ({{statuses[0][:3]}})', started)
+'''
+
+
+def group(module):
+    """Collapse a module name to the package it is reported under"""
+    parts = module.split('.')
+    if parts[:2] == ['django', 'contrib']:
+        return '.'.join(parts[:3])
+    if parts[0] in ('django', 'rest_framework', 'profiles_api', 'profiles_project'):
+        return '.'.join(parts[:2])
+    return parts[0]
+
+
+def parse(stderr):
+    """Split -X importtime output into [(phase, wall ms, {package: [self ms, modules]})]"""
+    phases, packages = [], defaultdict(lambda: [0.0, 0])
+    for line in stderr.splitlines():
+        if line.startswith(MARK):
+            phase, _, elapsed = line[len(MARK):].strip().rpartition(' ')
+            phases.append((phase, float(elapsed), dict(packages)))
+            packages = defaultdict(lambda: [0.0, 0])
+        elif line.startswith('import time:') and '|' in line and 'self [us]' not in line:
+            self_us, _, module = (part.strip() for part in line[len('import time:'):].split('|'))
+            totals = packages[group(module)]
+            totals[0] += int(self_us) / 1000
+            totals[1] += 1
+    return phases
+
+
+class Command(BaseCommand):
+    """Report where a cold worker spends its start-up: imports by package, then the first requests"""
+    help = (
+        'Start a fresh interpreter under -X importtime, load the app the way a WSGI worker does and time '
+        'django.setup(), the WSGI handler and the first requests to --path, listing the imports each phase '
+        'triggered by package. --warm runs profiles_api.warmup first, as profiles_project.serve does.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', action='append', help='Path to GET (repeatable); defaults to /api/profile/')
+        parser.add_argument('--requests', type=int, default=2, help='GETs of each path')
+        parser.add_argument('--warm', action='store_true')
+        parser.add_argument('--top', type=int, default=8, help='Packages listed per phase')
+
+    def handle(self, *args, **options):
+        paths = [path for path in options['path'] or ['/api/profile/'] for _ in range(options['requests'])]
+        env = dict(os.environ, PROFILE_STARTUP_WARM=str(int(options['warm'])))
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'profiles_project.settings')
+        env.setdefault('DEBUG', '0')  # like profiles_project.serve
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', SCRIPT, *paths],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr.strip().splitlines()[-1])
+
+        for phase, elapsed, packages in parse(result.stderr):
+            imports = sum(total for total, _ in packages.values())
+            count = sum(modules for _, modules in packages.values())
+            self.stdout.write(f'{phase}: {elapsed:.1f}ms, {count} modules imported in {imports:.1f}ms')
+            ranked = sorted(packages.items(), key=lambda item: -item[1][0])
+            for package, (total, modules) in ranked[:options['top']]:
+                self.stdout.write(f'  {total:8.1f}ms {modules:4d}  {package}')
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from profiles_api import caching
+from profiles_api import models
+from profiles_api import search
+
+
+class Command(BaseCommand):
+    """Rebuild the profile full-text search index from the UserProfile table"""
+    help = 'Rebuild the FTS5 profile search index from existing profiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not search.create_index(connection):
+            raise CommandError('This database does not support SQLite FTS5; search uses a plain scan')
+        search.FTS5SearchBackend._available = None
+
+        count = search.rebuild_index(connection, models.UserProfile.objects.all(), options['batch_size'])
+        caching.bump_version('profile')  # cached ?search= responses may have changed
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} profiles'))
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from profiles_api import feed_stats
+
+
+class Command(BaseCommand):
+    """Rebuild per-user feed stats from the statuses on disk and report drift"""
+    help = (
+        'Recount every user\'s statuses (archived ones included) in batches, compare with UserFeedStats '
+        'and fix the rows that drifted. --dry-run only reports.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without fixing it')
+        parser.add_argument('--show', type=int, default=20, help='List at most this many drifted users')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        drifted = 0
+        for user_id, stored, actual in feed_stats.reconcile(options['batch_size'], fix=not options['dry_run']):
+            drifted += 1
+            if drifted <= options['show']:
+                self.stdout.write(
+                    f'  user {user_id}: {stored[0]} statuses, last {stored[1]} -> '
+                    f'{actual[0]} statuses, last {actual[1]}'
+                )
+
+        verb = 'Found' if options['dry_run'] else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} drift for {drifted} users in {time.monotonic() - started:.1f}s'
+        ))
@@ -0,0 +1,91 @@
+import json
+import logging
+import platform
+import subprocess
+import sys
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_test_environment
+from django.utils import timezone
+
+from profiles_api import benchmarks
+from profiles_api import models
+from profiles_api.management.commands.seed_benchmark_data import BENCHMARK_EMAIL, BENCHMARK_PASSWORD
+
+
+class Command(BaseCommand):
+    """Benchmark every API endpoint and write the results as JSON"""
+    help = (
+        'Replay a request per endpoint through the test client and report p50/p95/p99 latency, '
+        'queries per request and peak memory. Seed data first with seed_benchmark_data. '
+        'Write-path scenarios add rows to the database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', default=BENCHMARK_EMAIL.format(0), help='User to authenticate as')
+        parser.add_argument('--password', default=BENCHMARK_PASSWORD)
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--only', nargs='*', help='Run only these scenario names')
+        parser.add_argument('--cold', action='store_true', help='Clear the cache before every request')
+        parser.add_argument('--output', '-o', help='Write JSON results here instead of stdout')
+        parser.add_argument('--baseline', help='Earlier JSON results to compare against')
+
+    def handle(self, *args, **options):
+        setup_test_environment()  # lets the test clients through ALLOWED_HOSTS
+        # Expected 4xx scenarios would otherwise log a warning on every request
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        try:
+            user = models.UserProfile.objects.get(email=options['email'])
+        except models.UserProfile.DoesNotExist:
+            raise CommandError(f'No user {options["email"]}; run seed_benchmark_data first')
+
+        runner = benchmarks.Runner(benchmarks.get_token(user), cold=options['cold'])
+        results = {}
+        for scenario in benchmarks.build_scenarios(user, options['password']):
+            if options['only'] and scenario.name not in options['only']:
+                continue
+            result = runner.run_scenario(scenario, options['iterations'], options['warmup'])
+            results[scenario.name] = result
+            queries = '-' if result['queries'] is None else result['queries']
+            self.stderr.write(
+                f'{scenario.name:<22} {result["status"]:>3} p50={result["p50_ms"]:8.2f}ms '
+                f'p95={result["p95_ms"]:8.2f}ms p99={result["p99_ms"]:8.2f}ms '
+                f'queries={queries:<3} peak={result["peak_memory_kb"]:9.1f}KiB'
+                + ('' if result['ok'] else '  UNEXPECTED STATUS')
+            )
+
+        report = {'meta': self.meta(options), 'results': results}
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)['results']
+            for name, metric, old, new, change in benchmarks.compare(baseline, results):
+                self.stderr.write(f'{name:<22} {metric:<15} {old:10.2f} -> {new:10.2f} ({change:+.1%})')
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    def meta(self, options):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=settings.BASE_DIR
+            ).stdout.strip() or None
+        except OSError:
+            commit = None
+        return {
+            'timestamp': timezone.now().isoformat(),
+            'commit': commit,
+            'python': sys.version.split()[0],
+            'django': django.get_version(),
+            'platform': platform.platform(),
+            'users': models.UserProfile.objects.count(),
+            'feed_items': models.ProfileFeedItem.objects.count(),
+            'iterations': options['iterations'],
+            'cold': options['cold'],
+        }
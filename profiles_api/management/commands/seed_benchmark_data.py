@@ -0,0 +1,127 @@
+import random
+import time
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth import hashers
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from profiles_api import autocomplete
+from profiles_api import caching
+from profiles_api import feed_stats
+from profiles_api import models
+from profiles_api import search
+from profiles_api import timeline
+
+BENCHMARK_EMAIL = 'bench{}@example.com'
+BENCHMARK_PASSWORD = 'benchmark-password'
+
+FIRST_NAMES = ('Alice', 'Bob', 'Carol', 'Dave', 'Erin', 'Frank', 'Grace', 'Heidi', 'Ivan', 'Judy',
+               'Mallory', 'Niaj', 'Olivia', 'Peggy', 'Rupert', 'Sybil', 'Trent', 'Victor', 'Walter', 'Yusuf')
+LAST_NAMES = ('Smith', 'Jones', 'Taylor', 'Brown', 'Williams', 'Wilson', 'Johnson', 'Davies', 'Patel',
+              'Wright', 'Garcia', 'Martin', 'Nguyen', 'Kim', 'Silva', 'Khan', 'Novak', 'Rossi')
+WORDS = ('coffee', 'deploy', 'weekend', 'python', 'django', 'rain', 'music', 'launch', 'bug', 'fixed',
+         'lunch', 'meeting', 'release', 'sunny', 'reading', 'travel', 'cache', 'index', 'query', 'late')
+
+
+def zipf_weights(count, exponent):
+    """Cumulative weights where rank r is picked in proportion to 1 / r**exponent"""
+    return list(accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+class Command(BaseCommand):
+    """Generate skewed synthetic users, statuses and follows for benchmarking"""
+    help = (
+        'Create N benchmark users (bench<i>@example.com, password "benchmark-password") and M feed items. '
+        'Authors and followed users follow a Zipf distribution, so a few users post and are followed a lot.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--items', type=int, default=50000)
+        parser.add_argument('--follows-per-user', type=int, default=20)
+        parser.add_argument('--days', type=int, default=90, help='Spread created_on over this many past days')
+        parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent for authors and follows')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--clear', action='store_true', help='Delete earlier benchmark users first')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        started = time.monotonic()
+        if options['clear']:
+            deleted, _ = models.UserProfile.objects.filter(
+                email__startswith='bench', email__endswith='@example.com'
+            ).delete()
+            self.stdout.write(f'Deleted {deleted} rows from earlier runs')
+
+        users = self.create_users(rng, options['users'], options['batch_size'])
+        weights = zipf_weights(len(users), options['skew'])
+        # Shuffle so the most active authors are not simply the lowest ids
+        ranked = users[:]
+        rng.shuffle(ranked)
+
+        self.create_items(rng, ranked, weights, options)
+        self.create_follows(rng, users, ranked, weights, options['follows_per_user'], options['batch_size'])
+        timeline.rebuild_home_timelines()
+        for _ in feed_stats.reconcile():  # the raw inserts skipped the stats
+            pass
+        caching.bump_version('profile')
+        caching.bump_version('feed')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(users)} users and {options["items"]} items in {time.monotonic() - started:.1f}s'
+        ))
+
+    def create_users(self, rng, count, batch_size):
+        # One hash for everybody; hashing each password would dominate the run
+        password = hashers.make_password(BENCHMARK_PASSWORD)
+        start = models.UserProfile.objects.filter(email__startswith='bench', email__endswith='@example.com').count()
+        profiles = [
+            models.UserProfile(
+                email=BENCHMARK_EMAIL.format(start + i),
+                name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+                password=password,
+            )
+            for i in range(count)
+        ]
+        with transaction.atomic():
+            profiles = models.UserProfile.objects.bulk_create(profiles, batch_size=batch_size)
+            search.get_search_backend().index_profiles(profiles)
+            autocomplete.index_profiles(profiles)
+        return [profile.pk for profile in profiles]
+
+    def create_items(self, rng, ranked, weights, options):
+        """Insert feed items with Zipf-distributed authors and explicit created_on"""
+        # Raw INSERT so created_on can be back-dated past auto_now_add
+        table = models.ProfileFeedItem._meta.db_table
+        now = timezone.now()
+        span = options['days'] * 86400
+        adapt = connection.ops.adapt_datetimefield_value
+        remaining = options['items']
+        while remaining:
+            size = min(remaining, options['batch_size'])
+            authors = rng.choices(ranked, cum_weights=weights, k=size)
+            rows = [
+                (
+                    author,
+                    ' '.join(rng.choices(WORDS, k=rng.randint(3, 12))),
+                    adapt(now - timedelta(seconds=rng.uniform(0, span))),
+                )
+                for author in authors
+            ]
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(
+                    f'INSERT INTO {table} (user_profile_id, status_text, created_on) VALUES (%s, %s, %s)', rows
+                )
+            remaining -= size
+
+    def create_follows(self, rng, users, ranked, weights, per_user, batch_size):
+        follows = []
+        for follower in users:
+            followed = set(rng.choices(ranked, cum_weights=weights, k=per_user))
+            followed.discard(follower)
+            follows.extend(models.Follow(follower_id=follower, followed_id=pk) for pk in followed)
+        models.Follow.objects.bulk_create(follows, batch_size=batch_size, ignore_conflicts=True)
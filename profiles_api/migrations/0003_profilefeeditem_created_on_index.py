@@ -0,0 +1,17 @@
+# Generated by Django 4.0.5 on 2026-10-18 13:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles_api', '0002_profilefeeditem'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='profilefeeditem',
+            index=models.Index(fields=['-created_on', '-id'], name='feed_created_on_id_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.db import OperationalError, migrations
+
+# As named at this migration; profiles_api.search.FTS_TABLE refers to the same table
+FTS_TABLE = 'profiles_api_userprofile_fts'
+
+
+def create_search_index(apps, schema_editor):
+    """Create the FTS5 profile index and fill it from existing profiles"""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                f"USING fts5(name, email, tokenize='unicode61')"
+            )
+    except OperationalError:
+        return  # no FTS5 in this SQLite build, search falls back to a scan
+
+    profiles = apps.get_model('profiles_api', 'UserProfile')._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(f'INSERT INTO {FTS_TABLE} (rowid, name, email) SELECT id, name, email FROM {profiles}')
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles_api', '0004_profilefeeditem_user_created_on_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.0.5 on 2026-10-18 13:54
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_feed_stats(apps, schema_editor):
+    """Count every user's live and archived statuses into the new table"""
+    with schema_editor.connection.cursor() as cursor:
+        # The monthly archive tables of profiles_api.archive, named as they are at this migration
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB %s ORDER BY name",
+            ['profiles_api_profilefeeditem_archive_' + '[0-9]' * 6]
+        )
+        tables = ['profiles_api_profilefeeditem'] + [name for name, in cursor.fetchall()]
+    statuses = ' UNION ALL '.join(f'SELECT user_profile_id, created_on FROM {table}' for table in tables)
+    schema_editor.execute(
+        f'INSERT INTO profiles_api_userfeedstats (user_profile_id, status_count, last_posted_on) '
+        f'SELECT user_profile_id, COUNT(*), MAX(created_on) FROM ({statuses}) GROUP BY user_profile_id'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles_api', '0006_follow_home_timeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserFeedStats',
+            fields=[
+                ('user_profile', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='feed_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('status_count', models.PositiveIntegerField(default=0)),
+                ('last_posted_on', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.RunPython(fill_feed_stats, migrations.RunPython.noop),
+    ]
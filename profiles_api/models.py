@@ -41,6 +41,8 @@ class UserProfile(AbstractBaseUser, PermissionsMixin):
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
     """determines if the user is a staff user which is used to determine if they should have access to the Django admin and things like that"""
+    follower_count = models.PositiveIntegerField(default=0)
+    """number of Follow rows pointing at this user, kept up to date by follow/unfollow and profile deletes"""
 
     objects = UserProfileManager()
 
@@ -72,6 +74,14 @@ class ProfileFeedItem(models.Model):
     created_on = models.DateTimeField(auto_now_add=True)
     # create a new feed item automatically add the date timestamp that the item was created
 
+    class Meta:
+        indexes = [
+            # Backs the (created_on, id) keyset used to page through the feed
+            models.Index(fields=['-created_on', '-id'], name='feed_created_on_id_idx'),
+            # Backs the per-user timeline (?user_profile=) without a table scan
+            models.Index(fields=['user_profile', '-created_on', '-id'], name='feed_user_created_on_idx'),
+        ]
+
     def __str__(self):
         """Return the model as a string"""
         return  self.status_text
@@ -80,3 +90,67 @@ class ProfileFeedItem(models.Model):
     # we want to see the status text value that is associated to the model
 
 
+
+
+class Follow(models.Model):
+    """One user following another"""
+    follower = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='following'
+    )
+    followed = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='followers'
+    )
+    created_on = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['follower', 'followed'], name='unique_follow'),
+        ]
+
+    def __str__(self):
+        """Return the model as a string"""
+        return f'{self.follower_id} -> {self.followed_id}'
+
+
+class HomeTimelineEntry(models.Model):
+    """A feed item materialized into one user's home timeline"""
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    feed_item = models.ForeignKey(
+        ProfileFeedItem,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    created_on = models.DateTimeField()
+    # copy of feed_item.created_on so a page of the timeline is one range scan of the index below
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'feed_item'], name='unique_home_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['owner', '-created_on', '-feed_item'], name='home_owner_created_on_idx'),
+        ]
+
+
+class UserFeedStats(models.Model):
+    """Running totals of a user's statuses, kept in step by profiles_api.feed_stats"""
+    user_profile = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='feed_stats'
+    )
+    status_count = models.PositiveIntegerField(default=0)
+    last_posted_on = models.DateTimeField(null=True)
+
+    def __str__(self):
+        """Return the model as a string"""
+        return f'{self.user_profile_id}: {self.status_count}'
@@ -0,0 +1,166 @@
+import base64
+import binascii
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class FeedCursorPagination(BasePagination):
+    """Keyset pagination over (created_on, id), newest items first
+
+    Each page is a single indexed range scan: the cursor holds the
+    (created_on, id) of the row at the page edge and the next query starts
+    right after it, so there is never a COUNT(*) or an OFFSET to skip over.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+    cursor_fields = ('created_on', 'id')  # columns encode_cursor reads from the page rows
+
+    def __init__(self):
+        self.page_size = getattr(settings, 'FEED_PAGE_SIZE', 20)
+        self.max_page_size = getattr(settings, 'FEED_MAX_PAGE_SIZE', 100)
+
+    def get_page_size(self, request):
+        """Return the requested page size, clamped to the hard maximum"""
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+
+        return min(page_size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        """Turn the opaque cursor back into (reverse, created_on, id)"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            return decode_position(encoded)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, item, reverse):
+        """Build the URL pointing at the page after (or before) `item`"""
+        encoded = encode_position(item.created_on, item.id, reverse)
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return one page of `queryset` starting at the requested cursor"""
+        return self.paginate_rows(
+            lambda position, reverse, limit: keyset_slice(queryset, position, reverse, limit),
+            request
+        )
+
+    def paginate_rows(self, fetch, request):
+        """Return one page from `fetch(position, reverse, limit)`
+
+        `fetch` returns up to `limit` rows after `position` (a (created_on, id)
+        pair, or None for the first page) in scan order: newest first, or
+        oldest first when `reverse` is set. Rows need `created_on` and `id`
+        attributes; model instances and values_list(named=True) rows both work.
+        """
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        if cursor is None:
+            reverse, position = False, None
+        else:
+            reverse, position = cursor[0], cursor[1:]
+
+        # Fetch one extra row to find out whether there is another page
+        results = list(fetch(position, reverse, page_size + 1))
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = cursor is not None, has_more
+
+        self.page = results
+        return results
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            # Walked off the end; step back from the original position
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
+def encode_position(created_on, pk, reverse=False):
+    """Return the opaque cursor value for a (created_on, id) position"""
+    raw = '|'.join(('p' if reverse else 'n', created_on.isoformat(), str(pk)))
+    return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+
+
+def decode_position(encoded):
+    """Turn a cursor value from encode_position back into (reverse, created_on, id); ValueError if invalid"""
+    try:
+        decoded = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('ascii')
+        direction, created_on, pk = decoded.split('|')
+        created_on = parse_datetime(created_on)
+        pk = int(pk)
+    except (TypeError, ValueError, UnicodeError, binascii.Error):
+        raise ValueError('Invalid cursor')
+    if direction not in ('n', 'p') or created_on is None:
+        raise ValueError('Invalid cursor')
+
+    return direction == 'p', created_on, pk
+
+
+def keyset_slice(queryset, position, reverse, limit, fields=('created_on', 'id')):
+    """Return up to `limit` rows of `queryset` strictly after `position` in (created_on, id) order
+
+    Newest first unless `reverse` is set. `fields` names the two ordering
+    columns when they are called something else on the queryset's model.
+    """
+    created_on_field, id_field = fields
+    if reverse:
+        order = (created_on_field, id_field)
+        lookup = 'gt'
+    else:
+        order = ('-' + created_on_field, '-' + id_field)
+        lookup = 'lt'
+
+    if position is not None:
+        created_on, pk = position
+        queryset = queryset.filter(
+            # Redundant with the OR below, but SQLite can only seek the index from a plain bound
+            Q(**{f'{created_on_field}__{lookup}e': created_on}),
+            Q(**{f'{created_on_field}__{lookup}': created_on})
+            | Q(**{created_on_field: created_on, f'{id_field}__{lookup}': pk})
+        )
+    return queryset.order_by(*order)[:limit]
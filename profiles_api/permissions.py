@@ -24,4 +24,4 @@ class UpdateOwnStatus(permissions.BasePermission):
         # these methods that are in the safe methods through so that is if they're trying to retrieve or create a new
         # item we're going to return True
 
-        return obj.user_profile.id == request.user.id
\ No newline at end of file
+        return obj.user_profile_id == request.user.id  # the column, not the related row, so no extra query
\ No newline at end of file
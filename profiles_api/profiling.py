@@ -0,0 +1,204 @@
+"""Opt-in request profiling: Server-Timing headers, rolling timings and slow-request dumps
+
+Enable with PROFILING_ENABLED. ProfilingMiddleware times every request and
+splits it into SQL (via connection execute wrappers), authentication,
+serialization and rendering. The phases are reported in a Server-Timing
+header and added to a rolling per-endpoint sample window that
+/api/metrics/timings/ summarizes. Requests slower than PROFILING_SLOW_MS are
+logged, and a PROFILING_SAMPLE_RATE share of all requests runs under
+cProfile so that slow ones leave a .prof dump in PROFILING_DUMP_DIR.
+"""
+import cProfile
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in milliseconds of the histogram buckets reported per endpoint
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+PHASES = ('sql', 'auth', 'serialize', 'render')
+
+_current = ContextVar('profiles_api_profiling', default=None)
+
+
+@contextmanager
+def timing(phase):
+    """Add the time spent in the block to `phase` of the request being profiled"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - started
+
+
+class EndpointTimings:
+    """Rolling window of the most recent request timings for each endpoint"""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+
+    def record(self, endpoint, sample):
+        with self._lock:
+            self._samples[endpoint].append(sample)
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+    def summary(self):
+        """Return count, percentiles, per-phase means and a histogram for each endpoint"""
+        with self._lock:
+            snapshot = {endpoint: list(samples) for endpoint, samples in self._samples.items()}
+
+        result = {}
+        for endpoint, samples in snapshot.items():
+            totals = sorted(sample['total'] for sample in samples)
+            histogram = dict.fromkeys([f'<={bound}ms' for bound in BUCKETS_MS] + ['>5000ms'], 0)
+            for total in totals:
+                bound = next((b for b in BUCKETS_MS if total * 1000 <= b), None)
+                histogram[f'<={bound}ms' if bound else '>5000ms'] += 1
+            result[endpoint] = {
+                'count': len(totals),
+                'p50_ms': percentile(totals, 0.50) * 1000,
+                'p95_ms': percentile(totals, 0.95) * 1000,
+                'p99_ms': percentile(totals, 0.99) * 1000,
+                'mean_queries': sum(sample['queries'] for sample in samples) / len(samples),
+                'mean_ms': {
+                    phase: sum(sample.get(phase, 0.0) for sample in samples) / len(samples) * 1000
+                    for phase in PHASES + ('total',)
+                },
+                'histogram': histogram,
+            }
+        return result
+
+
+def percentile(samples, fraction):
+    """Return the nearest-rank `fraction` percentile of `samples`, sorted or not"""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+endpoint_timings = EndpointTimings(window=getattr(settings, 'PROFILING_WINDOW', 1000))
+
+
+class ProfilingMiddleware:
+    """Measure each request and report it in Server-Timing; see the module docstring"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_seconds = getattr(settings, 'PROFILING_SLOW_MS', 500) / 1000
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.01)
+        self.dump_dir = getattr(settings, 'PROFILING_DUMP_DIR', None)
+
+    def __call__(self, request):
+        timings = {'queries': 0}
+        token = _current.set(timings)
+        profiler = None
+        if self.dump_dir and random.random() < self.sample_rate:
+            profiler = cProfile.Profile()
+
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(self.sql_wrapper(timings)))
+                if profiler is not None:
+                    profiler.enable()
+                    stack.callback(profiler.disable)
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        timings['total'] = time.perf_counter() - started
+
+        response['Server-Timing'] = self.server_timing(timings)
+        endpoint = self.endpoint_name(request)
+        endpoint_timings.record(endpoint, timings)
+        if timings['total'] >= self.slow_seconds:
+            self.report_slow(request, endpoint, timings, profiler)
+        return response
+
+    def process_template_response(self, request, response):
+        """Time the lazy render of DRF responses, which happens after the view returns"""
+        timings = _current.get()
+        if timings is not None and hasattr(response, 'add_post_render_callback'):
+            started = time.perf_counter()
+
+            def finished(rendered):
+                timings['render'] = timings.get('render', 0.0) + time.perf_counter() - started
+
+            response.add_post_render_callback(finished)
+        return response
+
+    @staticmethod
+    def sql_wrapper(timings):
+        def wrapper(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                timings['sql'] = timings.get('sql', 0.0) + time.perf_counter() - started
+                timings['queries'] += 1
+        return wrapper
+
+    @staticmethod
+    def server_timing(timings):
+        parts = [f'sql;dur={timings.get("sql", 0.0) * 1000:.2f};desc="{timings["queries"]} queries"']
+        parts.extend(
+            f'{phase};dur={timings[phase] * 1000:.2f}' for phase in PHASES[1:] if phase in timings
+        )
+        parts.append(f'total;dur={timings["total"] * 1000:.2f}')
+        return ', '.join(parts)
+
+    @staticmethod
+    def endpoint_name(request):
+        match = getattr(request, 'resolver_match', None)
+        name = match.view_name if match is not None else 'unresolved'
+        return f'{request.method} {name}'
+
+    def report_slow(self, request, endpoint, timings, profiler):
+        logger.warning(
+            'Slow request %s %s: %s', request.method, request.path, self.server_timing(timings)
+        )
+        if profiler is None:
+            return
+        os.makedirs(self.dump_dir, exist_ok=True)
+        filename = re.sub(r'[^\w.-]+', '_', f'{time.time():.0f}-{endpoint}') + '.prof'
+        profiler.dump_stats(os.path.join(self.dump_dir, filename))
+
+
+class TimedSerializerMixin:
+    """Count validation and representation time towards the `serialize` phase"""
+
+    def is_valid(self, *args, **kwargs):
+        with timing('serialize'):
+            return super().is_valid(*args, **kwargs)
+
+    @property
+    def data(self):
+        with timing('serialize'):
+            return super().data
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """ListSerializer for `many=True`; its items never go through the child's `data`"""
@@ -0,0 +1,192 @@
+import re
+
+from django.conf import settings
+from django.db import connection, OperationalError
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+from rest_framework import filters
+
+from profiles_api import models
+
+FTS_TABLE = 'profiles_api_userprofile_fts'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class ScanSearchBackend:
+    """Plain LIKE '%term%' search, the same as DRF's SearchFilter"""
+
+    def is_available(self):
+        return True
+
+    def search(self, queryset, terms, fields=('name', 'email')):
+        """Filter `queryset` to rows where every term appears in one of `fields`"""
+        for term in terms:
+            condition = Q()
+            for field in fields:
+                condition |= Q(**{f'{field}__icontains': term})
+            queryset = queryset.filter(condition)
+
+        return queryset
+
+    def search_all(self, queryset, terms, fields=('name', 'email')):
+        """Every row search() would match, uncapped and unranked, for callers that order and page it themselves"""
+        return self.search(queryset, terms, fields)
+
+    def index_profile(self, profile):
+        pass
+
+    def index_profiles(self, profiles):
+        pass
+
+    def remove_profile(self, profile_id):
+        pass
+
+    def rebuild(self, batch_size=1000):
+        return 0
+
+
+class FTS5SearchBackend(ScanSearchBackend):
+    """Ranked, prefix-matching search over a SQLite FTS5 index of name and email
+
+    The index is a separate FTS5 table kept in sync by the UserProfile
+    signals. If SQLite was built without FTS5, or the table is missing, the
+    backend falls back to the plain scan.
+    """
+    _available = None
+
+    def is_available(self):
+        if FTS5SearchBackend._available is None:
+            FTS5SearchBackend._available = table_exists()
+        return FTS5SearchBackend._available
+
+    def build_match_query(self, terms):
+        """Turn raw search terms into an FTS5 MATCH expression of prefix tokens"""
+        tokens = [token for term in terms for token in TOKEN_RE.findall(term)]
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    def search(self, queryset, terms, fields=('name', 'email')):
+        if not self.is_available():
+            return super().search(queryset, terms, fields)
+
+        match = self.build_match_query(terms)
+        if not match:
+            return super().search(queryset, terms, fields)
+
+        limit = getattr(settings, 'PROFILE_SEARCH_MAX_RESULTS', 100)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY rank LIMIT %s',
+                [match, limit]
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            return queryset.none()
+
+        # Keep the bm25 order from the index
+        ranking = Case(
+            *[When(pk=pk, then=Value(position)) for position, pk in enumerate(ids)],
+            output_field=IntegerField()
+        )
+        return queryset.filter(pk__in=ids).order_by(ranking)
+
+    def search_all(self, queryset, terms, fields=('name', 'email')):
+        match = self.build_match_query(terms) if self.is_available() else ''
+        if not match:
+            return super().search(queryset, terms, fields)
+        # A subquery rather than a list of ids: no PROFILE_SEARCH_MAX_RESULTS cap and no ranking CASE
+        return queryset.filter(pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]))
+
+    def index_profile(self, profile):
+        if not self.is_available():
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [profile.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, email) VALUES (%s, %s, %s)',
+                [profile.pk, profile.name, profile.email]
+            )
+
+    def index_profiles(self, profiles):
+        """Add freshly inserted profiles, e.g. after a bulk_create that skipped signals"""
+        if not self.is_available():
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT OR REPLACE INTO {FTS_TABLE} (rowid, name, email) VALUES (%s, %s, %s)',
+                [(profile.pk, profile.name, profile.email) for profile in profiles]
+            )
+
+    def remove_profile(self, profile_id):
+        if not self.is_available():
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [profile_id])
+
+    def rebuild(self, batch_size=1000):
+        """Repopulate the index from the UserProfile table, returning the row count"""
+        if not self.is_available():
+            return 0
+
+        return rebuild_index(connection, models.UserProfile.objects.all(), batch_size)
+
+
+def table_exists(using=connection):
+    """Check whether the FTS5 index table has been created"""
+    if using.vendor != 'sqlite':
+        return False
+    return FTS_TABLE in using.introspection.table_names()
+
+
+def create_index(using=connection):
+    """Create the FTS5 table, returning False when SQLite lacks FTS5"""
+    if using.vendor != 'sqlite':
+        return False
+    try:
+        with using.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                f"USING fts5(name, email, tokenize='unicode61')"
+            )
+    except OperationalError:
+        return False
+
+    return True
+
+
+def rebuild_index(using, queryset, batch_size=1000):
+    """Replace the FTS5 contents with the rows of `queryset`"""
+    count = 0
+    batch = []
+    with using.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        for row in queryset.values_list('id', 'name', 'email').iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                cursor.executemany(f'INSERT INTO {FTS_TABLE} (rowid, name, email) VALUES (%s, %s, %s)', batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(f'INSERT INTO {FTS_TABLE} (rowid, name, email) VALUES (%s, %s, %s)', batch)
+            count += len(batch)
+
+    return count
+
+
+def get_search_backend():
+    """Return the configured profile search backend"""
+    path = getattr(settings, 'PROFILE_SEARCH_BACKEND', 'profiles_api.search.FTS5SearchBackend')
+    return import_string(path)()
+
+
+class ProfileSearchFilter(filters.SearchFilter):
+    """SearchFilter that hands ?search= terms to the configured search backend"""
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+
+        fields = getattr(view, 'search_fields', ('name', 'email'))
+        return get_search_backend().search(queryset, terms, fields)
@@ -1,6 +1,8 @@
 from rest_framework import serializers
 
+from profiles_api import fieldsets
 from profiles_api import models
+from profiles_api import profiling
 
 
 class HelloSerializer(serializers.Serializer):
@@ -12,11 +14,13 @@ class HelloSerializer(serializers.Serializer):
     name = serializers.CharField(max_length=10)
 
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(fieldsets.SparseFieldsSerializerMixin, profiling.TimedSerializerMixin,
+                            serializers.ModelSerializer):
     """Serializes a user profile object"""
 
     class Meta:
         model = models.UserProfile
+        list_serializer_class = profiling.TimedListSerializer
         fields = (
             'id', 'email', 'name', 'password')  # either make accessible in our API or you want to use to create new
         # models with our serializer
@@ -48,11 +52,22 @@ class UserProfileSerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
 
 
-class ProfileFeedItemSerializer(serializers.ModelSerializer):
+class UserProfileStatsSerializer(UserProfileSerializer):
+    """UserProfileSerializer plus the feed stats UserProfileViewSet annotates for ?stats=1"""
+    status_count = serializers.IntegerField(read_only=True)
+    last_posted_on = serializers.DateTimeField(read_only=True)
+
+    class Meta(UserProfileSerializer.Meta):
+        fields = UserProfileSerializer.Meta.fields + ('status_count', 'last_posted_on')
+
+
+class ProfileFeedItemSerializer(fieldsets.SparseFieldsSerializerMixin, profiling.TimedSerializerMixin,
+                                serializers.ModelSerializer):
     """Serializes profile feed items"""
 
     class Meta:
         model = models.ProfileFeedItem
+        list_serializer_class = profiling.TimedListSerializer
         # This sets our serializer or our model serializer to our profile feed item model that we created in models.py
 
         fields = ('id', 'user_profile', 'status_text', 'created_on')
@@ -0,0 +1,79 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from profiles_api import archive
+from profiles_api import authentication
+from profiles_api import autocomplete
+from profiles_api import caching
+from profiles_api import database
+from profiles_api import models
+from profiles_api import search
+from profiles_api import timeline
+
+
+@receiver(post_save, sender=models.UserProfile)
+def index_user_profile(sender, instance, raw=False, **kwargs):
+    """Keep the profile search and autocomplete indexes in step with saved profiles"""
+    if raw:
+        return
+    search.get_search_backend().index_profile(instance)
+    autocomplete.index_profiles([instance])
+
+
+@receiver(post_delete, sender=models.UserProfile)
+def unindex_user_profile(sender, instance, **kwargs):
+    """Drop deleted profiles from the search and autocomplete indexes"""
+    search.get_search_backend().remove_profile(instance.pk)
+    autocomplete.remove_profile(instance.pk)
+
+
+@receiver(post_delete, sender=models.UserProfile)
+def purge_archived_items(sender, instance, **kwargs):
+    """Delete a profile's archived statuses along with its live ones"""
+    archive.purge_author(instance.pk)
+
+
+@receiver(pre_delete, sender=models.UserProfile)
+def uncount_follows(sender, instance, **kwargs):
+    """Decrement the follower counts a profile contributes to before its follows cascade away"""
+    timeline.forget_follower(instance.pk)
+
+
+@receiver(post_save, sender=models.UserProfile)
+@receiver(post_delete, sender=models.UserProfile)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    """Drop cached token lookups when a profile is saved, deactivated or deleted"""
+    keys = ()
+    if authentication.token_cache.use_django_cache:
+        # Other processes may have cached keys this process has never seen
+        keys = Token.objects.filter(user_id=instance.pk).values_list('key', flat=True)
+    authentication.token_cache.invalidate_user(instance.pk, keys)
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    """Drop a cached token lookup when the token is regenerated or deleted"""
+    authentication.token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=models.UserProfile)
+@receiver(post_delete, sender=models.UserProfile)
+def bump_profile_version(sender, instance, **kwargs):
+    """Expire profile ETags and cached responses"""
+    caching.bump_version('profile', instance.pk)
+
+
+@receiver(post_save, sender=models.ProfileFeedItem)
+@receiver(post_delete, sender=models.ProfileFeedItem)
+def bump_feed_version(sender, instance, **kwargs):
+    """Expire feed ETags and cached responses"""
+    caching.bump_version('feed', instance.pk)
+
+
+@receiver(connection_created)
+def tune_connection(sender, connection, **kwargs):
+    """Apply the SQLite pragmas to every new connection"""
+    database.tune_connection(connection)
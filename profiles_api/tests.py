@@ -1,3 +1,1530 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import random
+import socket
+import tempfile
+import threading
+import zlib
+from io import StringIO
+from urllib.request import urlopen
+from unittest import mock
+from pathlib import Path
 
-# Create your tests here.
+from datetime import timedelta
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.wsgi import get_wsgi_application
+from django.db import OperationalError, connection, connections
+from django.db.models import Max, Min
+from django.db.utils import ConnectionHandler
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from profiles_api import admin as profiles_admin
+from profiles_api import apps
+from profiles_api import archive
+from profiles_api import authentication
+from profiles_api import autocomplete
+from profiles_api import benchmarks
+from profiles_api import budgets
+from profiles_api import caching
+from profiles_api import compression
+from profiles_api import database
+from profiles_api import fast_serializers
+from profiles_api import feed_stats
+from profiles_api import hashing
+from profiles_api import models
+from profiles_api import profiling
+from profiles_api import search
+from profiles_api import serializers
+from profiles_api import throttling
+from profiles_api import timeline
+from profiles_api import warmup
+from profiles_api import writebehind
+from profiles_project import serve
+
+
+class FeedCursorPaginationTests(TestCase):
+    """Test keyset pagination of the feed"""
+
+    def setUp(self):
+        self.user = models.UserProfile.objects.create_user('test@example.com', 'Test', 'pass1234')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for i in range(7):
+            models.ProfileFeedItem.objects.create(user_profile=self.user, status_text=f'status {i}')
+
+    def test_pages_walk_forward_and_back(self):
+        """Pages cover every item once, newest first, and previous links go back"""
+        seen = []
+        url = '/api/feed/?page_size=3'
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data)
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+
+        expected = list(models.ProfileFeedItem.objects.order_by('-created_on', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+        self.assertEqual([len(page['results']) for page in pages], [3, 3, 1])
+        self.assertIsNone(pages[0]['previous'])
+
+        response = self.client.get(pages[2]['previous'])
+        self.assertEqual(response.data['results'], pages[1]['results'])
+
+    def test_no_count_or_offset(self):
+        """A deep page is a plain LIMIT query with no COUNT(*) or OFFSET"""
+        first = self.client.get('/api/feed/?page_size=2').data
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(first['next'])
+        sql = ' '.join(query['sql'].upper() for query in ctx.captured_queries)
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+
+    def test_page_size_is_capped(self):
+        """page_size above the maximum is clamped"""
+        with self.settings(FEED_MAX_PAGE_SIZE=4):
+            response = self.client.get('/api/feed/?page_size=1000')
+        self.assertEqual(len(response.data['results']), 4)
+
+    def test_invalid_cursor(self):
+        """A garbage cursor returns 404"""
+        response = self.client.get('/api/feed/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+
+class UserTimelineTests(TestCase):
+    """Test the per-user ?user_profile= feed filter"""
+
+    def setUp(self):
+        self.user = models.UserProfile.objects.create_user('one@example.com', 'One', 'pass1234')
+        self.other = models.UserProfile.objects.create_user('two@example.com', 'Two', 'pass1234')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for i in range(3):
+            models.ProfileFeedItem.objects.create(user_profile=self.user, status_text=f'mine {i}')
+            models.ProfileFeedItem.objects.create(user_profile=self.other, status_text=f'theirs {i}')
+
+    def test_filters_by_user(self):
+        """Only the requested user's statuses are returned"""
+        response = self.client.get(f'/api/feed/?user_profile={self.other.id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({item['user_profile'] for item in response.data['results']}, {self.other.id})
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_invalid_user_profile(self):
+        """A non-integer user_profile is rejected"""
+        for value in ('abc', '\u00b2', '\u0663'):  # superscript two, Arabic-Indic three
+            response = self.client.get('/api/feed/', {'user_profile': value})
+            self.assertEqual(response.status_code, 400)
+
+    def test_query_plan_uses_index(self):
+        """SQLite reads the timeline from the composite index, not a table scan"""
+        queryset = models.ProfileFeedItem.objects.filter(
+            user_profile_id=self.user.id
+        ).order_by('-created_on', '-id')[:20]
+        plan = queryset.explain()
+        self.assertIn('feed_user_created_on_idx', plan)
+        self.assertNotIn('SCAN profiles_api_profilefeeditem', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+class ProfileSearchTests(TestCase):
+    """Test the profile search backends"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.alice = models.UserProfile.objects.create_user('alice@example.com', 'Alice Smith', 'pass1234')
+        self.bob = models.UserProfile.objects.create_user('bob@smithy.org', 'Bob Jones', 'pass1234')
+        models.UserProfile.objects.create_user('carol@example.com', 'Carol', 'pass1234')
+        caching.get_cache().clear()  # the version bumps above wait for a commit that never comes
+
+    def search(self, term):
+        response = self.client.get('/api/profile/', {'search': term})
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.json()]
+
+    def test_prefix_match(self):
+        """Partial words match on name and email"""
+        self.assertEqual(set(self.search('smi')), {self.alice.id, self.bob.id})
+        self.assertEqual(self.search('ali exam'), [self.alice.id])
+
+    def test_index_follows_save_and_delete(self):
+        """Renames and deletes are reflected in search results"""
+        self.bob.name = 'Robert'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bob.save()
+        self.assertEqual(self.search('robert'), [self.bob.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bob.delete()
+        self.assertEqual(self.search('robert'), [])
+
+    def test_scan_fallback(self):
+        """The scan backend gives the same matches as the index"""
+        with self.settings(PROFILE_SEARCH_BACKEND='profiles_api.search.ScanSearchBackend'):
+            self.assertEqual(set(self.search('smith')), {self.alice.id, self.bob.id})
+
+    def test_rebuild_command(self):
+        """rebuild_search_index restores an emptied index"""
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.FTS_TABLE}')
+        self.assertEqual(self.search('carol'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search('carol')), 1)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test the token -> user lookup cache"""
+
+    def setUp(self):
+        authentication.token_cache.clear()
+        self.user = models.UserProfile.objects.create_user('test@example.com', 'Test', 'pass1234')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_repeat_requests_hit_cache(self):
+        """Only the first request resolves the token in the database"""
+        self.client.get('/api/feed/')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/feed/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any('authtoken_token' in query['sql'] for query in ctx.captured_queries))
+        stats = authentication.token_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_deleted_token_is_rejected(self):
+        """Deleting the token invalidates the cached lookup"""
+        self.client.get('/api/feed/')
+        self.token.delete()
+        self.assertEqual(self.client.get('/api/feed/').status_code, 401)
+
+    def test_deactivated_user_is_rejected(self):
+        """Deactivating the user invalidates the cached lookup"""
+        self.client.get('/api/feed/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/feed/').status_code, 401)
+
+    def test_lru_and_ttl(self):
+        """The cache evicts the least recently used entry and expired entries"""
+        cache = authentication.TokenCache(max_size=2, ttl=60)
+        cache.set('a', self.user)
+        cache.set('b', self.user)
+        cache.get('a')
+        cache.set('c', self.user)
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+
+        cache = authentication.TokenCache(ttl=0)
+        cache.set('a', self.user)
+        self.assertIsNone(cache.get('a'))
+
+
+class AsyncLoginSignupTests(TestCase):
+    """Test the async login/signup views and the hashing pool"""
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_signup_then_login(self):
+        """A user created through async signup can log in through async login"""
+        response = self.client.post(
+            '/api/async/profile/',
+            {'email': 'new@EXAMPLE.com', 'name': 'New', 'password': 'pass1234'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['email'], 'new@example.com')
+        self.assertNotIn('password', response.json())
+
+        response = self.client.post(
+            '/api/async/login/',
+            {'username': 'new@example.com', 'password': 'pass1234'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        user = models.UserProfile.objects.get(email='new@example.com')
+        self.assertEqual(response.json()['token'], Token.objects.get(user=user).key)
+
+    def test_wrong_password(self):
+        """Bad credentials give the same 400 as the sync login view"""
+        models.UserProfile.objects.create_user('test@example.com', 'Test', 'pass1234')
+        response = self.client.post('/api/async/login/', {'username': 'test@example.com', 'password': 'nope'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_saturated_pool_rejects_fast(self):
+        """Submitting past workers + queue raises PoolSaturated instead of waiting"""
+        pool = hashing.HashingPool(workers=1, max_queue=1, retry_after=2)
+        release = threading.Event()
+        futures = [pool.submit(release.wait), pool.submit(release.wait)]
+        with self.assertRaises(hashing.PoolSaturated) as ctx:
+            pool.submit(release.wait)
+        self.assertEqual(ctx.exception.retry_after, 2)
+        release.set()
+        for future in futures:
+            future.result()
+        pool.submit(len, 'ok').result()
+        pool.shutdown()
+
+
+class FeedBatchCreateTests(TestCase):
+    """Test POST /api/feed/batch/"""
+
+    def setUp(self):
+        self.user = models.UserProfile.objects.create_user('test@example.com', 'Test', 'pass1234')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_batch_create(self):
+        """All items are inserted with a single INSERT"""
+        items = [{'status_text': f'status {i}'} for i in range(5)]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/feed/batch/', items, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 5)
+        self.assertTrue(all(item['id'] and item['user_profile'] == self.user.id for item in response.data))
+        inserts = [
+            query for query in ctx.captured_queries
+            if query['sql'].startswith('INSERT INTO "profiles_api_profilefeeditem"')
+        ]
+        self.assertEqual(len(inserts), 1)
+
+    def test_strict_mode_rejects_whole_batch(self):
+        """One invalid item rejects the batch by default"""
+        items = [{'status_text': 'ok'}, {'status_text': 'x' * 300}]
+        response = self.client.post('/api/feed/batch/', items, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(models.ProfileFeedItem.objects.exists())
+
+    def test_lenient_mode_keeps_valid_items(self):
+        """Lenient mode inserts the valid items and reports the others"""
+        items = [{'status_text': 'ok'}, {'status_text': 'x' * 300}, {'status_text': 'also ok'}]
+        response = self.client.post('/api/feed/batch/?lenient=1', items, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['created']), 2)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1])
+
+    def test_max_batch_size(self):
+        """Batches above FEED_BATCH_MAX_SIZE are refused"""
+        with self.settings(FEED_BATCH_MAX_SIZE=2):
+            response = self.client.post('/api/feed/batch/', [{'status_text': 'a'}] * 3, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ImportProfilesCommandTests(TestCase):
+    """Test the import_profiles management command"""
+
+    def write_input(self, suffix, content):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, 'w') as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_import_csv_dedupes_emails(self):
+        """Rows are imported once per normalized email and can log in"""
+        models.UserProfile.objects.create_user('old@example.com', 'Old', 'pass1234')
+        path = self.write_input('.csv', (
+            'email,name,password\n'
+            'a@EXAMPLE.com,A,pass1234\n'
+            'a@example.com,A again,pass1234\n'
+            'old@example.com,Old,pass1234\n'
+            'b@example.com,B,secret99\n'
+        ))
+        out = StringIO()
+        call_command('import_profiles', path, workers=2, stdout=out)
+
+        self.assertIn('offset=4 imported=2 skipped=2', out.getvalue())
+        self.assertTrue(models.UserProfile.objects.get(email='b@example.com').check_password('secret99'))
+        self.assertEqual(models.UserProfile.objects.filter(email='a@example.com').count(), 1)
+
+    def test_import_jsonl_resumes_from_offset(self):
+        """--offset skips records that were already imported"""
+        path = self.write_input('.jsonl', (
+            '{"email": "a@example.com", "name": "A", "password": "pass1234"}\n'
+            '{"email": "b@example.com", "name": "B", "password": "pass1234"}\n'
+        ))
+        call_command('import_profiles', path, offset=1, workers=1, stdout=StringIO())
+        self.assertEqual(list(models.UserProfile.objects.values_list('email', flat=True)), ['b@example.com'])
+
+
+class FeedExportTests(TestCase):
+    """Test the NDJSON feed export endpoint and command"""
+
+    def setUp(self):
+        self.user = models.UserProfile.objects.create_user('test@example.com', 'Test', 'pass1234')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.items = [
+            models.ProfileFeedItem.objects.create(user_profile=self.user, status_text=f'status {i}')
+            for i in range(3)
+        ]
+        old = timezone.now() - timedelta(days=10)
+        models.ProfileFeedItem.objects.filter(pk=self.items[0].pk).update(created_on=old)
+
+    def read_lines(self, response):
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_export_matches_serializer(self):
+        """Each line is the same document the feed API returns"""
+        response = self.client.get('/api/feed/export/')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = self.read_lines(response)
+        expected = serializers.ProfileFeedItemSerializer(
+            models.ProfileFeedItem.objects.order_by('id'), many=True
+        ).data
+        self.assertEqual(lines, [dict(item) for item in expected])
+
+    def test_since_filter_and_gzip(self):
+        """since skips older rows and gzip is negotiated from Accept-Encoding"""
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+        response = self.client.get('/api/feed/export/', {'since': since}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        body = gzip.decompress(b''.join(response.streaming_content))
+        ids = [json.loads(line)['id'] for line in body.splitlines()]
+        self.assertEqual(ids, [self.items[1].id, self.items[2].id])
+
+    def test_gzip_refused_with_q_zero(self):
+        """gzip;q=0 means the client does not accept gzip"""
+        response = self.client.get('/api/feed/export/', HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(len(self.read_lines(response)), 3)
+
+    def test_invalid_bound(self):
+        """A malformed since value is a 400"""
+        self.assertEqual(self.client.get('/api/feed/export/', {'since': 'yesterday'}).status_code, 400)
+
+    def test_export_command(self):
+        """export_feed writes the same NDJSON to a file"""
+        handle, path = tempfile.mkstemp(suffix='.ndjson.gz')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        call_command('export_feed', output=path, gzip=True)
+        with gzip.open(path) as f:
+            self.assertEqual(len(f.read().splitlines()), 3)
+
+
+class ConditionalGetTests(TestCase):
+    """Test ETag/Last-Modified handling and the response cache"""
+
+    def setUp(self):
+        self.user = models.UserProfile.objects.create_user('test@example.com', 'Test', 'pass1234')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.item = models.ProfileFeedItem.objects.create(user_profile=self.user, status_text='hello')
+        caching.get_cache().clear()
+        caching.stats.clear()
+
+    def test_etag_gives_304(self):
+        """A matching If-None-Match returns 304 without running the view"""
+        response = self.client.get('/api/feed/')
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/feed/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse(any('profilefeeditem' in query['sql'] for query in ctx.captured_queries))
+
+    def test_cached_body_is_reused(self):
+        """A repeat GET is served from the response cache with the same body"""
+        first = self.client.get(f'/api/profile/{self.user.id}/')
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get(f'/api/profile/{self.user.id}/')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(caching.stats.as_dict()['hits'], 1)
+
+    def test_write_invalidates(self):
+        """Saving a feed item changes the ETag and the body"""
+        etag = self.client.get('/api/feed/')['ETag']
+        self.item.status_text = 'changed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.save()
+        response = self.client.get('/api/feed/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['results'][0]['status_text'], 'changed')
+
+    def test_version_bumps_on_commit(self):
+        """A write changes the version only once it commits, so readers never cache uncommitted rows"""
+        pk = self.item.pk
+        before = caching.get_version('feed', pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.item.delete()
+        self.assertEqual(caching.get_version('feed', pk), before)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(caching.get_version('feed', pk), before)
+
+    def test_metrics_endpoint(self):
+        """Staff can read the cache hit ratio"""
+        self.client.get('/api/feed/')
+        self.client.get('/api/feed/')
+        self.assertEqual(self.client.get('/api/metrics/cache/').status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get('/api/metrics/cache/')
+        self.assertEqual(response.data['response_cache']['hit_ratio'], 0.5)
+
+
+class CompressedResponseTests(TestCase):
+    """Test gzip/deflate negotiation and the compressed copies in the response cache"""
+
+    def setUp(self):
+        self.user = models.UserProfile.objects.create_user('test@example.com', 'Test', 'pass1234')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for i in range(20):
+            models.ProfileFeedItem.objects.create(user_profile=self.user, status_text=f'status number {i}')
+        caching.get_cache().clear()
+
+    def test_gzip_and_deflate(self):
+        """The preferred accepted encoding is used and decodes to the plain body"""
+        plain = self.client.get('/api/feed/')
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        response = self.client.get('/api/feed/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertNotEqual(response['ETag'], plain['ETag'])
+
+        response = self.client.get('/api/feed/', HTTP_ACCEPT_ENCODING='gzip;q=0, deflate')
+        self.assertEqual(response['Content-Encoding'], 'deflate')
+        self.assertEqual(zlib.decompress(response.content), plain.content)
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+
+    def test_compressed_once(self):
+        """A repeat hit sends the cached compressed bytes without compressing again"""
+        first = self.client.get('/api/feed/', HTTP_ACCEPT_ENCODING='gzip')
+        with mock.patch.object(compression, 'compress') as compress:
+            second = self.client.get('/api/feed/', HTTP_ACCEPT_ENCODING='gzip')
+        compress.assert_not_called()
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['Content-Encoding'], 'gzip')
+
+    def test_small_bodies_left_alone(self):
+        """Bodies under RESPONSE_COMPRESSION_MIN_SIZE go out uncompressed"""
+        with override_settings(RESPONSE_COMPRESSION_MIN_SIZE=10 ** 6):
+            response = self.client.get('/api/feed/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(response.json()['results'][0]['status_text'], 'status number 19')
+
+
+class HomeTimelineTests(TestCase):
+    """Test follows and the fan-out home timeline"""
+
+    def setUp(self):
+        self.user = models.UserProfile.objects.create_user('me@example.com', 'Me', 'pass1234')
+        self.friend = models.UserProfile.objects.create_user('friend@example.com', 'Friend', 'pass1234')
+        self.stranger = models.UserProfile.objects.create_user('stranger@example.com', 'Stranger', 'pass1234')
+        self.client = APIClient()
+
+    def post_as(self, user, text):
+        self.client.force_authenticate(user)
+        return self.client.post('/api/feed/', {'status_text': text}).data['id']
+
+    def home(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/feed/home/')
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['results']]
+
+    def test_follow_and_unfollow(self):
+        """Followed users' statuses appear in the home timeline until unfollowed"""
+        old = self.post_as(self.friend, 'before follow')
+        self.client.force_authenticate(self.user)
+        response = self.client.post(f'/api/profile/{self.friend.id}/follow/')
+        self.assertEqual(response.status_code, 201)
+        self.friend.refresh_from_db()
+        self.assertEqual(self.friend.follower_count, 1)
+
+        mine = self.post_as(self.user, 'mine')
+        new = self.post_as(self.friend, 'after follow')
+        self.post_as(self.stranger, 'not followed')
+        self.assertEqual(self.home(), [new, mine, old])
+
+        self.client.post(f'/api/profile/{self.friend.id}/unfollow/')
+        self.assertEqual(self.home(), [mine])
+
+    def test_deleted_follower_is_uncounted(self):
+        """Deleting a follower takes it off the follower_count its follows cascade away from"""
+        timeline.follow(self.user, self.friend)
+        timeline.follow(self.stranger, self.friend)
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.delete(f'/api/profile/{self.user.id}/').status_code, 204)
+        self.stranger.delete()
+        self.friend.refresh_from_db()
+        self.assertEqual(self.friend.follower_count, 0)
+        self.assertFalse(models.Follow.objects.exists())
+
+    def test_cannot_follow_self(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.post(f'/api/profile/{self.user.id}/follow/').status_code, 400)
+
+    def test_high_fanout_authors_merged_on_read(self):
+        """Authors over the fan-out limit are merged in at read time"""
+        self.client.force_authenticate(self.user)
+        self.client.post(f'/api/profile/{self.friend.id}/follow/')
+        with self.settings(FEED_FANOUT_MAX_FOLLOWERS=0):
+            first = self.post_as(self.friend, 'big 1')
+            mine = self.post_as(self.user, 'mine')
+            second = self.post_as(self.friend, 'big 2')
+            self.assertFalse(models.HomeTimelineEntry.objects.filter(owner=self.user, feed_item_id=first).exists())
+            self.assertEqual(self.home(), [second, mine, first])
+
+    def test_home_query_plan_uses_index(self):
+        """A home timeline page is a range scan of the owner index"""
+        queryset = models.HomeTimelineEntry.objects.filter(owner=self.user).order_by('-created_on', '-feed_item_id')
+        plan = queryset[:20].explain()
+        self.assertIn('home_owner_created_on_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+class AsyncReadViewTests(TestCase):
+    """Test the async list/retrieve views against the sync viewsets"""
+
+    def setUp(self):
+        authentication.token_cache.clear()
+        self.user = models.UserProfile.objects.create_user('test@example.com', 'Test', 'pass1234')
+        self.token = Token.objects.create(user=self.user)
+        self.item = models.ProfileFeedItem.objects.create(user_profile=self.user, status_text='hello')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_same_output_as_sync_views(self):
+        """Async responses carry the same JSON as the DRF viewsets"""
+        for sync_url, async_url in (
+            ('/api/feed/?page_size=5', '/api/async/feed/?page_size=5'),
+            (f'/api/feed/{self.item.id}/', f'/api/async/feed/{self.item.id}/'),
+            ('/api/profile/?search=test', '/api/async/profile/?search=test'),
+            (f'/api/profile/{self.user.id}/', f'/api/async/profile/{self.user.id}/'),
+        ):
+            expected = self.client.get(sync_url, HTTP_ACCEPT='application/json')
+            actual = self.client.get(async_url)
+            self.assertEqual(actual.status_code, 200, async_url)
+            self.assertEqual(actual.json(), expected.json(), async_url)
+
+    def test_feed_requires_authentication(self):
+        """Anonymous feed reads get 401 with a Token challenge"""
+        response = Client().get('/api/async/feed/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+        response = Client().get('/api/async/feed/', HTTP_AUTHORIZATION='Token bogus')
+        self.assertEqual(response.status_code, 401)
+
+    def test_missing_object(self):
+        self.assertEqual(self.client.get('/api/async/profile/999999/').status_code, 404)
+
+
+class FastSerializerTests(TestCase):
+    """Test the values_list() fast path against the DRF serializers"""
+
+    def setUp(self):
+        self.user = models.UserProfile.objects.create_user('test@example.com', 'Tést "quoted"', 'pass1234')
+        models.UserProfile.objects.create_user('other@example.com', 'Other', 'pass1234')
+        for text in ('plain', 'ünïcode ✓', 'line\nbreak'):
+            models.ProfileFeedItem.objects.create(user_profile=self.user, status_text=text)
+
+    def test_byte_identical_output(self):
+        """Rendered JSON is byte-for-byte the same as the ModelSerializer output"""
+        render = JSONRenderer().render
+        for serializer_class, queryset in (
+            (serializers.UserProfileSerializer, models.UserProfile.objects.order_by('id')),
+            (serializers.ProfileFeedItemSerializer, models.ProfileFeedItem.objects.order_by('id')),
+        ):
+            row_serializer = fast_serializers.get_row_serializer(serializer_class)
+            self.assertIsNotNone(row_serializer)
+            fast = render(row_serializer.serialize(row_serializer.values(queryset)))
+            self.assertEqual(fast, render(serializer_class(queryset, many=True).data))
+
+    def test_password_is_not_read(self):
+        """The write-only password column is left out of the query"""
+        row_serializer = fast_serializers.get_row_serializer(serializers.UserProfileSerializer)
+        self.assertNotIn('password', row_serializer.columns)
+
+    def test_nested_serializer_is_not_compiled(self):
+        """Serializers that need model instances fall back to DRF"""
+        class NestedSerializer(serializers.serializers.ModelSerializer):
+            user_profile = serializers.UserProfileSerializer()
+
+            class Meta:
+                model = models.ProfileFeedItem
+                fields = ('id', 'user_profile')
+
+        self.assertIsNone(fast_serializers.get_row_serializer(NestedSerializer))
+
+
+class BenchmarkHarnessTests(TestCase):
+    """Test the synthetic data generator and the benchmark runner"""
+
+    def test_seed_and_run(self):
+        """Seeded data drives every scenario to its expected status"""
+        call_command('seed_benchmark_data', users=20, items=200, follows_per_user=3, stdout=StringIO())
+        self.assertEqual(models.ProfileFeedItem.objects.count(), 200)
+        self.assertTrue(models.HomeTimelineEntry.objects.exists())
+
+        user = models.UserProfile.objects.get(email='bench0@example.com')
+        runner = benchmarks.Runner(benchmarks.get_token(user))
+        for scenario in benchmarks.build_scenarios(user, 'benchmark-password'):
+            if scenario.max_iterations or scenario.client == 'asgi':
+                # PBKDF2 logins are slow, and ASGI requests use another thread's connection
+                # that cannot see this test's transaction
+                continue
+            result = runner.run_scenario(scenario, iterations=2, warmup=0)
+            self.assertTrue(result['ok'], (scenario.name, result['status']))
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+            if scenario.name == 'feed_list':
+                # A cold read reaches the database, wherever the router sends it
+                cold = benchmarks.Runner(runner.token, cold=True).run_scenario(scenario, iterations=1, warmup=0)
+                self.assertGreater(cold['queries'], 0)
+
+
+class BenchmarkLoginTests(TransactionTestCase):
+    """Test the login scenarios, whose ASGI requests need rows committed for another thread's connection"""
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_logins_are_not_rate_limited(self):
+        """A full run logs in as one account more often than THROTTLE_RATES['login_user'] allows"""
+        call_command('seed_benchmark_data', users=2, items=10, follows_per_user=1, stdout=StringIO())
+        user = models.UserProfile.objects.get(email='bench0@example.com')
+        runner = benchmarks.Runner(benchmarks.get_token(user))
+        scenarios = [scenario for scenario in benchmarks.build_scenarios(user, 'benchmark-password')
+                     if scenario.name in ('login', 'async_login')]
+        self.assertEqual(len(scenarios), 2)
+        for scenario in scenarios:
+            result = runner.run_scenario(scenario, iterations=10, warmup=5)
+            self.assertTrue(result['ok'], (scenario.name, result['status']))
+            self.assertEqual(result['iterations'], 10)
+
+
+class ProfilingMiddlewareTests(TestCase):
+    """Test the opt-in request profiling middleware"""
+
+    def setUp(self):
+        profiling.endpoint_timings.clear()
+        authentication.token_cache.clear()
+        self.user = models.UserProfile.objects.create_user('test@example.com', 'Test', 'pass1234')
+        self.token = Token.objects.create(user=self.user)
+        models.ProfileFeedItem.objects.create(user_profile=self.user, status_text='hello')
+        caching.get_cache().clear()
+
+    def get_feed(self):
+        return Client().get('/api/feed/', HTTP_AUTHORIZATION=f'Token {self.token.key}',
+                            HTTP_ACCEPT='application/json')
+
+    def test_disabled_by_default(self):
+        with self.settings(PROFILING_ENABLED=False):
+            self.assertNotIn('Server-Timing', self.get_feed())
+        self.assertEqual(profiling.endpoint_timings.summary(), {})
+
+    def test_server_timing_and_histograms(self):
+        """Each phase is reported in Server-Timing and recorded per endpoint"""
+        with self.settings(PROFILING_ENABLED=True):
+            response = self.get_feed()
+        self.assertEqual(response.status_code, 200)
+        header = response['Server-Timing']
+        for phase in ('sql', 'auth', 'serialize', 'render', 'total'):
+            self.assertIn(f'{phase};dur=', header)
+        self.assertRegex(header, r'desc="[1-9]\d* queries"')
+
+        summary = profiling.endpoint_timings.summary()['GET profilefeeditem-list']
+        self.assertEqual(summary['count'], 1)
+        self.assertEqual(sum(summary['histogram'].values()), 1)
+        self.assertGreater(summary['mean_queries'], 0)
+
+    def test_slow_request_dump(self):
+        """Sampled requests over the threshold are logged and leave a cProfile dump"""
+        with tempfile.TemporaryDirectory() as dump_dir:
+            with self.settings(PROFILING_ENABLED=True, PROFILING_SLOW_MS=0, PROFILING_SAMPLE_RATE=1.0,
+                               PROFILING_DUMP_DIR=dump_dir):
+                with self.assertLogs('profiles_api.profiling', 'WARNING'):
+                    self.get_feed()
+            dumps = os.listdir(dump_dir)
+            self.assertEqual(len(dumps), 1)
+            self.assertTrue(dumps[0].endswith('.prof'))
+
+    def test_timings_endpoint_is_admin_only(self):
+        with self.settings(PROFILING_ENABLED=True):
+            self.get_feed()
+            response = Client().get('/api/metrics/timings/', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+            self.assertEqual(response.status_code, 403)
+            self.user.is_staff = self.user.is_superuser = True
+            self.user.save()
+            response = Client().get('/api/metrics/timings/', HTTP_AUTHORIZATION=f'Token {self.token.key}',
+                                    HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('GET profilefeeditem-list', response.json()['endpoints'])
+
+
+@override_settings(QUERY_BUDGET_MODE='raise')
+class QueryBudgetTests(TestCase):
+    """Test the query budget guard and hold every endpoint to its budget"""
+
+    def setUp(self):
+        self.user = models.UserProfile.objects.create_user('test@example.com', 'Test', 'pass1234')
+        self.token = Token.objects.create(user=self.user)
+        others = [
+            models.UserProfile.objects.create_user(f'other{i}@example.com', f'Other {i}', 'pass1234')
+            for i in range(5)
+        ]
+        for other in others:
+            models.Follow.objects.create(follower=self.user, followed=other)
+        models.ProfileFeedItem.objects.bulk_create(
+            models.ProfileFeedItem(user_profile=author, status_text=f'status {i}')
+            for i in range(10) for author in [self.user] + others
+        )
+        timeline.rebuild_home_timelines()
+        self.item = models.ProfileFeedItem.objects.filter(user_profile=self.user).first()
+        self.other = others[0]
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_breach_reports_repeated_statements(self):
+        with self.assertRaises(budgets.QueryBudgetExceeded) as ctx:
+            with budgets.query_budget('n+1', 2):
+                for item in models.ProfileFeedItem.objects.all()[:3]:
+                    item.user_profile.name
+        self.assertEqual(len(ctx.exception.statements), 4)
+        self.assertEqual(ctx.exception.repeated[0][0], 3)
+        self.assertIn('3x SELECT', str(ctx.exception))
+
+    def test_log_mode(self):
+        with self.settings(QUERY_BUDGET_MODE='log'), self.assertLogs('profiles_api.budgets', 'WARNING'):
+            with budgets.query_budget('n+1', 0):
+                models.UserProfile.objects.count()
+
+    def test_every_endpoint_within_budget(self):
+        """Each endpoint stays within its budget with a cold token cache and many rows"""
+        for method, url, data, expected in (
+            ('get', '/api/hello-view/', None, 200),
+            ('get', '/api/hello-viewset/', None, 200),
+            ('post', '/api/login/', {'username': 'test@example.com', 'password': 'pass1234'}, 200),
+            ('get', '/api/profile/', None, 200),
+            ('get', '/api/profile/?search=other', None, 200),
+            ('get', '/api/profile/autocomplete/?q=oth', None, 200),
+            ('get', f'/api/profile/{self.user.id}/', None, 200),
+            ('post', '/api/profile/', {'email': 'new@example.com', 'name': 'New', 'password': 'pass1234'}, 201),
+            ('patch', f'/api/profile/{self.user.id}/', {'name': 'Renamed'}, 200),
+            ('post', f'/api/profile/{self.other.id}/unfollow/', None, 200),
+            ('post', f'/api/profile/{self.other.id}/follow/', None, 201),
+            ('get', '/api/feed/', None, 200),
+            ('get', f'/api/feed/?user_profile={self.other.id}', None, 200),
+            ('get', f'/api/feed/{self.item.id}/', None, 200),
+            ('get', '/api/feed/home/', None, 200),
+            ('get', '/api/feed/export/', None, 200),
+            ('post', '/api/feed/', {'status_text': 'new'}, 201),
+            ('post', '/api/feed/batch/', [{'status_text': f'batch {i}'} for i in range(20)], 201),
+            ('patch', f'/api/feed/{self.item.id}/', {'status_text': 'edited'}, 200),
+            ('delete', f'/api/feed/{self.item.id}/', None, 204),
+            ('get', '/api/metrics/cache/', None, 403),
+            ('get', '/api/async/profile/', None, 200),
+            ('get', '/api/async/feed/', None, 200),
+            ('get', f'/api/async/profile/{self.user.id}/', None, 200),
+            ('delete', f'/api/profile/{self.user.id}/', None, 204),
+        ):
+            authentication.token_cache.clear()
+            caching.get_cache().clear()
+            response = getattr(self.client, method)(url, data, format='json')
+            self.assertEqual(response.status_code, expected, url)
+
+    def test_status_permission_does_not_load_author(self):
+        """Editing a status checks ownership from user_profile_id alone"""
+        authentication.token_cache.clear()
+        with self.assertNumQueries(3):  # token, status, update
+            self.client.patch(f'/api/feed/{self.item.id}/', {'status_text': 'edited'}, format='json')
+
+
+class SQLiteTuningTests(TestCase):
+    """Test the connection pragmas and read replica routing"""
+
+    def open_database(self, path):
+        """Return a writer and a read-only reader on a fresh file, both tuned on connect"""
+        base = {'ENGINE': 'django.db.backends.sqlite3', 'OPTIONS': {'timeout': 0.2}}
+        handler = ConnectionHandler({
+            'default': {**base, 'NAME': path},
+            'reader': {**base, 'NAME': Path(path).as_uri() + '?mode=ro'},
+        })
+        writer = handler['default']
+        self.addCleanup(writer.close)
+        with writer.cursor() as cursor:
+            cursor.execute('CREATE TABLE status (text TEXT)')
+            cursor.execute("INSERT INTO status VALUES ('committed')")
+        return handler, writer
+
+    def read_during_write(self, path):
+        """Read from another thread while the writer holds an exclusive transaction"""
+        handler, writer = self.open_database(path)
+        result = {}
+
+        def read():
+            reader = handler['reader']
+            try:
+                with reader.cursor() as cursor:
+                    cursor.execute('SELECT text FROM status')
+                    result['rows'] = cursor.fetchall()
+            except OperationalError as exc:
+                result['error'] = exc
+            finally:
+                reader.close()
+
+        with writer.cursor() as cursor:
+            cursor.execute('BEGIN EXCLUSIVE')
+            cursor.execute("INSERT INTO status VALUES ('uncommitted')")
+            thread = threading.Thread(target=read)
+            thread.start()
+            thread.join()
+            cursor.execute('COMMIT')
+        return result
+
+    def test_pragmas_applied(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            _, writer = self.open_database(os.path.join(tmp, 'db.sqlite3'))
+            with writer.cursor() as cursor:
+                values = [cursor.execute(f'PRAGMA {name}').fetchone()[0] for name in ('journal_mode', 'synchronous')]
+        self.assertEqual(values, ['wal', 1])
+
+    def test_readers_proceed_while_writer_is_active(self):
+        """In WAL mode a reader sees the last commit instead of waiting for the writer"""
+        with tempfile.TemporaryDirectory() as tmp:
+            result = self.read_during_write(os.path.join(tmp, 'db.sqlite3'))
+        self.assertEqual(result, {'rows': [('committed',)]})
+
+    def test_readers_block_without_wal(self):
+        with self.settings(SQLITE_PRAGMAS={'journal_mode': 'delete'}), tempfile.TemporaryDirectory() as tmp:
+            result = self.read_during_write(os.path.join(tmp, 'db.sqlite3'))
+        self.assertIn('locked', str(result['error']))
+
+    def test_routing(self):
+        """Reads use the replica only inside read_replica(); writes always use the primary"""
+        router = database.ReadReplicaRouter()
+        self.assertIsNone(router.db_for_read(models.UserProfile))
+        self.assertEqual(router.db_for_write(models.UserProfile), 'default')
+        with self.settings(DATABASE_READ_REPLICA='replica'), database.read_replica():
+            # Under test the replica mirrors the primary, so reads stay on the test transaction
+            self.assertIsNone(router.db_for_read(models.UserProfile))
+        self.assertFalse(router.allow_migrate('replica', 'profiles_api'))
+
+
+class ReadReplicaViewTests(TransactionTestCase):
+    """Test that the viewsets' reads go through the replica connection and their writes do not
+
+    replica_alias() turns routing off under the test mirror, so it is patched here; rows are
+    committed so that the second connection to the shared test database can see them.
+    """
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.user = models.UserProfile.objects.create_user('test@example.com', 'Test', 'pass1234')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        caching.get_cache().clear()
+        patcher = mock.patch.object(database, 'replica_alias', return_value='replica')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def queries_by_alias(self, method, url, data=None):
+        with CaptureQueriesContext(connections['default']) as default:
+            with CaptureQueriesContext(connections['replica']) as replica:
+                response = getattr(self.client, method)(url, data, format='json')
+        return response, len(default.captured_queries), len(replica.captured_queries)
+
+    def test_reads_use_replica_and_writes_primary(self):
+        response, on_default, on_replica = self.queries_by_alias('get', f'/api/profile/{self.user.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((on_default, on_replica > 0), (0, True))
+
+        response, on_default, on_replica = self.queries_by_alias('post', '/api/feed/', {'status_text': 'hi'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((on_default > 0, on_replica), (True, 0))
+
+        response, on_default, on_replica = self.queries_by_alias('get', '/api/feed/')
+        self.assertEqual(response.json()['results'][0]['status_text'], 'hi')
+        self.assertEqual((on_default, on_replica > 0), (0, True))
+
+    def test_benchmark_counts_replica_queries(self):
+        """The harness's query column includes reads routed to the replica"""
+        runner = benchmarks.Runner(benchmarks.get_token(self.user), cold=True)
+        results = {
+            scenario.name: runner.run_scenario(scenario, iterations=1, warmup=0)
+            for scenario in benchmarks.build_scenarios(self.user, 'pass1234')
+            if scenario.name in ('profile_list', 'feed_list')
+        }
+        self.assertEqual(len(results), 2)
+        for name, result in results.items():
+            self.assertTrue(result['ok'], (name, result['status']))
+            self.assertGreater(result['queries'], 0, name)
+
+
+@override_settings(FEED_WRITE_BEHIND=True)
+class WriteBehindTests(TestCase):
+    """Test write-behind group commit with the flushes driven by the test"""
+
+    def setUp(self):
+        self.user = models.UserProfile.objects.create_user('test@example.com', 'Test', 'pass1234')
+        self.follower = models.UserProfile.objects.create_user('follower@example.com', 'Follower', 'pass1234')
+        timeline.follow(self.follower, self.user)
+        self.writer = writebehind.FeedWriter()  # not started: flush() runs on the test thread
+        writebehind._writer = self.writer
+        self.addCleanup(setattr, writebehind, '_writer', None)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_post_is_queued_until_flush(self):
+        """The response carries the id and created_on the row is later written with"""
+        response = self.client.post('/api/feed/', {'status_text': 'queued'}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(models.ProfileFeedItem.objects.exists())
+
+        self.assertEqual(self.writer.flush(), 1)
+        stored = self.client.get(f'/api/feed/{response.data["id"]}/')
+        self.assertEqual(stored.data, response.data)
+        self.assertTrue(models.HomeTimelineEntry.objects.filter(
+            owner=self.follower, feed_item_id=response.data['id']
+        ).exists())
+
+    def test_batch_is_one_insert(self):
+        for i in range(5):
+            self.client.post('/api/feed/', {'status_text': f'status {i}'}, format='json')
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.writer.flush(), 5)
+        inserts = [query for query in ctx.captured_queries if 'INSERT INTO profiles_api_profilefeeditem' in query['sql']]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(models.ProfileFeedItem.objects.count(), 5)
+
+    def test_reserved_ids_are_not_reused(self):
+        """Ordinary inserts skip past a reserved block"""
+        start, end = writebehind.reserve_ids(10)
+        item = models.ProfileFeedItem.objects.create(user_profile=self.user, status_text='direct')
+        self.assertGreaterEqual(item.id, end)
+        self.assertEqual(writebehind.reserve_ids(10)[0], item.id + 1)
+
+
+class WriteBehindThreadTests(TransactionTestCase):
+    """Test the background writer thread, which needs its own committed connection"""
+
+    def setUp(self):
+        self.user = models.UserProfile.objects.create_user('test@example.com', 'Test', 'pass1234')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def start_writer(self, **kwargs):
+        writer = writebehind.FeedWriter(**kwargs)
+        writer.start()
+        writebehind._writer = writer
+        self.addCleanup(setattr, writebehind, '_writer', None)
+        self.addCleanup(writer.shutdown)
+        return writer
+
+    @override_settings(FEED_WRITE_BEHIND=True, FEED_WRITE_BEHIND_DURABLE=True)
+    def test_durable_mode_waits_for_commit(self):
+        self.start_writer(interval=0.01)
+        response = self.client.post('/api/feed/', {'status_text': 'durable'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(models.ProfileFeedItem.objects.filter(pk=response.data['id']).exists())
+
+    def test_poison_row_spares_its_batch(self):
+        """A row whose author was deleted after it was queued fails alone"""
+        writer = writebehind.FeedWriter()  # not started: flush() runs on the test thread
+        gone = models.UserProfile.objects.create_user('gone@example.com', 'Gone', 'pass1234')
+        futures = [
+            writer.submit(models.ProfileFeedItem(user_profile=author, status_text=f'status {i}',
+                                                 created_on=timezone.now()))
+            for i, author in enumerate([self.user, self.user, gone, self.user, self.user])
+        ]
+        gone.delete()
+        with self.assertLogs('profiles_api.writebehind', 'ERROR'):
+            self.assertEqual(writer.flush(), 4)
+        self.assertIsNotNone(futures[2].exception())
+        self.assertEqual([future.result().status_text for future in futures[3:]], ['status 3', 'status 4'])
+        self.assertEqual(models.ProfileFeedItem.objects.filter(user_profile=self.user).count(), 4)
+
+    @override_settings(FEED_WRITE_BEHIND=True)
+    def test_shutdown_flushes_queue(self):
+        writer = self.start_writer(interval=60)
+        for i in range(3):
+            self.client.post('/api/feed/', {'status_text': f'status {i}'}, format='json')
+        self.assertEqual(models.ProfileFeedItem.objects.count(), 0)
+        writer.shutdown()
+        self.assertEqual(models.ProfileFeedItem.objects.count(), 3)
+        with self.assertRaises(RuntimeError):
+            writer.submit(models.ProfileFeedItem(user_profile=self.user, status_text='late'))
+
+    @override_settings(FEED_WRITE_BEHIND=True)
+    def test_worker_exit_flushes_queue(self):
+        """A serve.py worker stopped by SIGTERM writes what it answered 202 for, though it skips atexit"""
+        self.start_writer(interval=60)
+        for i in range(3):
+            response = self.client.post('/api/feed/', {'status_text': f'status {i}'}, format='json')
+            self.assertEqual(response.status_code, 202)
+        server = mock.Mock(**{'serve_forever.side_effect': serve.Stop})
+        with mock.patch.object(serve, 'Server', return_value=server), mock.patch.object(serve.signal, 'signal'), \
+                mock.patch.object(serve.os, '_exit') as exit:
+            serve.run_worker(None, None, 1)
+        exit.assert_called_once_with(0)
+        self.assertEqual(models.ProfileFeedItem.objects.count(), 3)
+
+
+class FeedArchiveTests(TestCase):
+    """Test the retention command and reading archived items back"""
+
+    def setUp(self):
+        self.user = models.UserProfile.objects.create_user('test@example.com', 'Test', 'pass1234')
+        self.other = models.UserProfile.objects.create_user('other@example.com', 'Other', 'pass1234')
+        timeline.follow(self.other, self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        now = timezone.now()
+        self.old = []
+        for days, author in ((400, self.user), (430, self.other), (460, self.user), (500, self.user)):
+            self.client.force_authenticate(author)
+            item_id = self.client.post('/api/feed/', {'status_text': f'{days} days old'}).data['id']
+            models.ProfileFeedItem.objects.filter(pk=item_id).update(created_on=now - timedelta(days=days))
+            models.HomeTimelineEntry.objects.filter(feed_item_id=item_id).update(
+                created_on=now - timedelta(days=days)
+            )
+            self.old.append(item_id)
+        self.client.force_authenticate(self.user)
+        self.recent = self.client.post('/api/feed/', {'status_text': 'recent'}).data['id']
+        self.expected = self.export_lines()
+
+    def export_lines(self, **params):
+        response = self.client.get('/api/feed/export/', params)
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def archive(self):
+        out = StringIO()
+        call_command('archive_feed', days=365, chunk_size=3, stdout=out)
+        return out.getvalue()
+
+    def test_archive_moves_old_items(self):
+        """Old items move to monthly tables in chunks and leave the home timelines"""
+        output = self.archive()
+        self.assertIn('Archived 4 items', output)
+        self.assertIn('rows/s', output)
+        self.assertIn('feed_created_on_id_idx', output)
+        self.assertEqual(list(models.ProfileFeedItem.objects.values_list('id', flat=True)), [self.recent])
+        self.assertFalse(models.HomeTimelineEntry.objects.filter(feed_item_id__in=self.old).exists())
+        self.assertGreaterEqual(len(archive.archive_months()), 2)
+        self.assertIn('Archived 0 items', self.archive())
+
+    def test_export_reads_archive(self):
+        """Exports reaching back past the cutoff include archived items, unchanged"""
+        self.archive()
+        self.assertEqual(self.export_lines(), self.expected)
+        since = (timezone.now() - timedelta(days=440)).isoformat()
+        until = (timezone.now() - timedelta(days=300)).isoformat()
+        ids = [line['id'] for line in self.export_lines(since=since, until=until)]
+        self.assertEqual(ids, self.old[:2])
+        ids = [line['id'] for line in self.export_lines(user_profile=self.user.id)]
+        self.assertEqual(ids, [self.old[0], self.old[2], self.old[3], self.recent])
+        recent_only = self.export_lines(since=(timezone.now() - timedelta(days=1)).isoformat())
+        self.assertEqual([line['id'] for line in recent_only], [self.recent])
+
+    def test_stats_fall_back_to_archive(self):
+        """Deleting an author's last live status leaves the newest archived one as their last post"""
+        self.archive()
+        self.assertEqual(self.client.delete(f'/api/feed/{self.recent}/').status_code, 204)
+        stats = models.UserFeedStats.objects.get(user_profile=self.user)
+        newest = next(row for row in archive.iter_archived(user_profile_id=self.user.id) if row[0] == self.old[0])
+        self.assertEqual((stats.status_count, stats.last_posted_on), (3, newest[3]))
+        # setUp backdates created_on behind the stats' back, so only this user's row is comparable
+        self.assertNotIn(self.user.id, [user_id for user_id, _, _ in feed_stats.reconcile(fix=False)])
+
+    def test_deleted_author_leaves_no_archive(self):
+        """Deleting a profile drops its archived items from exports"""
+        self.archive()
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.client.delete(f'/api/profile/{self.other.id}/').status_code, 204)
+        self.client.force_authenticate(self.user)
+        ids = [line['id'] for line in self.export_lines()]
+        self.assertEqual(ids, [self.old[0], self.old[2], self.old[3], self.recent])
+
+    def test_archiving_expires_detail_etags(self):
+        """A cached detail ETag stops matching once its item moves to the archive"""
+        etag = self.client.get(f'/api/feed/{self.old[0]}/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.archive()
+        response = self.client.get(f'/api/feed/{self.old[0]}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 404)
+
+
+class FeedStatsTests(TestCase):
+    """Test the per-user feed stats and their reconciliation"""
+
+    def setUp(self):
+        self.user = models.UserProfile.objects.create_user('test@example.com', 'Test', 'pass1234')
+        self.quiet = models.UserProfile.objects.create_user('quiet@example.com', 'Quiet', 'pass1234')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        caching.get_cache().clear()
+
+    def post(self, text):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/feed/', {'status_text': text}).data
+
+    def stats(self, user):
+        return self.client.get(f'/api/profile/{user.id}/', {'stats': 1}).json()
+
+    def test_stats_follow_creates_and_deletes(self):
+        first = self.post('first')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/feed/batch/', [{'status_text': 'a'}, {'status_text': 'b'}], format='json')
+        last = self.post('last')
+        profile = self.stats(self.user)
+        self.assertEqual((profile['status_count'], profile['last_posted_on']), (4, last['created_on']))
+
+        self.client.delete(f'/api/feed/{last["id"]}/')
+        self.client.delete(f'/api/feed/{first["id"]}/')
+        stats = models.UserFeedStats.objects.get(user_profile=self.user)
+        newest = models.ProfileFeedItem.objects.filter(user_profile=self.user).latest('created_on')
+        self.assertEqual((stats.status_count, stats.last_posted_on), (2, newest.created_on))
+
+    def test_stats_are_opt_in(self):
+        self.post('hello')
+        self.assertNotIn('status_count', self.client.get(f'/api/profile/{self.user.id}/').json())
+        rows = {row['id']: row for row in self.client.get('/api/profile/', {'stats': 1}).json()}
+        self.assertEqual(rows[self.user.id]['status_count'], 1)
+        self.assertEqual((rows[self.quiet.id]['status_count'], rows[self.quiet.id]['last_posted_on']), (0, None))
+
+    def test_cached_stats_expire_on_post(self):
+        """A new status changes the stats response even though the profile itself did not change"""
+        self.assertEqual(self.stats(self.user)['status_count'], 0)
+        self.post('hello')
+        self.assertEqual(self.stats(self.user)['status_count'], 1)
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        self.post('counted')
+        models.ProfileFeedItem.objects.create(user_profile=self.quiet, status_text='behind the back')
+        models.UserFeedStats.objects.filter(user_profile=self.user).update(status_count=7)
+
+        out = StringIO()
+        call_command('reconcile_feed_stats', dry_run=True, batch_size=1, stdout=out)
+        self.assertIn('Found drift for 2 users', out.getvalue())
+        self.assertEqual(models.UserFeedStats.objects.get(user_profile=self.user).status_count, 7)
+
+        call_command('reconcile_feed_stats', batch_size=1, stdout=StringIO())
+        self.assertEqual(list(feed_stats.reconcile()), [])
+        self.assertEqual(self.stats(self.quiet)['status_count'], 1)
+        self.assertEqual(models.UserFeedStats.objects.get(user_profile=self.user).status_count, 1)
+
+    def test_archived_statuses_still_count(self):
+        item = self.post('old')
+        models.ProfileFeedItem.objects.filter(pk=item['id']).update(created_on=timezone.now() - timedelta(days=400))
+        list(feed_stats.reconcile())  # pick up the back-dated created_on
+        call_command('archive_feed', days=365, stdout=StringIO())
+        self.assertFalse(models.ProfileFeedItem.objects.exists())
+        # setUp backdates created_on behind the stats' back, so only this user's row is comparable
+        self.assertNotIn(self.user.id, [user_id for user_id, _, _ in feed_stats.reconcile(fix=False)])
+        self.assertEqual(self.stats(self.user)['status_count'], 1)
+
+    def test_old_sqlite_is_refused(self):
+        """The app will not start on an SQLite without RETURNING"""
+        apps.check_sqlite_version()
+        with mock.patch.object(apps.sqlite3, 'sqlite_version_info', (3, 31, 1)), \
+                mock.patch.object(apps.sqlite3, 'sqlite_version', '3.31.1'):
+            with self.assertRaisesMessage(ImproperlyConfigured, 'found 3.31.1'):
+                apps.check_sqlite_version()
+
+
+class SparseFieldsetTests(TestCase):
+    """Test ?fields= pruning and its column pushdown"""
+
+    def setUp(self):
+        self.user = models.UserProfile.objects.create_user('test@example.com', 'Test', 'pass1234')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for i in range(3):
+            self.client.post('/api/feed/', {'status_text': f'status {i}'})
+
+    def get(self, url, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), ' '.join(query['sql'] for query in queries.captured_queries)
+
+    def test_list_reads_only_requested_columns(self):
+        data, sql = self.get('/api/feed/', {'fields': 'status_text', 'page_size': 2})
+        self.assertEqual(data['results'], [{'status_text': 'status 2'}, {'status_text': 'status 1'}])
+        self.assertNotIn('user_profile_id', sql)
+
+        # The cursor still works without id or created_on in the output
+        response = self.client.get(data['next'])
+        self.assertEqual(response.json()['results'], [{'status_text': 'status 0'}])
+
+    def test_retrieve_defers_other_columns(self):
+        data, sql = self.get(f'/api/profile/{self.user.id}/', {'fields': 'name'})
+        self.assertEqual(data, {'name': 'Test'})
+        self.assertNotIn('"email"', sql)
+
+        data, _ = self.get(f'/api/profile/{self.user.id}/', {'fields': 'id,status_count', 'stats': 1})
+        self.assertEqual(data, {'id': self.user.id, 'status_count': 3})
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get('/api/profile/', {'fields': 'name,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'fields': ['Unknown field(s): password.']})
+
+    def test_writes_ignore_fields(self):
+        response = self.client.post('/api/feed/?fields=id', {'status_text': 'new'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(set(response.json()), {'id', 'user_profile', 'status_text', 'created_on'})
+
+
+class AutocompleteTests(TestCase):
+    """Test the in-memory prefix index and /api/profile/autocomplete/"""
+
+    def setUp(self):
+        autocomplete._index = None
+        self.addCleanup(setattr, autocomplete, '_index', None)
+        self.john = models.UserProfile.objects.create_user('john@example.com', 'John Smith', 'pass1234')
+        self.jane = models.UserProfile.objects.create_user('jsmith@example.com', 'Jane Doe', 'pass1234')
+        self.client = APIClient()
+
+    def names(self, q, **params):
+        response = self.client.get('/api/profile/autocomplete/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [row['name'] for row in response.json()]
+
+    def test_prefix_index(self):
+        index = autocomplete.PrefixIndex(max_key_length=8)
+        index.load([(1, 'John Smith', 'john@example.com'), (2, 'Jane Doe', 'jsmith@example.com')])
+        self.assertEqual(index.lookup('SMI'), [(1, 'John Smith')])
+        self.assertEqual(index.lookup('j'), [(2, 'Jane Doe'), (1, 'John Smith')])  # each profile once
+        self.assertEqual(index.lookup('john smith and more'), [(1, 'John Smith')])  # cut like the keys
+        self.assertEqual(index.lookup('j', limit=1), [(2, 'Jane Doe')])
+
+        index.add(1, 'Johnny Walker', 'john@example.com')
+        index.remove(2)
+        self.assertEqual(index.lookup('smi'), [])
+        self.assertEqual(index.lookup('wal'), [(1, 'Johnny Walker')])
+        self.assertEqual(len(index), 1)
+
+    def test_endpoint_matches_names_words_and_emails(self):
+        self.assertEqual(self.names('smi'), ['John Smith'])
+        self.assertEqual(self.names('JSMITH@'), ['Jane Doe'])
+        self.assertEqual(self.names('j', limit=1), ['Jane Doe'])
+        self.assertEqual(self.names(''), [])
+        for limit in ('x', '\u00b2'):
+            self.assertEqual(self.client.get('/api/profile/autocomplete/', {'q': 'j', 'limit': limit}).status_code, 400)
+
+    def test_signals_update_loaded_index_without_queries(self):
+        self.names('j')  # load
+        with self.captureOnCommitCallbacks(execute=True):
+            models.UserProfile.objects.create_user('smithers@example.com', 'Waylon Smithers', 'pass1234')
+            self.john.delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names('smith'), ['Waylon Smithers'])
+
+    @override_settings(AUTOCOMPLETE_MAX_AGE=0)
+    def test_stale_index_reloads(self):
+        self.names('j')
+        models.UserProfile.objects.filter(pk=self.jane.pk).update(name='Janet Doe')  # no signal
+        self.assertEqual(self.names('janet'), ['Janet Doe'])
+
+
+class ScalableAdminTests(TestCase):
+    """Test the feed item changelist: estimated counts, keyset pages and the date hierarchy"""
+
+    def setUp(self):
+        self.admin = models.UserProfile.objects.create_superuser('admin@example.com', 'Admin', 'pass1234')
+        self.client.force_login(self.admin)
+        now = timezone.now()
+        self.items = []
+        for days in (0, 1, 40, 400, 401):
+            item = models.ProfileFeedItem.objects.create(user_profile=self.admin, status_text=f'{days} days ago')
+            models.ProfileFeedItem.objects.filter(pk=item.pk).update(created_on=now - timedelta(days=days))
+            self.items.append(item.pk)
+
+    @override_settings(ADMIN_COUNT_LIMIT=2)
+    def test_keyset_pages_and_estimated_count(self):
+        seen = []
+        url = '/admin/profiles_api/profilefeeditem/'
+        with mock.patch.object(profiles_admin.ProfileFeedItemAdmin, 'list_per_page', 2):
+            while url:
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, '~5 profile feed items')
+                for query in queries.captured_queries:
+                    self.assertNotIn('OFFSET', query['sql'])
+                    self.assertNotIn('COUNT(*) FROM "profiles_api_profilefeeditem"', query['sql'])
+                seen.extend(item.pk for item in response.context['cl'].result_list)
+                next_url = response.context['cl'].next_url
+                url = next_url and '/admin/profiles_api/profilefeeditem/' + next_url
+
+            previous = response.context['cl'].previous_url
+            response = self.client.get('/admin/profiles_api/profilefeeditem/' + previous)
+            self.assertEqual([item.pk for item in response.context['cl'].result_list], seen[2:4])
+        self.assertEqual(seen, self.items)
+
+    def test_date_hierarchy_matches_django(self):
+        queryset = profiles_admin.DateHierarchyQuerySet(models.ProfileFeedItem)
+        for kind in ('year', 'month', 'day'):
+            self.assertEqual(
+                queryset.datetimes('created_on', kind),
+                list(models.ProfileFeedItem.objects.datetimes('created_on', kind))
+            )
+        self.assertEqual(
+            queryset.aggregate(first=Min('created_on'), last=Max('created_on')),
+            models.ProfileFeedItem.objects.aggregate(first=Min('created_on'), last=Max('created_on'))
+        )
+
+        year = timezone.localtime(timezone.now()).year
+        response = self.client.get('/admin/profiles_api/profilefeeditem/', {'created_on__year': year})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all(item.created_on.year == year for item in response.context['cl'].result_list))
+
+    def test_search_by_author(self):
+        other = models.UserProfile.objects.create_user('other@example.com', 'Other Person', 'pass1234')
+        mine = models.ProfileFeedItem.objects.create(user_profile=other, status_text='hello')
+        response = self.client.get('/admin/profiles_api/profilefeeditem/', {'q': 'other'})
+        self.assertEqual([item.pk for item in response.context['cl'].result_list], [mine.pk])
+        response = self.client.get('/admin/profiles_api/userprofile/', {'q': 'pers'})
+        self.assertEqual(list(response.context['cl'].result_list), [other])
+
+    @override_settings(PROFILE_SEARCH_MAX_RESULTS=2)
+    def test_search_is_not_capped(self):
+        """The admin lists every match, not just the API's top PROFILE_SEARCH_MAX_RESULTS"""
+        people = [
+            models.UserProfile.objects.create_user(f'person{i}@example.com', f'Person {i}', 'pass1234')
+            for i in range(3)
+        ]
+        items = [models.ProfileFeedItem.objects.create(user_profile=person, status_text='hi') for person in people]
+        self.assertEqual(len(search.get_search_backend().search(models.UserProfile.objects.all(), ['person'])), 2)
+        response = self.client.get('/admin/profiles_api/userprofile/', {'q': 'person'})
+        self.assertEqual(set(response.context['cl'].result_list), set(people))
+        response = self.client.get('/admin/profiles_api/profilefeeditem/', {'q': 'person'})
+        self.assertEqual({item.pk for item in response.context['cl'].result_list}, {item.pk for item in items})
+
+
+class ThrottlingTests(TestCase):
+    """Test the token-bucket throttles on logins, signups and feed writes"""
+
+    def setUp(self):
+        throttling.get_store().clear()
+        self.addCleanup(throttling.get_store().clear)
+        self.user = models.UserProfile.objects.create_user('test@example.com', 'Test', 'pass1234')
+
+    def test_bucket_refills(self):
+        store = throttling.LocalBucketStore()
+        self.assertEqual([store.consume('k', 3, 60, now=0) for _ in range(3)], [0.0, 0.0, 0.0])
+        self.assertAlmostEqual(store.consume('k', 3, 60, now=0), 20)
+        self.assertEqual(store.consume('k', 3, 60, now=20), 0.0)  # one token back after period / count
+        self.assertAlmostEqual(store.consume('k', 3, 60, now=20), 20)
+        self.assertEqual(store.consume('other', 3, 60, now=20), 0.0)
+
+    def test_first_request_of_slow_bucket(self):
+        """A fresh 1/hour bucket admits its first request whatever the clock reads, then refuses the next"""
+        store = throttling.LocalBucketStore()
+        clock = random.Random(0)
+        for i in range(10000):
+            now = clock.uniform(0, 1e6)  # about 1 in 100 of these has now + 3600 - now > 3600
+            self.assertEqual(store.consume(f'k{i}', 1, 3600, now=now), 0.0)
+            self.assertAlmostEqual(store.consume(f'k{i}', 1, 3600, now=now), 3600)
+
+    def test_local_store_stays_bounded(self):
+        store = throttling.LocalBucketStore(max_keys=100)
+        for i in range(1000):
+            store.consume(f'ip:{i}', 5, 60, now=0)
+        self.assertLessEqual(len(store._full_at), 100)
+
+    @override_settings(THROTTLE_RATES={'signup_ip': '1/hour'})
+    def test_forwarded_for_cannot_pick_the_bucket(self):
+        """A client rotating X-Forwarded-For still draws from its REMOTE_ADDR bucket"""
+        anonymous = APIClient()
+        signup = {'name': 'New', 'password': 'pass1234'}
+        statuses = [
+            anonymous.post(url, dict(signup, email=f'new{i}@example.com'),
+                           HTTP_X_FORWARDED_FOR=f'10.0.0.{i}').status_code
+            for i, url in enumerate(['/api/profile/', '/api/profile/', '/api/async/profile/'])
+        ]
+        self.assertEqual(statuses, [201, 429, 429])
+
+        with override_settings(REST_FRAMEWORK={'NUM_PROXIES': 1}):
+            response = anonymous.post('/api/profile/', dict(signup, email='proxied@example.com'),
+                                      HTTP_X_FORWARDED_FOR='10.0.0.9, 10.0.0.1')
+        self.assertEqual(response.status_code, 201)  # the address the trusted proxy added
+
+    @override_settings(THROTTLE_RATES={'login_user': '2/min'})
+    def test_login_is_limited_per_account_across_endpoints(self):
+        client = APIClient()
+
+        def login(url, username, password='wrong'):
+            return client.post(url, {'username': username, 'password': password})
+
+        self.assertEqual(login('/api/login/', 'test@example.com').status_code, 400)
+        self.assertEqual(login('/api/async/login/', ' TEST@example.com').status_code, 400)
+        response = login('/api/login/', 'test@example.com', 'pass1234')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(login('/api/async/login/', 'test@example.com').status_code, 429)
+        self.assertEqual(login('/api/login/', 'other@example.com').status_code, 400)
+
+    @override_settings(THROTTLE_RATES={'feed_write_user': '2/min', 'signup_ip': '1/hour'})
+    def test_writes_are_limited_and_reads_are_not(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        statuses = [client.post('/api/feed/', {'status_text': 'hi'}).status_code for _ in range(3)]
+        self.assertEqual(statuses, [201, 201, 429])
+        self.assertEqual(client.get('/api/feed/').status_code, 200)
+
+        anonymous = APIClient()
+        signup = {'email': 'new@example.com', 'name': 'New', 'password': 'pass1234'}
+        self.assertEqual(anonymous.post('/api/profile/', signup).status_code, 201)
+        self.assertEqual(anonymous.post('/api/profile/', dict(signup, email='next@example.com')).status_code, 429)
+
+
+class FastStartTests(TestCase):
+    """Test the warm-up and the worker server of the pre-forking entrypoint"""
+    databases = '__all__'
+
+    def test_warm_up(self):
+        """Every step runs, and the serializer caches the workers inherit are filled"""
+        fast_serializers._compiled.clear()
+        timings = warmup.warm_up(get_wsgi_application())
+        self.assertEqual(list(timings), ['urls', 'serializers', 'connections', 'requests'])
+        self.assertGreater(timings['urls'][0], 10)
+        self.assertIn((serializers.ProfileFeedItemSerializer, None), fast_serializers._compiled)
+
+    def test_worker_serves_shared_socket(self):
+        """A worker's Server answers on a socket opened elsewhere, as after the fork"""
+        sock = socket.create_server(('127.0.0.1', 0))
+        initialized = []
+        server = serve.Server(sock, get_wsgi_application(), threads=2,
+                              initializer=lambda: initialized.append(threading.get_ident()))
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            with urlopen(f'http://127.0.0.1:{sock.getsockname()[1]}/api/hello-view/') as response:
+                self.assertEqual(response.status, 200)
+                self.assertIn('an_apiview', json.loads(response.read()))
+        finally:
+            server.shutdown()
+            thread.join()
+            server.server_close()
+        # In the request thread, where Django's thread-local connections will be used
+        self.assertEqual(len(initialized), 1)
+        self.assertNotIn(initialized[0], (threading.get_ident(), thread.ident))
+
+    def test_workers_need_shared_caches(self):
+        """Several workers are refused while the response or token cache is per process"""
+        self.assertEqual(len(serve.shared_state_problems()), 2)
+        with tempfile.TemporaryDirectory() as directory:
+            shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                  'LOCATION': directory}}
+            with override_settings(CACHES=shared), \
+                    mock.patch.object(authentication.token_cache, 'max_size', 0), \
+                    mock.patch.object(authentication.token_cache, 'use_django_cache', True):
+                self.assertEqual(serve.shared_state_problems(), [])
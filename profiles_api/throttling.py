@@ -0,0 +1,163 @@
+"""Per-user and per-IP rate limits on logins, signups and feed writes
+
+Each limit is a token bucket of `count` requests refilled over `period`
+seconds, stored GCRA-style as a single number per key: the time at which
+the bucket will be full again. A check is one read and one write of that
+number, with no lock and no list of past requests, so it costs the same
+however busy the key is. Two requests racing on one key may both be let
+through; a limit that is off by one under contention is fine here.
+
+The store is process-local unless THROTTLE_CACHE_ALIAS names a Django cache
+to share the buckets between processes. Limits come from THROTTLE_RATES,
+keyed '<scope>_ip' and '<scope>_user'; views name their scope with
+`throttle_scope`, a string or a dict keyed by action like `query_budget`.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """Turn '10/min' into (10, 60); None stays None"""
+    if rate is None:
+        return None
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+
+class LocalBucketStore:
+    """Process-local buckets, pruned once they outgrow THROTTLE_MAX_KEYS"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._full_at = {}
+        self._prune_lock = threading.Lock()
+
+    def consume(self, key, count, period, now=None):
+        """Take a token from `key`'s bucket; return 0.0, or the seconds until one is available"""
+        now = time.monotonic() if now is None else now
+        interval = period / count
+        # Compare the backlog before adding the interval: now + interval - now is not always interval
+        # in floating point, and a fresh 1/hour bucket would then refuse its first request
+        backlog = max(self._full_at.get(key, now), now) - now
+        if backlog > period - interval:
+            return backlog - (period - interval)
+        self._full_at[key] = now + backlog + interval
+        if len(self._full_at) > self.max_keys:
+            self.prune(now)
+        return 0.0
+
+    def prune(self, now):
+        """Forget full buckets; they behave like missing ones"""
+        with self._prune_lock:
+            if len(self._full_at) <= self.max_keys:
+                return
+            self._full_at = {key: full_at for key, full_at in self._full_at.items() if full_at > now}
+            # Still too many live keys: drop the oldest rather than grow without bound
+            excess = len(self._full_at) - self.max_keys * 9 // 10
+            if excess > 0:
+                for key in list(self._full_at)[:excess]:
+                    self._full_at.pop(key, None)
+
+    def clear(self):
+        self._full_at = {}
+
+
+class CacheBucketStore:
+    """Buckets shared through a Django cache alias, for several processes"""
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def consume(self, key, count, period, now=None):
+        now = time.time() if now is None else now  # wall clock, so processes agree
+        cache = caches[self.alias]
+        cache_key = f'profiles_api:throttle:{key}'
+        interval = period / count
+        backlog = max(cache.get(cache_key, now), now) - now  # see LocalBucketStore.consume
+        if backlog > period - interval:
+            return backlog - (period - interval)
+        cache.set(cache_key, now + backlog + interval, int(backlog + interval) + 1)
+        return 0.0
+
+    def clear(self):
+        pass  # entries expire with their buckets
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return the bucket store THROTTLE_CACHE_ALIAS selects"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                alias = getattr(settings, 'THROTTLE_CACHE_ALIAS', None)
+                if alias is None:
+                    _store = LocalBucketStore(getattr(settings, 'THROTTLE_MAX_KEYS', 100000))
+                else:
+                    _store = CacheBucketStore(alias)
+    return _store
+
+
+def check(scope, kind, ident):
+    """Take a token for `ident` from the `<scope>_<kind>` limit; return the seconds to wait, or 0.0"""
+    rate = parse_rate(getattr(settings, 'THROTTLE_RATES', {}).get(f'{scope}_{kind}'))
+    if rate is None or ident is None:
+        return 0.0
+    return get_store().consume(f'{scope}:{kind}:{ident}', *rate)
+
+
+def get_scope(view):
+    scope = getattr(view, 'throttle_scope', None)
+    if isinstance(scope, dict):
+        return scope.get(getattr(view, 'action', None))
+    return scope
+
+
+class BucketThrottle(BaseThrottle):
+    """Throttle `view.throttle_scope` by the identity get_key() returns"""
+    kind = None
+
+    def get_key(self, request, view):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        scope = get_scope(view)
+        self.wait_seconds = 0.0 if scope is None else check(scope, self.kind, self.get_key(request, view))
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class IPThrottle(BucketThrottle):
+    """Limit per client address: REMOTE_ADDR, or X-Forwarded-For only as far as REST_FRAMEWORK['NUM_PROXIES']"""
+    kind = 'ip'
+
+    def get_key(self, request, view):
+        return self.get_ident(request)
+
+
+class UserThrottle(BucketThrottle):
+    """Limit per authenticated user, or per username a login names"""
+    kind = 'user'
+
+    def get_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return login_key(request.data.get('username') if hasattr(request.data, 'get') else None)
+
+
+def login_key(username):
+    """Normalise a login's username so case and spacing variants share one bucket"""
+    if not isinstance(username, str) or not username.strip():
+        return None
+    return username.strip().lower()
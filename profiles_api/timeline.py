@@ -0,0 +1,147 @@
+"""Home timelines: statuses from the people a user follows
+
+New feed items are written into each follower's HomeTimelineEntry rows
+(fan-out on write), so reading a home timeline is one range scan of the
+(owner, created_on, feed_item) index. Authors with more than
+FEED_FANOUT_MAX_FOLLOWERS followers are skipped at write time and their
+items are merged in at read time instead.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+from profiles_api import models
+from profiles_api.pagination import keyset_slice
+
+
+def max_fanout():
+    return getattr(settings, 'FEED_FANOUT_MAX_FOLLOWERS', 10000)
+
+
+def fan_out(feed_items):
+    """Copy new feed items of one author into the author's and followers' home timelines"""
+    if not feed_items:
+        return
+    author_id = feed_items[0].user_profile_id
+    ids = [feed_item.pk for feed_item in feed_items]
+    placeholders = ', '.join(['%s'] * len(ids))
+    entries = models.HomeTimelineEntry._meta.db_table
+    follows = models.Follow._meta.db_table
+    items = models.ProfileFeedItem._meta.db_table
+
+    # Read the count fresh; request.user may come from the token cache
+    follower_count = models.UserProfile.objects.filter(
+        pk=author_id
+    ).values_list('follower_count', flat=True).get()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT OR IGNORE INTO {entries} (owner_id, feed_item_id, created_on) '
+            f'SELECT user_profile_id, id, created_on FROM {items} WHERE id IN ({placeholders})',
+            ids
+        )
+        if follower_count <= max_fanout():
+            # One INSERT ... SELECT instead of a row per follower through the ORM
+            cursor.execute(
+                f'INSERT OR IGNORE INTO {entries} (owner_id, feed_item_id, created_on) '
+                f'SELECT f.follower_id, i.id, i.created_on FROM {items} i '
+                f'JOIN {follows} f ON f.followed_id = i.user_profile_id WHERE i.id IN ({placeholders})',
+                ids
+            )
+
+
+def rebuild_home_timelines():
+    """Recount followers and rematerialize every home timeline from scratch
+
+    For data loaded behind the API's back, e.g. seed_benchmark_data.
+    """
+    entries = models.HomeTimelineEntry._meta.db_table
+    follows = models.Follow._meta.db_table
+    items = models.ProfileFeedItem._meta.db_table
+    profiles = models.UserProfile._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {profiles} SET follower_count = '
+            f'(SELECT COUNT(*) FROM {follows} f WHERE f.followed_id = {profiles}.id)'
+        )
+        cursor.execute(f'DELETE FROM {entries}')
+        cursor.execute(
+            f'INSERT INTO {entries} (owner_id, feed_item_id, created_on) '
+            f'SELECT user_profile_id, id, created_on FROM {items}'
+        )
+        cursor.execute(
+            f'INSERT OR IGNORE INTO {entries} (owner_id, feed_item_id, created_on) '
+            f'SELECT f.follower_id, i.id, i.created_on FROM {items} i '
+            f'JOIN {follows} f ON f.followed_id = i.user_profile_id '
+            f'JOIN {profiles} p ON p.id = i.user_profile_id WHERE p.follower_count <= %s',
+            [max_fanout()]
+        )
+
+
+def follow(follower, followed):
+    """Start following `followed`, returning False if already following"""
+    with transaction.atomic():
+        _, created = models.Follow.objects.get_or_create(follower=follower, followed=followed)
+        if not created:
+            return False
+        models.UserProfile.objects.filter(pk=followed.pk).update(follower_count=F('follower_count') + 1)
+
+        # Backfill recent statuses so the timeline is not empty until the next post
+        followed.refresh_from_db(fields=['follower_count'])
+        if followed.follower_count <= max_fanout():
+            recent = models.ProfileFeedItem.objects.filter(
+                user_profile=followed
+            ).order_by('-created_on', '-id')[:getattr(settings, 'FEED_FOLLOW_BACKFILL', 50)]
+            models.HomeTimelineEntry.objects.bulk_create(
+                [
+                    models.HomeTimelineEntry(owner=follower, feed_item=item, created_on=item.created_on)
+                    for item in recent
+                ],
+                ignore_conflicts=True
+            )
+    return True
+
+
+def unfollow(follower, followed):
+    """Stop following `followed`, returning False if not following"""
+    with transaction.atomic():
+        deleted, _ = models.Follow.objects.filter(follower=follower, followed=followed).delete()
+        if not deleted:
+            return False
+        models.UserProfile.objects.filter(pk=followed.pk).update(follower_count=F('follower_count') - 1)
+        models.HomeTimelineEntry.objects.filter(owner=follower, feed_item__user_profile=followed).delete()
+    return True
+
+
+def forget_follower(follower_id):
+    """Take a profile about to be deleted off the follower_count of everyone it follows
+
+    Its Follow rows then go with the cascade, which would leave the counts,
+    and so fan_out's choice of path, too high.
+    """
+    models.UserProfile.objects.filter(
+        pk__in=models.Follow.objects.filter(follower_id=follower_id).values('followed_id'),
+        follower_count__gt=0,  # counts that already drifted low
+    ).update(follower_count=F('follower_count') - 1)
+
+
+def fetch_home(user, position, reverse, limit):
+    """Return up to `limit` home timeline items after `position`, for FeedCursorPagination.paginate_rows"""
+    entries = keyset_slice(
+        models.HomeTimelineEntry.objects.filter(owner=user).select_related('feed_item'),
+        position, reverse, limit, fields=('created_on', 'feed_item_id')
+    )
+    items = [entry.feed_item for entry in entries]
+
+    high_fanout = list(models.Follow.objects.filter(
+        follower=user, followed__follower_count__gt=max_fanout()
+    ).values_list('followed_id', flat=True))
+    if not high_fanout:
+        return items
+
+    # Merge in the authors that were too big to fan out, one index range scan each
+    merged = {item.pk: item for item in items}
+    merged.update((item.pk, item) for item in keyset_slice(
+        models.ProfileFeedItem.objects.filter(user_profile_id__in=high_fanout),
+        position, reverse, limit
+    ))
+    return sorted(merged.values(), key=lambda item: (item.created_on, item.pk), reverse=not reverse)[:limit]
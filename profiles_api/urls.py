@@ -3,6 +3,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
 from profiles_api import views
+from profiles_api import async_views
 
 router = DefaultRouter()
 router.register('hello-viewset', views.HelloViewSet, basename='hello-viewset')
@@ -21,6 +22,14 @@ urlpatterns = [
     # standard function that we call to convert our api view class tobe rendered by our urls
     # so basically Django rest framework will call this get function if a HTTP GET request is made to our URL
     path('login/', views.UserLoginApiView.as_view()),
+    # async views for ASGI deployments: login/signup hash on a bounded worker pool, reads mirror the viewsets
+    path('async/login/', async_views.login),
+    path('async/profile/', async_views.profiles),
+    path('async/profile/<int:pk>/', async_views.profile_detail),
+    path('async/feed/', async_views.feed),
+    path('async/feed/<int:pk>/', async_views.feed_detail),
+    path('metrics/cache/', views.CacheMetricsApiView.as_view()),
+    path('metrics/timings/', views.RequestTimingsApiView.as_view()),
     path('', include(router.urls))  # as you register new routes with our router it generates a list of URLs that are
     # associated for our viewset it figures out the URLs that are required
 
@@ -2,28 +2,61 @@ from rest_framework.views import APIView  # We created Hello APIView class
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework import viewsets  # We created Hello ViewSet class
-from rest_framework.authentication import TokenAuthentication
-from rest_framework import filters  # Need to be clarify
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.authtoken.views import ObtainAuthToken
 # That comes with the Django restframework that we can use to generate an authtoken
 
 from rest_framework.settings import api_settings
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
 
 """The status object from the rest framework is a list of handy HTTP status codes that you can use when returning 
 responses from your API"""
 #from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.permissions import IsAdminUser
 from rest_framework.permissions import IsAuthenticated  # Django rest framework has another handy
 # permission that comes with it by default just called is authenticated
 
 from profiles_api import serializers
 from profiles_api import models
 from profiles_api import permissions
+from profiles_api import pagination
+from profiles_api import authentication
+from profiles_api import autocomplete
+from profiles_api import search
+from profiles_api import export
+from profiles_api import caching
+from profiles_api import timeline
+from profiles_api import fast_serializers
+from profiles_api import profiling
+from profiles_api import budgets
+from profiles_api import database
+from profiles_api import writebehind
+from profiles_api import archive
+from profiles_api import feed_stats
+from profiles_api import throttling
+from profiles_api import fieldsets
+from profiles_api import compression
+
+
+def archive_query_budget():
+    """Queries a delete may run per archived month; only looked up while budgets are checked"""
+    if getattr(settings, 'QUERY_BUDGET_MODE', None) is None:
+        return 0
+    return len(archive.archive_months())
 
 
 # we're going to use this to tell our API view what data to expect when making post put and patch requests to our API
 
-class HelloApiView(APIView):
+class HelloApiView(budgets.QueryBudgetMixin, APIView):
     """Test API View"""
+    query_budget = 0
     serializer_class = serializers.HelloSerializer
 
     def get(self, request, format=None):
@@ -69,8 +102,9 @@ class HelloApiView(APIView):
         return Response({'method': 'DELETE'})
 
 
-class HelloViewSet(viewsets.ViewSet):
+class HelloViewSet(budgets.QueryBudgetMixin, viewsets.ViewSet):
     """Test API ViewSet"""
+    query_budget = 0
     serializer_class = serializers.HelloSerializer
 
     def list(self, request):
@@ -117,26 +151,138 @@ class HelloViewSet(viewsets.ViewSet):
 
 # The update partial update and destroy to manage specific model objects in the database
 
-class UserProfileViewSet(viewsets.ModelViewSet):
+class UserProfileViewSet(database.ReadReplicaMixin, budgets.QueryBudgetMixin, caching.ConditionalResponseMixin,
+                         fieldsets.SparseFieldsMixin, fast_serializers.FastListMixin, viewsets.ModelViewSet):
     """Handle creating and updating profiles"""
+    cache_resource = 'profile'  # ETags and cached responses are versioned per profile
     serializer_class = serializers.UserProfileSerializer
     queryset = models.UserProfile.objects.all()
-    authentication_classes = (TokenAuthentication,)  # Add a comma after TokenAuthentication
+    authentication_classes = (authentication.CachedTokenAuthentication,)  # Add a comma after TokenAuthentication
     # so that this gets created as a tuple instead of just a single item
     permission_classes = (permissions.UpdateOwnProfile,)
-    filter_backends = (filters.SearchFilter,)
+    throttle_classes = (throttling.IPThrottle,)
+    throttle_scope = {'create': 'signup'}
+    filter_backends = (search.ProfileSearchFilter,)  # ranked FTS5 search, falls back to a LIKE scan
     search_fields = ('name', 'email',)
-
-
-class UserLoginApiView(ObtainAuthToken):
+    # Worst cases with a cold token cache; savepoints count too. destroy is the follower count
+    # update and the cascade over tokens, follows, timelines, feed stats and feed items, batched
+    # per table, plus the lookup of archive tables to purge; get_query_budget adds one DELETE per
+    # archived month.
+    query_budget = {
+        'list': 3, 'retrieve': 2, 'create': 5, 'update': 5, 'partial_update': 5, 'destroy': 17,
+        'follow': 12, 'unfollow': 7, 'autocomplete': 2,
+    }
+
+    def get_query_budget(self, action):
+        budget = super().get_query_budget(action)
+        if action == 'destroy':
+            budget += archive_query_budget()
+        return budget
+
+    def wants_stats(self):
+        """?stats=1 adds status_count and last_posted_on to list and retrieve"""
+        return self.action in ('list', 'retrieve') and self.request.query_params.get('stats') in ('1', 'true')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.wants_stats():
+            # LEFT JOIN on the stats row; users who never posted have none
+            queryset = queryset.annotate(
+                status_count=Coalesce(F('feed_stats__status_count'), 0),
+                last_posted_on=F('feed_stats__last_posted_on'),
+            )
+        return queryset
+
+    def get_serializer_class(self):
+        if self.wants_stats():
+            return serializers.UserProfileStatsSerializer
+        return super().get_serializer_class()
+
+    def get_cache_version(self, pk):
+        """Responses with stats also change whenever the user posts or deletes a status"""
+        version = super().get_cache_version(pk)
+        if self.wants_stats():
+            version = max(version, caching.get_version('feed_stats', pk))
+        return version
+
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """Up to ?limit= {id, name} pairs whose name, a later word of it or email starts with ?q=
+
+        Answered from the in-memory index in profiles_api.autocomplete, for
+        type-ahead UIs; ?search= still does the ranked full search.
+        """
+        prefix = request.query_params.get('q', '').strip()
+        max_results = getattr(settings, 'AUTOCOMPLETE_MAX_RESULTS', 20)
+        limit = request.query_params.get('limit', str(min(10, max_results)))
+        if not (limit.isascii() and limit.isdigit()):
+            raise ValidationError({'limit': 'A valid integer is required.'})
+        if not prefix:
+            return Response([])
+
+        matches = autocomplete.get_index().lookup(prefix, min(int(limit), max_results))
+        return Response([{'id': pk, 'name': name} for pk, name in matches])
+
+    @action(detail=True, methods=['post'], permission_classes=(IsAuthenticated,))
+    def follow(self, request, pk=None):
+        """Follow this profile; its statuses start showing up in /api/feed/home/"""
+        followed = self.get_object()
+        if followed.pk == request.user.pk:
+            raise ValidationError({'non_field_errors': ['You cannot follow yourself.']})
+        created = timeline.follow(request.user, followed)
+        return Response(
+            {'following': True},
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+    @action(detail=True, methods=['post'], permission_classes=(IsAuthenticated,))
+    def unfollow(self, request, pk=None):
+        """Stop following this profile"""
+        timeline.unfollow(request.user, self.get_object())
+        return Response({'following': False})
+
+
+class UserLoginApiView(budgets.QueryBudgetMixin, ObtainAuthToken):
     """Handle crating user authentication tokens"""
+    query_budget = 2
+    throttle_classes = (throttling.IPThrottle, throttling.UserThrottle)  # per address and per account
+    throttle_scope = 'login'
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
 
+class CacheMetricsApiView(budgets.QueryBudgetMixin, APIView):
+    """Report hit/miss counters for this process's caches"""
+    query_budget = 1
+    authentication_classes = (authentication.CachedTokenAuthentication,)
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, format=None):
+        return Response({
+            'response_cache': caching.stats.as_dict(),
+            'token_cache': authentication.token_cache.stats(),
+        })
+
+
+class RequestTimingsApiView(budgets.QueryBudgetMixin, APIView):
+    """Report rolling per-endpoint latency histograms recorded by ProfilingMiddleware"""
+    query_budget = 1
+    authentication_classes = (authentication.CachedTokenAuthentication,)
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, format=None):
+        return Response({
+            'enabled': getattr(settings, 'PROFILING_ENABLED', False),
+            'endpoints': profiling.endpoint_timings.summary(),
+        })
+
+
 # Create a viewset for our profile feed items
-class UserProfileFeedViewSet(viewsets.ModelViewSet):
+class UserProfileFeedViewSet(database.ReadReplicaMixin, budgets.QueryBudgetMixin,
+                             caching.ConditionalResponseMixin, fieldsets.SparseFieldsMixin,
+                             fast_serializers.FastListMixin, viewsets.ModelViewSet):
     """Handles creating, reading and updating profile feed items"""
-    authentication_classes = (TokenAuthentication,)  # use the token authentication to authenticate requests
+    cache_resource = 'feed'
+    authentication_classes = (authentication.CachedTokenAuthentication,)  # use the token authentication to authenticate requests
     serializer_class = serializers.ProfileFeedItemSerializer
     queryset = models.ProfileFeedItem.objects.all()  # manage all of our profile feed item objects from our model in our viewset
     # serializer_class and validated and then the serializer.save function is called by default
@@ -145,13 +291,156 @@ class UserProfileFeedViewSet(viewsets.ModelViewSet):
        # IsAuthenticatedOrReadOnly
         IsAuthenticated
     )
+    pagination_class = pagination.FeedCursorPagination  # page through the feed by (created_on, id) keyset
+    throttle_classes = (throttling.IPThrottle, throttling.UserThrottle)
+    throttle_scope = dict.fromkeys(('create', 'update', 'partial_update', 'destroy', 'batch'), 'feed_write')
+    # Worst cases with a cold token cache; none may grow with the page or batch size. export only
+    # counts the setup, its chunked reads run while the response streams. destroy includes the
+    # archive lookup for an author's last live status; get_query_budget adds one query per month.
+    query_budget = {
+        'list': 2, 'retrieve': 2, 'create': 8, 'update': 3, 'partial_update': 3, 'destroy': 9,
+        'batch': 8, 'export': 2, 'home': 3,
+    }
+
+    def get_query_budget(self, action):
+        budget = super().get_query_budget(action)
+        if action == 'destroy':
+            budget += archive_query_budget()
+        return budget
+
+    def get_queryset(self):
+        """Narrow the feed to one user's timeline when ?user_profile= is given"""
+        queryset = super().get_queryset()
+        user_profile = self.request.query_params.get('user_profile')
+        if user_profile is not None:
+            if not (user_profile.isascii() and user_profile.isdigit()):  # int() rejects '²'
+                raise ValidationError({'user_profile': 'A valid integer is required.'})
+            # Served by the (user_profile, created_on DESC) index
+            queryset = queryset.filter(user_profile_id=int(user_profile))
+
+        return queryset
+
+    def create(self, request, *args, **kwargs):
+        """Queue the new status for the write-behind writer when FEED_WRITE_BEHIND is on"""
+        if not getattr(settings, 'FEED_WRITE_BEHIND', False):
+            return super().create(request, *args, **kwargs)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        feed_item = models.ProfileFeedItem(
+            user_profile=request.user, created_on=timezone.now(), **serializer.validated_data
+        )
+        committed = writebehind.get_feed_writer().submit(feed_item)
+        durable = getattr(settings, 'FEED_WRITE_BEHIND_DURABLE', False)
+        if durable:
+            committed.result()  # re-raises a failed flush
+        data = self.get_serializer(feed_item).data
+        # 202 until the row is committed: it cannot be read back before the next flush
+        return Response(
+            data,
+            status=status.HTTP_201_CREATED if durable else status.HTTP_202_ACCEPTED,
+            headers=self.get_success_headers(data)
+        )
 
     def perform_create(self, serializer):
         """Sets the user profile to the logged in user"""
         # create function is a handy feature of the Django rest framework that allows you to
         # override the behavior or customize the behavior for creating objects through a Model Viewset
-        serializer.save(user_profile=self.request.user)
+        with transaction.atomic():
+            feed_item = serializer.save(user_profile=self.request.user)
+            timeline.fan_out([feed_item])
+            feed_stats.record_created([feed_item])
         # The serializer is a model serializer so it has a save function assigned to it
         # and that save function is used to save the contents of the serializer to an object in the database
 
         # if the user has authenticated then the request will have a user associated to the authenticated user
+
+    def perform_destroy(self, instance):
+        """Delete the status and take it out of the author's feed stats together"""
+        # Updates need no counterpart: the author and created_on of a status never change
+        with transaction.atomic():
+            instance.delete()
+            feed_stats.record_deleted(instance)
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """Create many feed items in one transaction with a single bulk INSERT
+
+        Send ?lenient=1 to insert the valid items and report the invalid ones
+        by index instead of rejecting the whole batch.
+        """
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError({'non_field_errors': ['Expected a list of items.']})
+        max_size = getattr(settings, 'FEED_BATCH_MAX_SIZE', 100)
+        if len(items) > max_size:
+            raise ValidationError({'non_field_errors': [f'Ensure this batch has no more than {max_size} items.']})
+
+        errors = []
+        if request.query_params.get('lenient') in ('1', 'true'):
+            valid_data = []
+            for index, item in enumerate(items):
+                serializer = self.get_serializer(data=item)
+                if serializer.is_valid():
+                    valid_data.append(serializer.validated_data)
+                else:
+                    errors.append({'index': index, 'errors': serializer.errors})
+        else:
+            serializer = self.get_serializer(data=items, many=True)
+            serializer.is_valid(raise_exception=True)
+            valid_data = serializer.validated_data
+
+        feed_items = [
+            models.ProfileFeedItem(user_profile=request.user, **data) for data in valid_data
+        ]
+        with transaction.atomic():
+            feed_items = models.ProfileFeedItem.objects.bulk_create(feed_items)
+            timeline.fan_out(feed_items)
+            feed_stats.record_created(feed_items)
+        if feed_items:
+            caching.bump_version('feed')  # bulk_create sends no post_save
+
+        created = self.get_serializer(feed_items, many=True).data
+        if errors:
+            return Response(
+                {'created': created, 'errors': errors},
+                status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST
+            )
+        return Response(created, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream the feed as newline-delimited JSON, gzipped if the client accepts it
+
+        ?since= and ?until= bound created_on for incremental exports. Archived
+        items in the range are included.
+        """
+        since = export.parse_bound('since', request.query_params.get('since'))
+        until = export.parse_bound('until', request.query_params.get('until'))
+        queryset = export.filter_created_on(self.get_queryset(), since=since, until=until)
+        chunk_size = getattr(settings, 'FEED_EXPORT_CHUNK_SIZE', 2000)
+        user_profile = request.query_params.get('user_profile')  # validated by get_queryset
+        # Items past the retention age live in monthly archive tables; merge them back in
+        archived = archive.iter_archived(
+            since, until, user_profile_id=int(user_profile) if user_profile else None, chunk_size=chunk_size
+        )
+        chunks = export.iter_ndjson(queryset, chunk_size=chunk_size, archived=archived)
+
+        use_gzip = compression.accepted_encoding(request, ('gzip',)) == 'gzip'
+        if use_gzip:
+            chunks = export.gzip_stream(chunks)
+        response = StreamingHttpResponse(chunks, content_type='application/x-ndjson')
+        if use_gzip:
+            response['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+    @action(detail=False, methods=['get'])
+    def home(self, request):
+        """Statuses from the user and the profiles they follow, newest first"""
+        page = self.paginator.paginate_rows(
+            lambda position, reverse, limit: timeline.fetch_home(request.user, position, reverse, limit),
+            request
+        )
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
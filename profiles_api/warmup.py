@@ -0,0 +1,94 @@
+"""Do the work a worker's first requests would do lazily, once, before serving
+
+profiles_project.serve calls warm_up() in the parent process before forking,
+so every worker starts with the URL patterns compiled, the serializer field
+trees and row serializers built, the model metadata caches filled and the
+modules a request imports on first use already loaded, all shared
+copy-on-write. Connections are opened (and the SQLITE_PRAGMAS applied) to
+fail fast on a bad database; each worker opens its own again after the fork.
+"""
+import inspect
+import sys
+import time
+from io import BytesIO
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.db import connections
+from django.urls import URLResolver, get_resolver
+from rest_framework import serializers as drf_serializers
+
+from profiles_api import fast_serializers
+from profiles_api import fieldsets
+from profiles_api import serializers
+
+
+def compile_urls(resolver=None):
+    """Compile every URL pattern's regex and the reverse lookup tables; return the pattern count"""
+    resolver = resolver or get_resolver()
+    resolver.reverse_dict  # populates the reverse, namespace and app dicts
+    count = 0
+    for pattern in resolver.url_patterns:
+        pattern.pattern.regex  # compiled on first access
+        count += 1
+        if isinstance(pattern, URLResolver):
+            count += compile_urls(pattern)
+    return count
+
+
+def build_serializers():
+    """Build the field trees, sparse fieldset names and row serializers of the API's serializers"""
+    built = 0
+    for _, serializer_class in inspect.getmembers(serializers, inspect.isclass):
+        if serializer_class.__module__ != serializers.__name__:
+            continue  # imported, not declared here
+        if not issubclass(serializer_class, drf_serializers.BaseSerializer):
+            continue
+        serializer_class().fields  # also fills the model's _meta caches
+        if issubclass(serializer_class, fieldsets.SparseFieldsSerializerMixin):
+            fieldsets.readable_fields(serializer_class)
+            fast_serializers.get_row_serializer(serializer_class)
+        built += 1
+    return built
+
+
+def open_connections():
+    """Open a connection to each configured database"""
+    for alias in connections:
+        connections[alias].ensure_connection()
+    return len(connections.settings)
+
+
+def warm_requests(application, paths):
+    """GET each of `paths` through `application`, so middleware and views import what they need"""
+    for path in paths:
+        environ = {'PATH_INFO': path.partition('?')[0], 'QUERY_STRING': path.partition('?')[2],
+                   'wsgi.input': BytesIO(), 'wsgi.errors': sys.stderr}
+        setup_testing_defaults(environ)
+        body = application(environ, lambda status, headers, exc_info=None: None)
+        try:
+            for _ in body:
+                pass
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+    return len(paths)
+
+
+def warm_up(application=None):
+    """Run every step; return {step: (count, seconds)}"""
+    steps = [
+        ('urls', compile_urls),
+        ('serializers', build_serializers),
+        ('connections', open_connections),
+    ]
+    if application is not None:
+        paths = getattr(settings, 'WARMUP_PATHS', ('/api/profile/',))
+        steps.append(('requests', lambda: warm_requests(application, paths)))
+
+    timings = {}
+    for name, step in steps:
+        started = time.perf_counter()
+        count = step()
+        timings[name] = (count, time.perf_counter() - started)
+    return timings
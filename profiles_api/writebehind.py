@@ -0,0 +1,211 @@
+"""Write-behind group commit for new feed items
+
+With FEED_WRITE_BEHIND on, POST /api/feed/ does not commit its own
+transaction. The item gets its id from a block reserved in sqlite_sequence
+and its created_on straight away, and is queued. A background thread then
+inserts everything queued in one transaction (one fsync) every
+FEED_WRITE_BEHIND_INTERVAL_MS, or sooner once FEED_WRITE_BEHIND_BATCH_SIZE
+rows are waiting. Reserving ids in sqlite_sequence keeps them unique
+across processes, because AUTOINCREMENT never hands out an id at or below
+the stored sequence.
+
+Responses are 202 until the row is committed. Items still queued when a
+process dies without running its exit hooks are lost, and so are rows the
+database rejects at flush time; those are logged and the rest of their
+batch is still written. FEED_WRITE_BEHIND_DURABLE
+makes each request wait for the commit of its batch instead; that still
+shares one transaction between all requests that arrive in the same
+interval.
+"""
+import atexit
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+
+from profiles_api import caching
+from profiles_api import feed_stats
+from profiles_api import models
+from profiles_api import timeline
+
+logger = logging.getLogger(__name__)
+
+
+class IdAllocator:
+    """Hand out ProfileFeedItem ids from blocks reserved in sqlite_sequence"""
+
+    def __init__(self, block_size=1000):
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def allocate(self):
+        with self._lock:
+            if self._next >= self._end:
+                self._next, self._end = reserve_ids(self.block_size)
+            allocated = self._next
+            self._next += 1
+            return allocated
+
+
+def reserve_ids(count):
+    """Reserve `count` ids no other insert will use and return them as a half-open range"""
+    table = models.ProfileFeedItem._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        # The UPDATE takes the write lock first, so concurrent reservations serialize
+        cursor.execute('UPDATE sqlite_sequence SET seq = seq + %s WHERE name = %s', [count, table])
+        if cursor.rowcount == 0:
+            cursor.execute(
+                f'INSERT INTO sqlite_sequence (name, seq) SELECT %s, COALESCE(MAX(id), 0) + %s FROM {table}',
+                [table, count]
+            )
+        cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = %s', [table])
+        end = cursor.fetchone()[0] + 1
+    return end - count, end
+
+
+class FeedWriter:
+    """Queue unsaved feed items and insert them in batched transactions"""
+
+    def __init__(self, interval=0.05, batch_size=500, id_block_size=1000):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.ids = IdAllocator(id_block_size)
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def submit(self, feed_item):
+        """Queue `feed_item`, filling in its id, and return a future for its commit"""
+        if self._stopping.is_set():
+            raise RuntimeError('Feed writer is shut down')
+        feed_item.pk = self.ids.allocate()
+        future = Future()
+        with self._lock:
+            self._pending.append((feed_item, future))
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wakeup.set()
+        return future
+
+    def flush(self):
+        """Insert everything queued so far in one transaction and return how many rows it wrote"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            return self.write_batch(batch)
+
+    def write_batch(self, batch):
+        """Write (feed_item, future) pairs, halving the batch to isolate rows the database rejects
+
+        One bad row, say by an author deleted since it was queued, costs
+        a few extra transactions instead of every item in its batch.
+        """
+        try:
+            write([feed_item for feed_item, _ in batch])
+        except (IntegrityError, models.UserProfile.DoesNotExist) as exc:  # fan_out looks the author up
+            if len(batch) > 1:
+                middle = len(batch) // 2
+                return self.write_batch(batch[:middle]) + self.write_batch(batch[middle:])
+            feed_item, future = batch[0]
+            logger.error('Write-behind dropped feed item %s by user %s: %s',
+                         feed_item.pk, feed_item.user_profile_id, exc)
+            future.set_exception(exc)
+            return 0
+        except Exception as exc:
+            logger.exception('Write-behind flush of %d feed items failed', len(batch))
+            for _, future in batch:
+                future.set_exception(exc)
+            return 0
+        for feed_item, future in batch:
+            future.set_result(feed_item)
+        return len(batch)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name='feed-write-behind', daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def run(self):
+        try:
+            while not self._stopping.is_set():
+                self._wakeup.wait(self.interval)
+                self._wakeup.clear()
+                self.flush()
+            self.flush()
+        finally:
+            connection.close()
+
+    def shutdown(self, timeout=None):
+        """Stop taking items, flush what is queued and wait for the writer thread"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        else:
+            self.flush()
+
+
+def write(feed_items):
+    """Insert queued feed items with their preassigned ids and fan them out"""
+    table = models.ProfileFeedItem._meta.db_table
+    adapt = connection.ops.adapt_datetimefield_value
+    by_author = defaultdict(list)
+    for feed_item in feed_items:
+        by_author[feed_item.user_profile_id].append(feed_item)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Raw INSERT so the created_on the client was given is kept; the ORM would reset auto_now_add
+        cursor.executemany(
+            f'INSERT INTO {table} (id, user_profile_id, status_text, created_on) VALUES (%s, %s, %s, %s)',
+            [
+                (feed_item.pk, feed_item.user_profile_id, feed_item.status_text, adapt(feed_item.created_on))
+                for feed_item in feed_items
+            ]
+        )
+        for author_items in by_author.values():
+            timeline.fan_out(author_items)
+        feed_stats.record_created(feed_items)
+    caching.bump_version('feed')  # no post_save for raw inserts
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_feed_writer():
+    """Return the process-wide feed writer, starting its thread on first use"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                writer = FeedWriter(
+                    interval=getattr(settings, 'FEED_WRITE_BEHIND_INTERVAL_MS', 50) / 1000,
+                    batch_size=getattr(settings, 'FEED_WRITE_BEHIND_BATCH_SIZE', 500),
+                    id_block_size=getattr(settings, 'FEED_WRITE_BEHIND_ID_BLOCK', 1000),
+                )
+                writer.start()
+                _writer = writer
+    return _writer
+
+
+def shutdown_feed_writer():
+    """Flush and stop the process-wide feed writer, if it was started
+
+    For processes that exit without running atexit hooks, like the forked
+    workers of profiles_project.serve.
+    """
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.shutdown()
@@ -0,0 +1,201 @@
+"""
+Pre-forking production server for profiles_project.
+
+    python -m profiles_project.serve --bind 0.0.0.0:8000 --threads 16
+    SHARED_CACHE_DIR=/var/cache/profiles python -m profiles_project.serve --workers 4
+
+The parent process loads Django and the WSGI application, warms it
+(profiles_api.warmup), opens the listening socket and freezes the garbage
+collector's view of everything loaded so far, then forks the workers. They
+share those pages copy-on-write instead of each importing and warming the
+app on its own, so a new worker is serving within milliseconds. Each worker
+answers on the shared socket with a bounded pool of threads. The parent
+replaces workers that die and stops them all on SIGTERM or SIGINT.
+
+The response cache versions and bodies and the token cache must be shared
+between workers, or a write or a revoked token is only seen by the worker
+that handled it. More than one worker is refused unless they are (see
+SHARED_CACHE_DIR in the settings); one worker scales with --threads.
+
+DEBUG defaults to 0 here, unlike manage.py. Static files are not served;
+put the admin's behind the proxy in front of this.
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+logger = logging.getLogger('profiles_project.serve')
+
+
+class RequestHandler(WSGIRequestHandler):
+
+    def log_message(self, format, *args):
+        logger.debug('%s %s', self.address_string(), format % args)
+
+
+class Server(WSGIServer):
+    """WSGIServer on an already listening socket, handling requests on `threads` threads
+
+    `initializer` runs in each request thread as it starts, before its
+    first request.
+    """
+
+    def __init__(self, sock, application, threads=8, initializer=None):
+        super().__init__(sock.getsockname(), RequestHandler, bind_and_activate=False)
+        self.socket.close()
+        self.socket = sock
+        self.server_name, self.server_port = sock.getsockname()[:2]
+        self.setup_environ()
+        self.set_app(application)
+        self.pool = ThreadPoolExecutor(threads, initializer=initializer)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        self.pool.shutdown(wait=True)
+        super().server_close()
+
+
+class Stop(Exception):
+    pass
+
+
+def stop(signum, frame):
+    raise Stop(signum)
+
+
+def shared_state_problems():
+    """Return what would go stale between worker processes, as a list of messages"""
+    from django.conf import settings
+    from django.core.cache import caches
+    from django.core.cache.backends.locmem import LocMemCache
+    from profiles_api import authentication
+
+    def process_local(alias):
+        return isinstance(caches[alias], LocMemCache)
+
+    problems = []
+    alias = getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')
+    if process_local(alias):
+        problems.append(f'RESPONSE_CACHE_ALIAS {alias!r} is a LocMemCache, so writes would not expire other '
+                        f'workers\' ETags and cached responses')
+    token_cache = authentication.token_cache
+    if token_cache.max_size or (token_cache.use_django_cache and process_local('default')):
+        problems.append('the token cache is kept in each process, so other workers would still accept revoked '
+                        'tokens; set TOKEN_CACHE_MAX_SIZE = 0')
+    return problems
+
+
+def run_worker(sock, application, threads):
+    """Serve `sock` until SIGTERM; runs in the forked child and never returns"""
+    from django.db import connections
+    from profiles_api import warmup
+    from profiles_api import writebehind
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the parent's to handle
+    signal.signal(signal.SIGTERM, stop)
+    status = 0
+    # Django's connections are per thread, so each request thread opens (and, with CONN_MAX_AGE, keeps) its own
+    server = Server(sock, application, threads, initializer=warmup.open_connections)
+    try:
+        server.serve_forever()
+    except Stop:
+        pass
+    except Exception:
+        logger.exception('Worker %d failed', os.getpid())
+        status = 1
+    finally:
+        server.server_close()
+        # os._exit() skips atexit, so flush the statuses already answered with 202 here
+        writebehind.shutdown_feed_writer()
+        connections.close_all()
+    os._exit(status)
+
+
+def spawn(sock, application, threads):
+    pid = os.fork()
+    if pid == 0:
+        run_worker(sock, application, threads)
+    return pid
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m profiles_project.serve', description=__doc__.split('\n\n')[0])
+    parser.add_argument('--bind', default='127.0.0.1:8000', help='host:port to listen on')
+    parser.add_argument('--workers', type=int, default=1, help='Needs a shared cache when more than 1')
+    parser.add_argument('--threads', type=int, default=8, help='Request threads per worker')
+    parser.add_argument('--backlog', type=int, default=1024)
+    parser.add_argument('--log-level', default='INFO')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level, format='%(asctime)s [%(process)d] %(message)s')
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'profiles_project.settings')
+    os.environ.setdefault('DEBUG', '0')
+    started = time.perf_counter()
+    from django.core.wsgi import get_wsgi_application
+    application = get_wsgi_application()
+    from django.db import connections
+    from profiles_api import warmup  # needs the app registry get_wsgi_application() populates
+
+    if args.workers > 1:
+        problems = shared_state_problems()
+        if problems:
+            parser.error(f'--workers {args.workers} needs state shared between processes, but '
+                         + '; '.join(problems) + '. Set SHARED_CACHE_DIR or use --threads.')
+    loaded = time.perf_counter()
+    for step, (count, elapsed) in warmup.warm_up(application).items():
+        logger.info('Warmed %s (%d) in %.1fms', step, count, elapsed * 1000)
+    logger.info('Loaded in %.1fms, warmed in %.1fms', (loaded - started) * 1000,
+                (time.perf_counter() - loaded) * 1000)
+
+    host, _, port = args.bind.rpartition(':')
+    sock = socket.create_server((host, int(port)), backlog=args.backlog)
+    # Sockets and SQLite handles must not be shared across fork; each worker opens its own
+    connections.close_all()
+    # Keep the collector from touching, and so copying, the objects the workers inherit
+    gc.collect()
+    gc.freeze()
+
+    workers = set()
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        for _ in range(args.workers):
+            workers.add(spawn(sock, application, args.threads))
+        logger.info('Serving http://%s with %d workers', args.bind, len(workers))
+        while True:
+            pid, status = os.wait()
+            if pid not in workers:
+                continue
+            workers.remove(pid)
+            logger.warning('Worker %d exited with status %d', pid, os.waitstatus_to_exitcode(status))
+            time.sleep(1)  # don't spin if workers die as soon as they start
+            workers.add(spawn(sock, application, args.threads))
+    except Stop:
+        logger.info('Stopping %d workers', len(workers))
+        for pid in workers:
+            os.kill(pid, signal.SIGTERM)
+        for pid in workers:
+            os.waitpid(pid, 0)
+    finally:
+        sock.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
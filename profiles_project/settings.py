@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 import os
+from pathlib import Path
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -44,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'profiles_api.profiling.ProfilingMiddleware',  # inactive unless PROFILING_ENABLED
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -80,7 +82,27 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        'CONN_MAX_AGE': 600,  # keep connections (and their pragmas and page cache) between requests
+    },
+    # Read-only connection to the same file for the profile and feed viewsets' GETs, see profiles_api/database.py
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': Path(BASE_DIR, 'db.sqlite3').as_uri() + '?mode=ro',
+        'CONN_MAX_AGE': 600,
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = ['profiles_api.database.ReadReplicaRouter']
+DATABASE_READ_REPLICA = 'replica'
+
+# Applied to every SQLite connection when it opens. WAL lets readers work alongside the writer, and NORMAL
+# sync is safe in WAL mode (a power cut can lose the last commits but not corrupt the file).
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # negative means KiB, so 64 MiB
 }
 
 # Password validation
@@ -130,3 +152,121 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
 STATIC_ROOT = 'static/'
+
+# Keyset pagination of /api/feed/: default page size and the hard cap a client can ask for with ?page_size=
+FEED_PAGE_SIZE = int(os.environ.get('FEED_PAGE_SIZE', 20))
+FEED_MAX_PAGE_SIZE = int(os.environ.get('FEED_MAX_PAGE_SIZE', 100))
+
+# Profile ?search= backend: FTS5SearchBackend (ranked, prefix matching) or ScanSearchBackend (LIKE '%term%')
+PROFILE_SEARCH_BACKEND = 'profiles_api.search.FTS5SearchBackend'
+PROFILE_SEARCH_MAX_RESULTS = 100
+
+# Each process keeps its own LocMemCache unless SHARED_CACHE_DIR names a directory for a FileBasedCache that all of
+# them share. profiles_project.serve refuses to start more than one worker while the response cache or the token
+# cache below is local to each process: a write or a revoked token would only be seen by the worker that handled it.
+SHARED_CACHE_DIR = os.environ.get('SHARED_CACHE_DIR')
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+if SHARED_CACHE_DIR:
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': SHARED_CACHE_DIR,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+
+# In-process cache of token -> user for CachedTokenAuthentication; set TOKEN_CACHE_USE_DJANGO_CACHE to also
+# share lookups through the Django cache framework. With a shared cache the in-process LRU is turned off, since
+# invalidating a token only empties the LRU of the process that saw the change.
+TOKEN_CACHE_MAX_SIZE = 0 if SHARED_CACHE_DIR else 1024
+TOKEN_CACHE_TTL = 300  # seconds
+TOKEN_CACHE_USE_DJANGO_CACHE = bool(SHARED_CACHE_DIR)
+
+# Worker pool for password hashing in the async login/signup views. Once WORKERS + MAX_QUEUE hashes are in
+# flight, new requests get 503 with Retry-After. WORKERS defaults to the CPU count.
+PASSWORD_HASHING_WORKERS = int(os.environ.get('PASSWORD_HASHING_WORKERS', 0)) or None
+PASSWORD_HASHING_MAX_QUEUE = 32
+PASSWORD_HASHING_RETRY_AFTER = 1  # seconds
+
+# Largest list accepted by POST /api/feed/batch/
+FEED_BATCH_MAX_SIZE = 100
+
+# Rows fetched per database round trip by the streaming feed export
+FEED_EXPORT_CHUNK_SIZE = 2000
+
+# Conditional GET / response cache for the profile and feed viewsets. Versions and bodies live in this cache
+# alias; point it at a shared backend (SHARED_CACHE_DIR above, or Redis or Memcached) when running more than one
+# process.
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TTL = 60  # seconds
+
+# Cached responses of RESPONSE_COMPRESSION_MIN_SIZE bytes or more are sent compressed in the first of these
+# encodings the client accepts; the compressed bytes are cached with the plain ones. An empty tuple turns it off.
+RESPONSE_COMPRESSION_ENCODINGS = ('gzip', 'deflate')
+RESPONSE_COMPRESSION_LEVEL = 6
+RESPONSE_COMPRESSION_MIN_SIZE = 1024
+
+# Home timelines: authors with more followers than this are merged in at read time instead of fanned out on
+# write, and a new follow copies up to FEED_FOLLOW_BACKFILL recent statuses into the follower's timeline
+FEED_FANOUT_MAX_FOLLOWERS = 10000
+FEED_FOLLOW_BACKFILL = 50
+
+# Request profiling: Server-Timing headers and per-endpoint timings at /api/metrics/timings/. Requests slower
+# than PROFILING_SLOW_MS are logged; with PROFILING_DUMP_DIR set, a PROFILING_SAMPLE_RATE share of requests runs
+# under cProfile and the slow ones are dumped there as .prof files.
+PROFILING_ENABLED = bool(int(os.environ.get('PROFILING_ENABLED', 0)))
+PROFILING_SLOW_MS = 500
+PROFILING_SAMPLE_RATE = 0.01
+PROFILING_DUMP_DIR = os.environ.get('PROFILING_DUMP_DIR')
+PROFILING_WINDOW = 1000  # most recent requests kept per endpoint
+
+# Query budgets declared on the views: 'raise' turns a breach into QueryBudgetExceeded, 'log' only warns and
+# None skips the check. Raising in DEBUG also makes the test suite fail on N+1 regressions.
+QUERY_BUDGET_MODE = 'raise' if DEBUG else None
+
+# Write-behind group commit for POST /api/feed/ (profiles_api/writebehind.py): new statuses are queued and
+# inserted together every INTERVAL_MS or once BATCH_SIZE are waiting, and the API answers 202 straight away.
+# DURABLE waits for the batch to commit and answers 201. Ids are reserved ID_BLOCK at a time.
+FEED_WRITE_BEHIND = False
+FEED_WRITE_BEHIND_DURABLE = False
+FEED_WRITE_BEHIND_INTERVAL_MS = 50
+FEED_WRITE_BEHIND_BATCH_SIZE = 500
+FEED_WRITE_BEHIND_ID_BLOCK = 1000
+
+# Retention: `manage.py archive_feed` moves statuses older than FEED_RETENTION_DAYS into monthly archive tables,
+# FEED_ARCHIVE_CHUNK_SIZE rows per transaction. Exports still include archived statuses.
+FEED_RETENTION_DAYS = 365
+FEED_ARCHIVE_CHUNK_SIZE = 500
+
+# /api/profile/autocomplete/: in-memory prefix index over profile names and emails. Keys are cut to MAX_KEY_LENGTH
+# characters, and each process reloads its index from the table after MAX_AGE seconds (None never reloads) to
+# pick up changes made by other processes.
+AUTOCOMPLETE_MAX_RESULTS = 20
+AUTOCOMPLETE_MAX_KEY_LENGTH = 32
+AUTOCOMPLETE_MAX_AGE = 300
+
+# Admin changelists stop counting at ADMIN_COUNT_LIMIT rows; bigger unfiltered tables show an estimate instead
+ADMIN_COUNT_LIMIT = 10000
+
+# Token-bucket rate limits (profiles_api/throttling.py) as '<count>/<s|min|hour|day>', keyed '<scope>_ip' and
+# '<scope>_user'; a missing key is unlimited. Buckets live in this process, pruned past THROTTLE_MAX_KEYS, unless
+# THROTTLE_CACHE_ALIAS names a cache to share them between processes.
+THROTTLE_RATES = {
+    'login_ip': '30/min',
+    'login_user': '10/min',
+    'signup_ip': '20/hour',
+    'feed_write_ip': '300/min',
+    'feed_write_user': '120/min',
+}
+THROTTLE_CACHE_ALIAS = 'default' if SHARED_CACHE_DIR else None
+THROTTLE_MAX_KEYS = 100000
+
+# Proxies in front of the app that append to X-Forwarded-For. The per-IP throttles take the client address that
+# many hops back in the header; 0 ignores the header and uses REMOTE_ADDR, so clients cannot pick their own IP.
+REST_FRAMEWORK = {
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+}
+
+# Paths profiles_project.serve GETs through the app before forking its workers (see profiles_api/warmup.py), so
+# the modules and caches a first request fills are already loaded and shared copy-on-write
+WARMUP_PATHS = ('/api/profile/',)